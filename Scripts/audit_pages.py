@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Audit the first-view weight of generated gallery pages against budgets
+Parses each page offline and reports what a first visit costs: the HTML,
+the photo data inlined into it, the requests it starts and the thumbnails
+on its first page (sized from local rendition files). Exits non-zero when
+a page is over budget, so it can run before publishing.
+
+Budgets file format (values in KB except requests; patterns match page names):
+{
+  "default": {"html_kb": 150, "inline_json_kb": 100, "requests": 20, "thumbnails_kb": 3000},
+  "pages": {"crankcross-*.html": {"thumbnails_kb": 4000}}
+}
+"""
+
+import re
+import sys
+import json
+import gzip
+import fnmatch
+from pathlib import Path
+from html.parser import HTMLParser
+from urllib.parse import urlparse, unquote
+
+DEFAULT_BUDGETS = {
+    'html_kb': 150,         # Page file, uncompressed
+    'inline_json_kb': 100,  # JSON embedded in the page's scripts
+    'requests': 20,         # Fetched on first view (CSS, JS, data, non-lazy images)
+    'thumbnails_kb': 3000,  # Thumbnails of the pre-rendered first page
+}
+
+# JSON strings in a script that a page fetches (data files)
+FETCHED_JSON = re.compile(r'''["']([^"'\s]+\.json)["']''')
+JSON_START = re.compile(r'[=(:,]\s*(?=[\[{])')
+
+
+class PageParser(HTMLParser):
+    """Collects the resources a gallery page references"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []          # (rel, href)
+        self.scripts = []        # (attrs, text) for inline scripts
+        self.script_srcs = []
+        self.images = []         # (attrs, in_grid)
+        self.is_gallery = False
+        self._grid_depth = 0     # Open <div>s inside #photoGallery
+        self._script = None
+    
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'div':
+            if self._grid_depth:
+                self._grid_depth += 1
+            elif attrs.get('id') == 'photoGallery':
+                self.is_gallery = True
+                self._grid_depth = 1
+        elif tag == 'link' and attrs.get('href'):
+            self.links.append(((attrs.get('rel') or '').lower(), attrs['href']))
+        elif tag == 'img' and attrs.get('src'):
+            self.images.append((attrs, self._grid_depth > 0))
+        elif tag == 'script':
+            if attrs.get('src'):
+                self.script_srcs.append(attrs['src'])
+            else:
+                self._script = (attrs, [])
+    
+    def handle_endtag(self, tag):
+        if tag == 'div' and self._grid_depth:
+            self._grid_depth -= 1
+        elif tag == 'script' and self._script:
+            self.scripts.append((self._script[0], ''.join(self._script[1])))
+            self._script = None
+    
+    def handle_data(self, data):
+        if self._script:
+            self._script[1].append(data)
+
+
+def inline_json(script):
+    """
+    JSON values embedded in a script (const data = {...}, Promise.resolve({...}))
+    Returns a list of (text, value)
+    """
+    decoder = json.JSONDecoder()
+    found = []
+    pos = 0
+    while True:
+        match = JSON_START.search(script, pos)
+        if not match:
+            return found
+        try:
+            value, end = decoder.raw_decode(script, match.end())
+        except ValueError:
+            pos = match.end() + 1
+            continue
+        if isinstance(value, (dict, list)) and value:
+            found.append((script[match.end():end], value))
+        pos = end
+
+
+def is_local(url):
+    """True for URLs served from the site itself"""
+    return not urlparse(url).scheme and not url.startswith('//')
+
+
+def index_thumbnails(thumbnail_dir):
+    """{filename: size} for the local rendition files under a directory"""
+    if not thumbnail_dir:
+        return {}
+    return {path.name: path.stat().st_size for path in Path(thumbnail_dir).rglob('*') if path.is_file()}
+
+
+def thumbnail_size(url, page_dir, thumbnails):
+    """Size of the local copy of a thumbnail (None if there isn't one)"""
+    if is_local(url) and (page_dir / unquote(url)).is_file():
+        return (page_dir / unquote(url)).stat().st_size
+    return thumbnails.get(unquote(urlparse(url).path).rsplit('/', 1)[-1])
+
+
+def audit_page(page, thumbnails):
+    """
+    First-view breakdown of one page
+    Returns None for pages without a photo grid
+    """
+    page = Path(page)
+    html = page.read_text(encoding='utf-8')
+    parser = PageParser()
+    parser.feed(html)
+    if not parser.is_gallery:
+        return None
+    
+    # Inline JSON; data files named in it (race number shards) aren't fetched
+    # on first view, except the first-page file of a sharded page
+    json_bytes = 0
+    named_in_json = set()
+    first_view = []
+    scripts = [text for attrs, text in parser.scripts]
+    for text in scripts:
+        for literal, value in inline_json(text):
+            json_bytes += len(literal.encode('utf-8'))
+            named_in_json.update(FETCHED_JSON.findall(literal))
+            if isinstance(value, dict) and isinstance(value.get('firstPage'), str):
+                first_view.append(value['firstPage'])
+    
+    # Requests made before any interaction
+    requests = []
+    requests.extend(href for rel, href in parser.links
+                    if set(rel.split()) & {'stylesheet', 'preload', 'modulepreload', 'icon'})
+    requests.extend(parser.script_srcs)
+    requests.extend(attrs['src'] for attrs, in_grid in parser.images if attrs.get('loading') != 'lazy')
+    for text in scripts:
+        requests.extend(name for name in FETCHED_JSON.findall(text) if name not in named_in_json)
+    requests.extend(first_view)
+    requests = list(dict.fromkeys(requests))
+    
+    # Same-origin files the first view downloads (CSS, JS, data)
+    asset_bytes = 0
+    for url in requests:
+        path = page.parent / unquote(url.split('?')[0])
+        if is_local(url) and path.is_file() and path.suffix.lower() in ('.css', '.js', '.json'):
+            asset_bytes += path.stat().st_size
+    
+    thumbnail_bytes = 0
+    missing = 0
+    grid_images = [attrs['src'] for attrs, in_grid in parser.images if in_grid]
+    for url in grid_images:
+        size = thumbnail_size(url, page.parent, thumbnails)
+        if size is None:
+            missing += 1
+        else:
+            thumbnail_bytes += size
+    
+    raw = html.encode('utf-8')
+    return {
+        'html_kb': len(raw) / 1024,
+        'html_gzip_kb': len(gzip.compress(raw, compresslevel=9)) / 1024,
+        'inline_json_kb': json_bytes / 1024,
+        'requests': len(requests),
+        'assets_kb': asset_bytes / 1024,
+        'thumbnails_kb': thumbnail_bytes / 1024,
+        'thumbnails': len(grid_images),
+        'thumbnails_missing': missing,
+    }
+
+
+def load_budgets(budget_file=None, overrides=None):
+    """(default budgets, {page pattern: budgets}) from the built-ins, a budgets file and overrides"""
+    defaults = dict(DEFAULT_BUDGETS)
+    pages = {}
+    if budget_file:
+        with open(budget_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        defaults.update(config.get('default', {}))
+        pages = config.get('pages', {})
+    defaults.update(overrides or {})
+    return defaults, pages
+
+
+def budgets_for(name, defaults, pages):
+    """Budgets for one page: the defaults plus every matching pattern, in file order"""
+    budgets = dict(defaults)
+    for pattern, values in pages.items():
+        if fnmatch.fnmatch(name, pattern):
+            budgets.update(values)
+    return budgets
+
+
+def audit_pages(paths, budget_file=None, thumbnail_dir=None, overrides=None):
+    """
+    Audit gallery pages and print a report
+    
+    Parameters:
+    - paths: Page files and/or directories (every gallery page in them)
+    - budget_file: JSON budgets (see module docstring)
+    - thumbnail_dir: Folder with local copies of the thumbnails
+    - overrides: Budgets that replace the defaults, e.g. {'html_kb': 200}
+    
+    Returns True if every page is within budget.
+    """
+    pages = []
+    for path in map(Path, paths):
+        pages.extend(sorted(path.glob('*.html')) if path.is_dir() else [path])
+    
+    defaults, page_budgets = load_budgets(budget_file, overrides)
+    thumbnails = index_thumbnails(thumbnail_dir)
+    
+    print(f"{'Page':<40} {'HTML':>9} {'gzip':>8} {'Inline':>9} {'Req':>4} {'Assets':>9} {'Thumbs':>10}")
+    over = []
+    audited = 0
+    for page in pages:
+        result = audit_page(page, thumbnails)
+        if result is None:
+            continue
+        audited += 1
+        
+        budgets = budgets_for(page.name, defaults, page_budgets)
+        exceeded = [key for key, limit in budgets.items() if key in result and result[key] > limit]
+        
+        thumbs = f"{result['thumbnails_kb']:.0f} KB"
+        if result['thumbnails_missing']:
+            thumbs += f" ({result['thumbnails_missing']}/{result['thumbnails']} not found)"
+        print(f"{'✗' if exceeded else '✓'} {page.name:<38} {result['html_kb']:>6.1f} KB {result['html_gzip_kb']:>5.1f} KB "
+              f"{result['inline_json_kb']:>6.1f} KB {result['requests']:>4} {result['assets_kb']:>6.1f} KB {thumbs:>10}")
+        for key in exceeded:
+            unit = '' if key == 'requests' else ' KB'
+            print(f"    over budget: {key} {result[key]:.{0 if key == 'requests' else 1}f}{unit} > {budgets[key]}{unit}")
+            over.append(page.name)
+    
+    if not audited:
+        print("⚠ No gallery pages found")
+        return True
+    
+    over = sorted(set(over))
+    if over:
+        print(f"\n✗ {len(over)} of {audited} pages over budget: {', '.join(over)}")
+        return False
+    print(f"\n✓ All {audited} pages within budget")
+    return True
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python audit_pages.py <site_directory|page.html>... [--budgets budgets.json] [--thumbnails DIR]")
+        print("                             [--html-kb N] [--inline-json-kb N] [--requests N] [--thumbnails-kb N]")
+        print("\nExample:")
+        print("  python audit_pages.py .. --thumbnails ../thumbnails --budgets page_budgets.json")
+        print("\nThis will:")
+        print("  - Report each gallery page's HTML size, inline JSON, first-view request")
+        print("    count and first-page thumbnail weight (from local rendition files)")
+        print("  - Exit with status 1 if any page is over its budget")
+        print(f"\nDefault budgets: {', '.join(f'{key} {value}' for key, value in DEFAULT_BUDGETS.items())}")
+        sys.exit(1)
+    
+    paths = []
+    budget_file = None
+    thumbnail_dir = None
+    overrides = {}
+    args = iter(sys.argv[1:])
+    for arg in args:
+        if arg == '--budgets':
+            budget_file = next(args, None)
+        elif arg == '--thumbnails':
+            thumbnail_dir = next(args, None)
+        elif arg.startswith('--') and arg[2:].replace('-', '_') in DEFAULT_BUDGETS:
+            limit = float(next(args, 0))
+            overrides[arg[2:].replace('-', '_')] = int(limit) if limit.is_integer() else limit
+        else:
+            paths.append(arg)
+    
+    ok = audit_pages(paths, budget_file, thumbnail_dir, overrides)
+    sys.exit(0 if ok else 1)
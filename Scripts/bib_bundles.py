@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Build one "download all my photos" zip per race number
+Riders get every photo tagged with their number in a single download.
+
+- Entries are stored, not compressed: JPEGs don't get any smaller
+- Photos are streamed into each zip from the photo folder (or their download
+  URLs when there's no local copy), without staging copies
+- Race numbers are built in parallel
+- Each zip is named <prefix>.bib-<number>.<hash>.zip, the hash covering its
+  photo set (names, sizes and modification times, or URLs), so bibs whose
+  photos haven't changed are skipped and replaced bundles are removed
+"""
+
+import os
+import re
+import csv
+import sys
+import json
+import shutil
+import zipfile
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from gallery_build import content_hash, HASH_LENGTH
+
+BUNDLE_SUFFIX = '.zip'
+
+# Seconds a photo download may stall before its bundle is given up
+DOWNLOAD_TIMEOUT = 60
+
+# Columns a photo's full-size download is taken from, in order of preference
+DOWNLOAD_COLUMNS = ['download_url', 'original_url', 'large_url', 'original_image_url']
+
+
+def race_numbers(row):
+    """Race numbers tagged on a catalog row (race_number_1..10 or race_number)"""
+    numbers = []
+    for i in range(1, 11):
+        value = (row.get(f'race_number_{i}') or '').strip()
+        if value:
+            numbers.append(value)
+    if not numbers and (row.get('race_number') or '').strip():
+        numbers.append(row['race_number'].strip())
+    return numbers
+
+
+def photo_source(row, photos_dir=None):
+    """
+    (name in the zip, local Path or URL) for a catalog row
+    Returns None if the photo has neither a local file nor a download URL
+    """
+    filename = (row.get('filename') or '').strip()
+    if photos_dir and filename and (Path(photos_dir) / filename).is_file():
+        return Path(filename).name, Path(photos_dir) / filename
+    
+    for column in DOWNLOAD_COLUMNS:
+        url = (row.get(column) or '').strip()
+        if url.startswith(('https://', 'http://')):
+            name = Path(filename).name or urllib.parse.unquote(url.split('?')[0].rsplit('/', 1)[-1])
+            return name, url
+    return None
+
+
+def bib_photo_sets(csv_file, photos_dir=None):
+    """
+    {race number: [(name in the zip, source), ...]} from a catalog
+    Returns (photo sets, number of tagged photos without a source)
+    """
+    photo_sets = {}
+    missing = 0
+    with open(csv_file, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            numbers = race_numbers(row)
+            if not numbers:
+                continue
+            source = photo_source(row, photos_dir)
+            if source is None:
+                missing += 1
+                continue
+            for number in dict.fromkeys(numbers):
+                photo_sets.setdefault(number, []).append(source)
+    return photo_sets, missing
+
+
+def unique_names(entries):
+    """Rename duplicate zip entry names (photo.jpg, photo-2.jpg, ...)"""
+    seen = set()
+    renamed = []
+    for name, source in entries:
+        stem, suffix = os.path.splitext(name)
+        candidate, n = name, 1
+        while candidate.lower() in seen:
+            n += 1
+            candidate = f"{stem}-{n}{suffix}"
+        seen.add(candidate.lower())
+        renamed.append((candidate, source))
+    return renamed
+
+
+def bundle_hash(entries):
+    """Fingerprint of a bundle's photo set; local files count by size and mtime"""
+    description = []
+    for name, source in entries:
+        if isinstance(source, Path):
+            stat = source.stat()
+            description.append([name, stat.st_size, stat.st_mtime_ns])
+        else:
+            description.append([name, source])
+    return content_hash(json.dumps(description))
+
+
+def write_bundle(path, entries):
+    """
+    Write a stored (uncompressed) zip of the entries, streaming each photo in
+    Raises OSError naming the photo if a download fails or stalls for
+    DOWNLOAD_TIMEOUT seconds; the partial zip is removed.
+    """
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f, zipfile.ZipFile(f, 'w', compression=zipfile.ZIP_STORED) as bundle:
+            for name, source in entries:
+                if isinstance(source, Path):
+                    bundle.write(source, name)
+                else:
+                    info = zipfile.ZipInfo(name)
+                    try:
+                        with urllib.request.urlopen(source, timeout=DOWNLOAD_TIMEOUT) as response, \
+                                bundle.open(info, 'w') as entry:
+                            shutil.copyfileobj(response, entry, 1 << 20)
+                    except (urllib.error.URLError, TimeoutError) as e:
+                        # HTTPError is a URLError; a stalled read raises TimeoutError
+                        raise OSError(f"could not download {name}: {getattr(e, 'reason', e)}") from e
+        os.chmod(temp_name, 0o644)  # mkstemp files are private; this one gets served
+        os.replace(temp_name, path)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+
+
+def build_bib_bundles(csv_file, bundle_dir, prefix, photos_dir=None, workers=None):
+    """
+    Build the zip bundles for an event and return {race number: filename}
+    
+    Parameters:
+    - csv_file: Tagged catalog (race_number_1..10 and filename / URL columns)
+    - bundle_dir: Folder the zips are written to
+    - prefix: Start of each zip's name, e.g. the page name 'iceman-20251108'
+    - photos_dir: Folder with the photos (by filename); photos not found there
+      are downloaded from their catalog URLs
+    - workers: Bundles built at once (default: CPU count)
+    """
+    bundle_dir = Path(bundle_dir)
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    
+    photo_sets, missing = bib_photo_sets(csv_file, photos_dir)
+    if missing:
+        print(f"⚠ {missing} tagged photos have no local file or download URL, left out of the bundles")
+    
+    # Race numbers can contain anything typed into the catalog; keep filenames safe
+    bundles = {}
+    for number, entries in photo_sets.items():
+        entries = unique_names(entries)
+        safe_number = re.sub(r'[^\w-]', '_', number)
+        bundles[number] = (f"{prefix}.bib-{safe_number}.{bundle_hash(entries)}{BUNDLE_SUFFIX}", entries)
+    
+    stale = [(bundle_dir / filename, entries) for filename, entries in bundles.values()
+             if not (bundle_dir / filename).exists()]
+    
+    failed = set()
+    if stale:
+        def build(item):
+            path, entries = item
+            # A failed bundle is reported and left off the page; the others still build
+            try:
+                write_bundle(path, entries)
+                return None
+            except Exception as e:
+                return f"✗ {path.name}: {e}, skipped"
+        
+        workers = workers or min(len(stale), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for (path, _), error in zip(stale, pool.map(build, stale)):
+                if error:
+                    print(error)
+                    failed.add(path.name)
+    
+    # Bundles for numbers whose photos changed (or were untagged)
+    current = {filename for filename, _ in bundles.values()}
+    bundle_file = re.compile(re.escape(prefix) + r'\.bib-[\w-]+\.[0-9a-f]{%d}' % HASH_LENGTH + re.escape(BUNDLE_SUFFIX) + '$')
+    removed = 0
+    for old_file in bundle_dir.glob(f"{prefix}.bib-*{BUNDLE_SUFFIX}"):
+        if old_file.name not in current and bundle_file.match(old_file.name):
+            old_file.unlink()
+            removed += 1
+    
+    print(f"✓ Bundles: {len(stale) - len(failed)} built, {len(bundles) - len(stale)} unchanged, {removed} removed")
+    if failed:
+        print(f"✗ {len(failed)} bundles failed")
+    
+    return {number: filename for number, (filename, _) in bundles.items() if filename not in failed}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 4:
+        print("Usage: python bib_bundles.py <race_tagging.csv> <bundle_dir> <prefix> [--photos DIR] [--workers N]")
+        print("\nExample:")
+        print("  python bib_bundles.py race_tagging.csv ../bundles iceman-20251108 --photos ./photos/")
+        print("\nThis will:")
+        print("  - Write one zip per race number with all of its photos (stored, not recompressed)")
+        print("  - Take photos from --photos by filename, else download them from their URLs")
+        print("  - Skip race numbers whose photos haven't changed since the last run")
+        print("\nThe race gallery builds these itself with --bundles (see generate_race_gallery.py).")
+        sys.exit(1)
+    
+    photos_dir = None
+    if '--photos' in sys.argv:
+        photos_idx = sys.argv.index('--photos')
+        if photos_idx + 1 < len(sys.argv):
+            photos_dir = sys.argv[photos_idx + 1]
+    
+    workers = None
+    if '--workers' in sys.argv:
+        workers_idx = sys.argv.index('--workers')
+        if workers_idx + 1 < len(sys.argv):
+            workers = int(sys.argv[workers_idx + 1])
+    
+    build_bib_bundles(sys.argv[1], sys.argv[2], sys.argv[3], photos_dir, workers)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Rebuild the event gallery pages listed in a site manifest, skipping pages
+whose inputs haven't changed since the last build
+
+Manifest format (paths are relative to the manifest file):
+{
+  "events": [
+    {"generator": "race", "csv": "csv/iceman-2025.csv", "output": "iceman-20251108.html",
+     "race": "Iceman Cometh", "date": "November 8, 2025", "location": "Traverse City, MI",
+     "discipline": "Mountain Bike", "shards": 32},
+    {"generator": "browse", "csv": "csv/biketoberfest-2025.csv", "output": "biketoberfest-20251004.html",
+     "race": "Biketoberfest", "date": "October 4, 2025", "location": "Northville, MI",
+     "discipline": "Mountain Bike"}
+  ]
+}
+Optional per-event keys match the generator options: inline_data, shards
+(race only), precompress (off by default; see precompress.py for which hosts
+use it), pretty, infinite_scroll, cors_thumbnails. Race
+events can also set "bundles" (folder for per-race-number zips) and "photos"
+(where the photos are), both relative to the manifest.
+
+Unless --no-service-worker is given, sw.js is written next to the manifest
+and every page registers it (see service_worker.py).
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import tempfile
+import contextlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from generate_race_gallery import generate_race_gallery
+from generate_browse_gallery import generate_browse_gallery
+from service_worker import write_service_worker, SERVICE_WORKER_FILE
+from gallery_assets import write_gallery_assets
+from precompress import compress_file
+
+STATE_FILE = '.site_build_state.json'
+
+GENERATORS = {
+    'race': generate_race_gallery,
+    'browse': generate_browse_gallery,
+}
+
+# Code that shapes a page's output; editing any of it rebuilds every page
+TEMPLATE_SOURCES = ['generate_race_gallery.py', 'generate_browse_gallery.py', 'gallery_build.py',
+                    'gallery_assets.py', 'image_markup.py', 'minify.py', 'precompress.py', 'bib_bundles.py',
+                    'service_worker.py']
+
+
+def template_version():
+    """Hash of the generator source files"""
+    scripts_dir = Path(__file__).resolve().parent
+    digest = hashlib.sha256()
+    for name in TEMPLATE_SOURCES:
+        digest.update(name.encode('utf-8'))
+        digest.update((scripts_dir / name).read_bytes())
+    return digest.hexdigest()
+
+
+def file_hash(path, cache):
+    """
+    SHA-256 of a file, reusing the cached value while its size and mtime match
+    cache is {path: {'size', 'mtime_ns', 'sha256'}} and is updated in place
+    """
+    stat = path.stat()
+    entry = cache.get(str(path))
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256']
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    cache[str(path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+    return digest.hexdigest()
+
+
+def folder_signature(path):
+    """Hash of the names, sizes and mtimes of the files in a folder (photos for bundles)"""
+    digest = hashlib.sha256()
+    if path.is_dir():
+        for file in sorted(path.iterdir()):
+            if file.is_file():
+                stat = file.stat()
+                digest.update(f"{file.name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_state(site_dir):
+    """Return the state written by the last build ({} if there is none)"""
+    state_path = site_dir / STATE_FILE
+    if not state_path.exists():
+        return {}
+    with open(state_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(site_dir, state):
+    """Atomically replace the state file"""
+    fd, temp_name = tempfile.mkstemp(dir=site_dir, prefix='.site_build_', suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(temp_name, site_dir / STATE_FILE)
+
+
+def service_worker_url(event, site_dir):
+    """Path of sw.js relative to an event's page"""
+    page_dir = (site_dir / event['output']).parent
+    return Path(os.path.relpath(site_dir / SERVICE_WORKER_FILE, page_dir)).as_posix()
+
+
+def write_shared_assets(events, site_dir):
+    """
+    Write (and precompress) the shared gallery CSS/JS the pages will use, so
+    the worker processes find them complete instead of all writing and
+    compressing the same files at once
+    """
+    variants = {((site_dir / event['output']).parent, not event.get('pretty', False), event.get('precompress', False))
+                for event in events}
+    for output_dir, minify, precompress in sorted(variants):
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for name in write_gallery_assets(output_dir, minify):
+            if precompress:
+                compress_file(output_dir / name)
+
+
+def build_event(event, site_dir, service_worker=True):
+    """
+    Run one event's generator (in a worker process)
+    Returns (ok, output printed by the generator)
+    """
+    generator = GENERATORS[event['generator']]
+    options = {key: event[key] for key in ('inline_data', 'shards', 'precompress', 'pretty', 'infinite_scroll',
+                                           'cors_thumbnails')
+               if key in event}
+    if service_worker:
+        options['service_worker'] = service_worker_url(event, site_dir)
+    for key, option in (('bundles', 'bundle_dir'), ('photos', 'photos_dir')):
+        if event.get(key):
+            options[option] = str(site_dir / event[key])
+    
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            generator(str(site_dir / event['csv']), event['race'], event['date'], event['location'],
+                      str(site_dir / event['output']), event.get('discipline'), **options)
+    except Exception as e:
+        return False, log.getvalue() + f"\n✗ Error: {e}\n"
+    return True, log.getvalue()
+
+
+def build_site(manifest_file, workers=None, force=False, verbose=False, service_worker=True):
+    """
+    Regenerate out-of-date event pages in parallel
+    
+    Parameters:
+    - manifest_file: JSON file listing the events (see module docstring)
+    - workers: Number of pages built at once (default: CPU count)
+    - force: Rebuild every page
+    - verbose: Show each generator's own output
+    - service_worker: Write sw.js and have the pages register it
+    
+    A page is rebuilt when its output is missing or the hash of its inputs
+    (CSV contents, manifest entry, generator code, and the photos of events
+    with bundles) differs from the last build.
+    """
+    start_time = time.perf_counter()
+    manifest_path = Path(manifest_file).resolve()
+    site_dir = manifest_path.parent
+    
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        events = json.load(f)['events']
+    
+    for event in events:
+        missing = [key for key in ('generator', 'csv', 'output', 'race', 'date', 'location') if key not in event]
+        if missing:
+            print(f"✗ Error: Event {event.get('output', '?')} is missing {', '.join(missing)}")
+            return False
+        if event['generator'] not in GENERATORS:
+            print(f"✗ Error: Unknown generator '{event['generator']}' (use {' or '.join(GENERATORS)})")
+            return False
+    
+    state = load_state(site_dir)
+    file_cache = state.get('files', {})
+    pages = state.get('pages', {})
+    template = template_version()
+    
+    # Work out which pages are stale
+    stale = []
+    keys = {}
+    for event in events:
+        csv_path = site_dir / event['csv']
+        if not csv_path.exists():
+            print(f"✗ {event['output']}: CSV not found: {event['csv']}")
+            continue
+        
+        key = hashlib.sha256(json.dumps({
+            'event': event,
+            'csv': file_hash(csv_path, file_cache),
+            'template': template,
+            'service_worker': service_worker,
+            'photos': folder_signature(site_dir / event['photos']) if event.get('bundles') and event.get('photos') else None,
+        }, sort_keys=True).encode('utf-8')).hexdigest()
+        keys[event['output']] = key
+        
+        if force or pages.get(event['output']) != key or not (site_dir / event['output']).exists():
+            stale.append(event)
+    
+    up_to_date = len(keys) - len(stale)
+    if not stale:
+        save_state(site_dir, {'files': file_cache, 'pages': pages})
+        if service_worker:
+            write_service_worker(site_dir, events)  # Event list or worker code may have changed
+        print(f"✓ All {up_to_date} pages up to date ({time.perf_counter() - start_time:.2f}s)")
+        return len(keys) == len(events)
+    
+    print(f"Rebuilding {len(stale)} of {len(events)} pages...")
+    write_shared_assets(stale, site_dir)
+    
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers or min(len(stale), os.cpu_count() or 1)) as pool:
+        futures = {pool.submit(build_event, event, site_dir, service_worker): event for event in stale}
+        for future in as_completed(futures):
+            event = futures[future]
+            ok, log = future.result()
+            if verbose or not ok:
+                print(log.rstrip())
+            if ok:
+                pages[event['output']] = keys[event['output']]
+                print(f"  ✓ {event['output']}")
+            else:
+                pages.pop(event['output'], None)
+                print(f"  ✗ {event['output']}")
+                failed += 1
+    
+    save_state(site_dir, {'files': file_cache, 'pages': pages})
+    if service_worker:
+        write_service_worker(site_dir, events)
+    
+    elapsed = time.perf_counter() - start_time
+    print(f"\n✓ Rebuilt {len(stale) - failed} pages, {up_to_date} up to date ({elapsed:.2f}s)")
+    if failed:
+        print(f"✗ {failed} pages failed")
+    return failed == 0 and len(keys) == len(events)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python build_site.py <site_manifest.json> [--workers N] [--force] [--verbose] [--no-service-worker]")
+        print("\nExample:")
+        print("  python build_site.py ../site_manifest.json")
+        print("\nThis will:")
+        print("  - Hash each event's CSV, manifest entry and the generator code")
+        print("  - Regenerate only the pages whose inputs changed, in parallel")
+        print(f"  - Remember what was built in {STATE_FILE} next to the manifest")
+        print(f"  - Write {SERVICE_WORKER_FILE} so repeat visits load from the browser cache")
+        print("\nUse --force to rebuild every page, --no-service-worker to leave out sw.js.")
+        sys.exit(1)
+    
+    workers = None
+    if '--workers' in sys.argv:
+        workers_idx = sys.argv.index('--workers')
+        if workers_idx + 1 < len(sys.argv):
+            workers = int(sys.argv[workers_idx + 1])
+    
+    ok = build_site(sys.argv[1], workers, force='--force' in sys.argv, verbose='--verbose' in sys.argv,
+                    service_worker='--no-service-worker' not in sys.argv)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Minimal JPEG/EXIF segment reader for race-number keywords
+Reads only the marker segments before the image data, never the pixels
+"""
+
+import struct
+
+USER_COMMENT = 0x9286   # Exif IFD, type UNDEFINED
+XP_KEYWORDS = 0x9c9e    # IFD0, type BYTE (UTF-16LE)
+EXIF_IFD_POINTER = 0x8769
+
+# Bytes reserved for each keyword field when a file has to be rewritten,
+# so later tag corrections can be patched in place
+RESERVED_USER_COMMENT = 128
+RESERVED_XP_KEYWORDS = 256
+
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+
+
+def read_exif_segment(f):
+    """
+    Find the EXIF APP1 segment in an open JPEG file
+    Returns (tiff_offset, tiff_bytes) or (None, None) if there is no EXIF
+    Only the segment headers are read; scanning stops at the image data.
+    """
+    f.seek(0)
+    if f.read(2) != b'\xff\xd8':
+        return None, None
+    
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xff:
+            return None, None
+        if marker[1] in (0xd9, 0xda):
+            # End of image / start of scan: no more metadata
+            return None, None
+        
+        length = struct.unpack('>H', f.read(2))[0]
+        if marker[1] == 0xe1:
+            header = f.read(6)
+            if header == b'Exif\x00\x00':
+                tiff_offset = f.tell()
+                return tiff_offset, f.read(length - 8)
+            f.seek(length - 8, 1)
+        else:
+            f.seek(length - 2, 1)
+
+
+def _read_ifd(tiff, offset, endian):
+    """Return {tag: (type, count, entry_offset)} for one IFD"""
+    entries = {}
+    if offset + 2 > len(tiff):
+        return entries
+    
+    count = struct.unpack(endian + 'H', tiff[offset:offset + 2])[0]
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        if entry + 12 > len(tiff):
+            break
+        tag, type_id, value_count = struct.unpack(endian + 'HHI', tiff[entry:entry + 8])
+        entries[tag] = (type_id, value_count, entry)
+    return entries
+
+
+def find_tag_slots(tiff, tags=(USER_COMMENT, XP_KEYWORDS)):
+    """
+    Locate the value bytes of the given tags inside a TIFF block
+    Returns {tag: (value_offset, capacity)} with offsets relative to the TIFF header
+    """
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        return {}
+    
+    ifd0_offset = struct.unpack(endian + 'I', tiff[4:8])[0]
+    entries = _read_ifd(tiff, ifd0_offset, endian)
+    
+    if EXIF_IFD_POINTER in entries:
+        _, _, entry = entries[EXIF_IFD_POINTER]
+        exif_offset = struct.unpack(endian + 'I', tiff[entry + 8:entry + 12])[0]
+        entries.update(_read_ifd(tiff, exif_offset, endian))
+    
+    slots = {}
+    for tag in tags:
+        if tag not in entries:
+            continue
+        type_id, value_count, entry = entries[tag]
+        capacity = value_count * TYPE_SIZES.get(type_id, 1)
+        if capacity <= 4:
+            value_offset = entry + 8  # Small values live inside the entry itself
+        else:
+            value_offset = struct.unpack(endian + 'I', tiff[entry + 8:entry + 12])[0]
+        slots[tag] = (value_offset, capacity)
+    return slots
+
+
+def encode_keywords(keywords_str):
+    """Return {tag: payload bytes} for the keyword fields this project writes"""
+    return {
+        USER_COMMENT: keywords_str.encode('utf-8'),
+        XP_KEYWORDS: keywords_str.encode('utf-16le') + b'\x00\x00',
+    }
+
+
+def pad_payload(payload, reserved):
+    """Pad a payload with NULs so it keeps spare room for later in-place edits"""
+    return payload + b'\x00' * max(0, reserved - len(payload))
+
+
+def _plan_patch(f, keywords_str):
+    """
+    [(file offset, bytes)] that put keywords_str into an open file's keyword
+    fields, or None if they don't both exist with enough room
+    """
+    payloads = encode_keywords(keywords_str)
+    tiff_offset, tiff = read_exif_segment(f)
+    if tiff is None:
+        return None
+    
+    slots = find_tag_slots(tiff, payloads.keys())
+    if set(slots) != set(payloads):
+        return None
+    
+    writes = []
+    for tag, payload in payloads.items():
+        value_offset, capacity = slots[tag]
+        if len(payload) > capacity or value_offset + capacity > len(tiff):
+            return None
+        writes.append((tiff_offset + value_offset, pad_payload(payload, capacity)))
+    return writes
+
+
+def can_patch_in_place(image_file, keywords_str):
+    """True if patch_keywords_in_place() would succeed (reads the headers only)"""
+    with open(image_file, 'rb') as f:
+        return _plan_patch(f, keywords_str) is not None
+
+
+def patch_keywords_in_place(image_file, keywords_str):
+    """
+    Overwrite the keyword fields of an existing EXIF block without rewriting the file
+    Only succeeds if both fields already exist and the new values fit in their
+    current space (the remainder is NUL-filled). Returns the number of bytes
+    written, or None if the file needs a full rewrite instead.
+    """
+    with open(image_file, 'r+b') as f:
+        writes = _plan_patch(f, keywords_str)
+        if writes is None:
+            return None
+        for offset, data in writes:
+            f.seek(offset)
+            f.write(data)
+    
+    return sum(len(data) for _, data in writes)
+
+
+def decode_keywords(tag, value):
+    """
+    Turn raw UserComment / XPKeywords bytes into a list of race numbers
+    Trailing NUL padding (see RESERVED_*) is ignored
+    """
+    if tag == XP_KEYWORDS:
+        text = value.decode('utf-16le', errors='ignore')
+    else:
+        # UserComment may carry an 8-byte charset header from other tools
+        if value[:8] == b'UNICODE\x00':
+            text = value[8:].decode('utf-16', errors='ignore')
+        else:
+            if value[:8] in (b'ASCII\x00\x00\x00', b'\x00' * 8):
+                value = value[8:]
+            text = value.decode('utf-8', errors='ignore')
+    
+    text = text.split('\x00', 1)[0]
+    return [num.strip() for num in text.replace(';', ',').split(',') if num.strip()]
+
+
+def read_keywords(image_file):
+    """
+    Read race numbers from a photo's EXIF without loading the image data
+    UserComment is preferred; XPKeywords is used if UserComment is empty.
+    """
+    with open(image_file, 'rb') as f:
+        _, tiff = read_exif_segment(f)
+    if tiff is None:
+        return []
+    
+    slots = find_tag_slots(tiff)
+    for tag in (USER_COMMENT, XP_KEYWORDS):
+        if tag not in slots:
+            continue
+        value_offset, capacity = slots[tag]
+        race_numbers = decode_keywords(tag, tiff[value_offset:value_offset + capacity])
+        if race_numbers:
+            return race_numbers
+    return []
@@ -0,0 +1,1088 @@
+#!/usr/bin/env python3
+"""
+Stylesheet and script shared by every gallery page
+Written once per site as gallery.<hash>.css / gallery.<hash>.js so visitors
+moving between events get them from cache; each page only inlines its own
+setup (data loading, search).
+"""
+
+import sys
+from pathlib import Path
+from gallery_build import write_hashed_file, PHOTO_STORE_JS
+from image_markup import render_thumbnail, THUMBNAIL_JS
+from minify import minify_css, minify_js
+
+PHOTOS_PER_PAGE = 100
+
+GALLERY_CSS = '''* {
+    margin: 0;
+    padding: 0;
+    box-sizing: border-box;
+}
+
+body {
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+    background: #1a1a1a;
+    color: #e0e0e0;
+    line-height: 1.6;
+}
+
+nav {
+    background: #0a0a0a;
+    padding: 20px 0;
+    box-shadow: 0 2px 10px rgba(0,0,0,0.5);
+    position: sticky;
+    top: 0;
+    z-index: 1000;
+}
+
+.nav-container {
+    max-width: 1200px;
+    margin: 0 auto;
+    padding: 0 20px;
+    display: flex;
+    justify-content: center;
+    align-items: center;
+}
+
+.nav-links {
+    display: flex;
+    gap: 30px;
+    list-style: none;
+    align-items: center;
+}
+
+.nav-links a {
+    color: #e0e0e0;
+    text-decoration: none;
+    font-weight: 500;
+    transition: color 0.3s;
+    font-size: 1.1em;
+}
+
+.nav-links a:hover {
+    color: #ffffff;
+}
+
+.instagram-link {
+    color: #888;
+    transition: opacity 0.3s;
+    display: inline-flex;
+    align-items: center;
+    outline: none;
+    border: none;
+}
+
+.instagram-link:focus {
+    outline: none;
+}
+
+.instagram-icon {
+    width: 24px;
+    height: 24px;
+    filter: brightness(0.6);
+    display: block;
+    outline: none;
+    border: none;
+}
+
+.breadcrumb {
+    max-width: 1200px;
+    margin: 30px auto 0;
+    padding: 0 20px;
+}
+
+.breadcrumb a {
+    color: #888;
+    text-decoration: none;
+}
+
+.breadcrumb a:hover {
+    color: #fff;
+}
+
+.breadcrumb span {
+    color: #555;
+    margin: 0 10px;
+}
+
+.gallery-section {
+    max-width: 1200px;
+    margin: 50px auto 80px;
+    padding: 0 20px;
+}
+
+.gallery-header {
+    text-align: center;
+    margin-bottom: 50px;
+}
+
+.gallery-header h1 {
+    font-size: 3em;
+    font-weight: 300;
+    letter-spacing: 2px;
+    color: #ffffff;
+    margin-bottom: 10px;
+}
+
+.gallery-header p {
+    font-size: 1.2em;
+    color: #999;
+}
+
+.photo-count {
+    font-size: 1em;
+    color: #666;
+}
+
+.search-box {
+    max-width: 500px;
+    margin: 0 auto 50px;
+    text-align: center;
+}
+
+.search-box input {
+    width: 100%;
+    padding: 15px 20px;
+    font-size: 1.2em;
+    background: #0f0f0f;
+    border: 2px solid #333;
+    border-radius: 8px;
+    color: #fff;
+    text-align: center;
+}
+
+.search-box input:focus {
+    outline: none;
+    border-color: #555;
+}
+
+.search-box label {
+    display: block;
+    margin-bottom: 10px;
+    font-size: 1.1em;
+    color: #aaa;
+}
+
+.bundle-link {
+    display: inline-block;
+    margin-top: 15px;
+    padding: 10px 20px;
+    border: 1px solid #666;
+    border-radius: 25px;
+    color: #fff;
+    text-decoration: none;
+}
+
+.bundle-link:hover {
+    background: rgba(255,255,255,0.1);
+    border-color: #999;
+}
+
+.photo-grid {
+    display: grid;
+    grid-template-columns: repeat(auto-fill, minmax(300px, 1fr));
+    gap: 20px;
+}
+
+.photo-card {
+    background: #0f0f0f;
+    border-radius: 8px;
+    overflow: hidden;
+    border: 1px solid #222;
+    transition: transform 0.3s;
+    display: block;
+    text-decoration: none;
+    color: inherit;
+    cursor: pointer;
+}
+
+.photo-card:hover {
+    transform: translateY(-5px);
+    border-color: #444;
+}
+
+.photo-thumbnail {
+    width: 100%;
+    height: 250px;
+    background: #2a2a2a;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    color: #666;
+    font-size: 3em;
+    position: relative;
+    overflow: hidden;
+}
+
+.photo-thumbnail img {
+    width: 100%;
+    height: 100%;
+    object-fit: cover;
+}
+
+/* Infinite scroll: the script positions the cards near the viewport itself */
+.photo-grid.virtual-grid {
+    display: block;
+    position: relative;
+}
+
+.virtual-grid .photo-card {
+    position: absolute;
+}
+
+.no-results {
+    text-align: center;
+    padding: 60px 20px;
+    color: #666;
+    font-size: 1.2em;
+}
+
+.pagination {
+    display: flex;
+    justify-content: center;
+    align-items: center;
+    gap: 10px;
+    margin: 40px 0;
+    padding: 20px;
+}
+
+.pagination button {
+    background: #2a2a2a;
+    color: #fff;
+    border: 1px solid #444;
+    padding: 10px 20px;
+    border-radius: 5px;
+    cursor: pointer;
+    font-size: 1em;
+    transition: all 0.3s;
+}
+
+.pagination button:hover:not(:disabled) {
+    background: #3a3a3a;
+    border-color: #666;
+}
+
+.pagination button:disabled {
+    opacity: 0.3;
+    cursor: not-allowed;
+}
+
+.pagination .page-info {
+    color: #999;
+    font-size: 1em;
+    margin: 0 15px;
+}
+
+.page-input {
+    background: #2a2a2a;
+    color: #fff;
+    border: 1px solid #444;
+    padding: 10px 12px;
+    border-radius: 5px;
+    font-size: 1em;
+    width: 70px;
+    text-align: center;
+}
+
+.page-input:focus {
+    outline: none;
+    border-color: #666;
+}
+
+/* Hide number input arrows */
+.page-input::-webkit-inner-spin-button,
+.page-input::-webkit-outer-spin-button {
+    -webkit-appearance: none;
+    margin: 0;
+}
+
+.page-input {
+    -moz-appearance: textfield;
+}
+
+footer {
+    background: #0a0a0a;
+    padding: 40px 20px;
+    border-top: 1px solid #222;
+}
+
+.footer-nav {
+    max-width: 1200px;
+    margin: 0 auto;
+    display: flex;
+    justify-content: center;
+    gap: 30px;
+    list-style: none;
+    margin-bottom: 20px;
+}
+
+.footer-nav a {
+    color: #888;
+    text-decoration: none;
+}
+
+.copyright {
+    text-align: center;
+    color: #666;
+    font-size: 0.9em;
+}
+
+/* Lightbox */
+.lightbox {
+    display: none;
+    position: fixed;
+    top: 0;
+    left: 0;
+    width: 100%;
+    height: 100%;
+    background: rgba(0, 0, 0, 0.95);
+    z-index: 9999;
+}
+
+.lightbox.active {
+    display: flex;
+    align-items: center;
+    justify-content: center;
+}
+
+.lightbox-content {
+    max-width: 95%;
+    max-height: 95%;
+    position: relative;
+}
+
+.lightbox-image {
+    max-width: 100%;
+    max-height: 95vh;
+    object-fit: contain;
+    display: block;
+}
+
+.lightbox-close {
+    position: fixed;
+    top: 20px;
+    right: 30px;
+    font-size: 50px;
+    color: #fff;
+    cursor: pointer;
+    background: rgba(0,0,0,0.7);
+    border: none;
+    width: 60px;
+    height: 60px;
+    border-radius: 50%;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    transition: background 0.3s;
+    z-index: 10000;
+}
+
+.lightbox-close:hover {
+    background: rgba(255,255,255,0.2);
+}
+
+.lightbox-nav {
+    position: fixed;
+    top: 50%;
+    transform: translateY(-50%);
+    font-size: 50px;
+    color: #fff;
+    cursor: pointer;
+    background: rgba(0,0,0,0.7);
+    border: none;
+    width: 60px;
+    height: 60px;
+    border-radius: 50%;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    transition: background 0.3s;
+    z-index: 10000;
+}
+
+.lightbox-nav:hover {
+    background: rgba(255,255,255,0.2);
+}
+
+.lightbox-prev { left: 30px; }
+.lightbox-next { right: 30px; }
+
+.lightbox-counter {
+    position: fixed;
+    bottom: 30px;
+    left: 50%;
+    transform: translateX(-50%);
+    background: rgba(0,0,0,0.7);
+    color: #fff;
+    padding: 12px 24px;
+    border-radius: 25px;
+    font-size: 1.1em;
+    z-index: 10000;
+}
+
+.lightbox-download {
+    position: fixed;
+    bottom: 30px;
+    right: 30px;
+    background: rgba(0,0,0,0.7);
+    color: #fff;
+    padding: 12px 24px;
+    border-radius: 25px;
+    border: 1px solid #666;
+    font-size: 1em;
+    font-family: inherit;
+    line-height: 1.5;
+    height: 48px;
+    display: inline-flex;
+    align-items: center;
+    box-sizing: border-box;
+    transition: all 0.3s;
+    z-index: 10000;
+    cursor: pointer;
+}
+
+.lightbox-download:hover {
+    background: rgba(255,255,255,0.2);
+    border-color: #999;
+}
+
+.lightbox-flickr {
+    position: fixed;
+    bottom: 30px;
+    left: 30px;
+    background: rgba(0,0,0,0.7);
+    color: #fff;
+    padding: 12px 24px;
+    border-radius: 25px;
+    border: 1px solid #666;
+    text-decoration: none;
+    font-size: 1em;
+    line-height: 1.5;
+    height: 48px;
+    display: inline-flex;
+    align-items: center;
+    box-sizing: border-box;
+    white-space: nowrap;
+    transition: all 0.3s;
+    z-index: 10000;
+}
+
+.lightbox-flickr:hover {
+    background: rgba(255,255,255,0.2);
+    border-color: #999;
+}
+
+/* Browse pages keep their own lightbox layout */
+.browse-gallery .gallery-header p {
+    margin-bottom: 5px;
+}
+
+.browse-gallery .lightbox {
+    display: none;
+    position: fixed;
+    top: 0;
+    left: 0;
+    width: 100%;
+    height: 100%;
+    background: rgba(0, 0, 0, 0.95);
+    z-index: 9999;
+    justify-content: center;
+    align-items: center;
+}
+
+.browse-gallery .lightbox.active {
+    display: flex;
+}
+
+.browse-gallery .lightbox-content {
+    position: relative;
+    max-width: 90%;
+    max-height: 90%;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+}
+
+.browse-gallery .lightbox-image {
+    max-width: 100%;
+    max-height: 90vh;
+    object-fit: contain;
+}
+
+.browse-gallery .lightbox-close {
+    position: absolute;
+    top: 20px;
+    right: 30px;
+    font-size: 40px;
+    color: #fff;
+    cursor: pointer;
+    background: none;
+    border: none;
+    width: 50px;
+    height: 50px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    border-radius: 50%;
+    transition: background 0.3s;
+}
+
+.browse-gallery .lightbox-close:hover {
+    background: rgba(255, 255, 255, 0.1);
+}
+
+.browse-gallery .lightbox-nav {
+    position: absolute;
+    top: 50%;
+    transform: translateY(-50%);
+    font-size: 40px;
+    color: #fff;
+    cursor: pointer;
+    background: rgba(0, 0, 0, 0.5);
+    border: none;
+    width: 60px;
+    height: 60px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    border-radius: 50%;
+    transition: background 0.3s;
+}
+
+.browse-gallery .lightbox-nav:hover {
+    background: rgba(255, 255, 255, 0.2);
+}
+
+.browse-gallery .lightbox-prev {
+    left: 30px;
+}
+
+.browse-gallery .lightbox-next {
+    right: 30px;
+}
+
+.browse-gallery .lightbox-counter {
+    position: absolute;
+    bottom: 20px;
+    left: 50%;
+    transform: translateX(-50%);
+    color: #fff;
+    font-size: 1.1em;
+    background: rgba(0, 0, 0, 0.7);
+    padding: 10px 20px;
+    border-radius: 20px;
+}
+'''
+
+GALLERY_JS = '''// Pagination, lightbox and downloads shared by every gallery page.
+// The page script adds its photos to photoStore and calls displayPhotos(ids).
+
+const galleryOptions = {
+    // Returns a Promise that loads photos missing from photoStore (sharded pages)
+    loadMissing: null,
+    // Filename offered by downloadImage()
+    downloadName: (photo, index) => `photo-${index + 1}.jpg`
+};
+
+const gallery = document.getElementById('photoGallery');
+// CORS thumbnails (data-cors-thumbnails, see image_markup.py)
+const corsThumbnails = gallery.dataset.corsThumbnails !== undefined;
+const noResults = document.getElementById('noResults');
+const pagination = document.getElementById('pagination');
+const pageInfo = document.getElementById('pageInfo');
+const prevButton = document.getElementById('prevPage');
+const nextButton = document.getElementById('nextPage');
+
+let currentPage = 1;
+let photosPerPage = PHOTOS_PER_PAGE;
+let currentIds = [];  // Photo ids in the current view
+let currentLightboxIndex = 0;
+
+// Cards on screen by photo id. Re-rendering keeps the cards (and loaded
+// images) of photos that are still showing, so narrowing a search doesn't
+// download anything. The generator pre-renders the first page of all photos.
+const cardsById = new Map();
+let renderedKey = '';  // Ids of the cards on screen
+
+// Cards open the lightbox at whatever position they're showing (data-index)
+function initCard(card) {
+    card.addEventListener('click', () => openLightbox(Number(card.dataset.index)));
+    return card;
+}
+
+// Must match render_photo_cards()
+function createCard() {
+    const card = document.createElement('div');
+    const thumbnail = document.createElement('div');
+    card.className = 'photo-card';
+    thumbnail.className = 'photo-thumbnail';
+    card.appendChild(thumbnail);
+    return initCard(card);
+}
+
+if (gallery.dataset.prerendered !== undefined) {
+    Array.from(gallery.children).forEach((card, id) => {
+        card.dataset.index = id;
+        cardsById.set(id, initCard(card));
+    });
+    renderedKey = Array.from(cardsById.keys()).join(',');
+}
+
+// Infinite scroll (data-infinite-scroll on the grid): one long grid instead of
+// pages, with only the rows near the viewport in the DOM. Cards are positioned
+// absolutely and reused for the rows scrolling into view. This bounds the DOM
+// only: photoStore still loads the whole data file, which search and filters need.
+const infiniteScroll = gallery.dataset.infiniteScroll !== undefined;
+
+// Must match .photo-grid (300px columns, 20px gap) and .photo-thumbnail (250px + border)
+const GRID_MIN_COLUMN = 300;
+const GRID_GAP = 20;
+const CARD_HEIGHT = 252;
+const BUFFER_ROWS = 3;  // Rows kept rendered above and below the viewport
+
+let cardPool = [];  // Photo index i is shown by cardPool[i % cardPool.length]
+let poolLayout = '';
+let scrollFrame = 0;
+let waitingForPhotos = false;
+
+function displayPhotos(ids) {
+    currentIds = ids;
+    currentPage = 1;  // Reset to first page
+    if (infiniteScroll && gallery.getBoundingClientRect().top < 0) {
+        document.querySelector('.gallery-section').scrollIntoView({ block: 'start' });
+    }
+    renderPage();
+}
+
+function renderPage() {
+    const ids = currentIds;
+    
+    if (ids.length === 0) {
+        gallery.innerHTML = '';
+        gallery.style.height = '';
+        renderedKey = '';
+        cardsById.clear();
+        cardPool = [];
+        if (noResults) noResults.style.display = 'block';
+        pagination.style.display = 'none';
+        return;
+    }
+    
+    if (noResults) noResults.style.display = 'none';
+    
+    if (infiniteScroll) {
+        pagination.style.display = 'none';
+        renderVisibleRows();
+        return;
+    }
+    
+    // Calculate pagination
+    const totalPages = Math.ceil(ids.length / photosPerPage);
+    const startIndex = (currentPage - 1) * photosPerPage;
+    const endIndex = Math.min(startIndex + photosPerPage, ids.length);
+    const pageIds = ids.slice(startIndex, endIndex);
+    
+    // Sharded pages only hold page 1 of all photos until the full data loads
+    if (galleryOptions.loadMissing && pageIds.some(id => !photoStore.has(id))) {
+        pageInfo.textContent = 'Loading photos...';
+        galleryOptions.loadMissing().then(renderPage);
+        return;
+    }
+    
+    // Update page info
+    pageInfo.textContent = `Page ${currentPage} of ${totalPages} (${ids.length} photos)`;
+    prevButton.disabled = currentPage === 1;
+    nextButton.disabled = currentPage === totalPages;
+    
+    // Show/hide pagination
+    pagination.style.display = totalPages > 1 ? 'flex' : 'none';
+    
+    // Render photos for current page: drop the cards of photos that left,
+    // create cards for new photos and put them all in order
+    const showing = new Set(pageIds);
+    for (const [id, card] of cardsById) {
+        if (!showing.has(id)) {
+            card.remove();
+            cardsById.delete(id);
+        }
+    }
+    
+    let next = gallery.firstChild;
+    pageIds.forEach((id, index) => {
+        let card = cardsById.get(id);
+        if (!card) {
+            card = createCard();
+            card.firstChild.innerHTML = renderThumbnail(photoStore.get(id), index, corsThumbnails);
+            cardsById.set(id, card);
+        }
+        card.dataset.index = startIndex + index;  // Global index for lightbox
+        if (card === next) {
+            next = card.nextSibling;
+        } else {
+            gallery.insertBefore(card, next);
+        }
+    });
+    
+    // Scroll to top of gallery (unless the same photos are still showing)
+    const key = pageIds.join(',');
+    if (key === renderedKey) return;
+    renderedKey = key;
+    document.querySelector('.gallery-section').scrollIntoView({ behavior: 'smooth', block: 'start' });
+}
+
+// Columns, card size and pool size for the current window
+function gridLayout() {
+    const width = gallery.clientWidth;
+    const columns = Math.max(1, Math.floor((width + GRID_GAP) / (GRID_MIN_COLUMN + GRID_GAP)));
+    const visibleRows = Math.ceil(window.innerHeight / (CARD_HEIGHT + GRID_GAP)) + 1;
+    return {
+        columns,
+        columnWidth: (width - GRID_GAP * (columns - 1)) / columns,
+        rowHeight: CARD_HEIGHT + GRID_GAP,
+        poolSize: (visibleRows + 2 * BUFFER_ROWS) * columns
+    };
+}
+
+function poolCard(slot, layout) {
+    if (!cardPool[slot]) {
+        const card = createCard();
+        card.style.width = `${layout.columnWidth}px`;
+        gallery.appendChild(card);
+        cardPool[slot] = card;
+    }
+    return cardPool[slot];
+}
+
+// Infinite scroll: show the rows around the viewport, reusing the cards of
+// rows that scrolled away. A card is only redrawn when its photo changes.
+function renderVisibleRows() {
+    const ids = currentIds;
+    const layout = gridLayout();
+    
+    // First render (replacing the pre-rendered page), resize or rotation
+    const layoutKey = `${layout.columns},${layout.columnWidth},${layout.poolSize}`;
+    if (layoutKey !== poolLayout) {
+        poolLayout = layoutKey;
+        gallery.innerHTML = '';
+        cardsById.clear();
+        gallery.classList.add('virtual-grid');
+        cardPool = new Array(layout.poolSize);
+    }
+    
+    const rows = Math.ceil(ids.length / layout.columns);
+    gallery.style.height = `${Math.max(0, rows * layout.rowHeight - GRID_GAP)}px`;
+    
+    const scrolled = -gallery.getBoundingClientRect().top;
+    const firstRow = Math.max(0, Math.floor(scrolled / layout.rowHeight) - BUFFER_ROWS);
+    const start = Math.min(firstRow * layout.columns, ids.length);
+    const end = Math.min(ids.length, start + layout.poolSize);
+    
+    // Sharded pages only hold page 1 of all photos until the full data loads
+    if (galleryOptions.loadMissing && !waitingForPhotos && ids.slice(start, end).some(id => !photoStore.has(id))) {
+        waitingForPhotos = true;
+        galleryOptions.loadMissing().then(() => {
+            waitingForPhotos = false;
+            renderVisibleRows();
+        });
+    }
+    
+    for (let index = start; index < end; index++) {
+        const card = poolCard(index % layout.poolSize, layout);
+        const photo = photoStore.get(ids[index]);
+        const photoKey = photo ? String(ids[index]) : '';
+        
+        if (card.dataset.index !== String(index)) {
+            card.dataset.index = index;
+            card.style.top = `${Math.floor(index / layout.columns) * layout.rowHeight}px`;
+            card.style.left = `${(index % layout.columns) * (layout.columnWidth + GRID_GAP)}px`;
+        }
+        if (card.dataset.photo !== photoKey) {
+            card.dataset.photo = photoKey;
+            card.firstChild.innerHTML = photo ? renderThumbnail(photo, index, corsThumbnails) : '';
+        }
+        card.style.display = '';
+    }
+    
+    // Slots not needed near the end of the list
+    for (let index = end; index < start + layout.poolSize; index++) {
+        const card = cardPool[index % layout.poolSize];
+        if (card) card.style.display = 'none';
+    }
+}
+
+function scheduleVisibleRows() {
+    if (!scrollFrame) {
+        scrollFrame = requestAnimationFrame(() => {
+            scrollFrame = 0;
+            if (currentIds.length) renderVisibleRows();
+        });
+    }
+}
+
+if (infiniteScroll) {
+    window.addEventListener('scroll', scheduleVisibleRows, { passive: true });
+    window.addEventListener('resize', scheduleVisibleRows);
+}
+
+function changePage(direction) {
+    currentPage += direction;
+    renderPage();
+}
+
+function goToPage() {
+    const input = document.getElementById('pageInput');
+    const pageNum = parseInt(input.value);
+    const totalPages = Math.ceil(currentIds.length / photosPerPage);
+    
+    if (pageNum && pageNum >= 1 && pageNum <= totalPages) {
+        currentPage = pageNum; // currentPage is 1-based, so use pageNum directly
+        renderPage();
+        input.value = ''; // Clear input after navigating
+    } else {
+        alert(`Please enter a page number between 1 and ${totalPages}`);
+    }
+}
+
+// Lightbox functionality
+function showLightboxPhoto() {
+    const photo = photoStore.get(currentIds[currentLightboxIndex]);
+    if (!photo) {
+        // Past the first page on a sharded page: load the rest, then show it
+        if (galleryOptions.loadMissing) galleryOptions.loadMissing().then(showLightboxPhoto);
+        return;
+    }
+    
+    const flickrLink = document.getElementById('lightbox-flickr');
+    
+    // Display large image (_h), download original (_o)
+    document.getElementById('lightbox-image').src = lightboxImageUrl(photo);
+    document.getElementById('lightbox-counter').textContent = `${currentLightboxIndex + 1} / ${currentIds.length}`;
+    if (flickrLink) flickrLink.href = photo.url;
+    
+    prefetchNeighbours();
+}
+
+function lightboxImageUrl(photo) {
+    return photo.original || photo.url;
+}
+
+// The photos either side of the one showing are downloaded and decoded in the
+// background so the arrows don't wait on a multi-MB image. Not done when the
+// browser asks to save data.
+const PREFETCH_CACHE_SIZE = 6;
+const saveData = Boolean(navigator.connection && navigator.connection.saveData);
+const prefetched = new Map();  // URL -> Image, least recently used first
+
+function prefetchImage(url) {
+    const cached = prefetched.get(url);
+    prefetched.delete(url);
+    if (cached) {
+        prefetched.set(url, cached);  // Now the most recently used
+        return;
+    }
+    
+    const image = new Image();
+    image.decoding = 'async';
+    image.src = url;
+    if (image.decode) image.decode().catch(() => {});  // Cancelled or failed: the lightbox will retry
+    prefetched.set(url, image);
+    
+    while (prefetched.size > PREFETCH_CACHE_SIZE) {
+        const [oldUrl, oldImage] = prefetched.entries().next().value;
+        if (!oldImage.complete) oldImage.src = '';
+        prefetched.delete(oldUrl);
+    }
+}
+
+// Stop downloads still running for anything but the given URLs
+function cancelPrefetches(keep = new Set()) {
+    for (const [url, image] of prefetched) {
+        if (!image.complete && !keep.has(url)) {
+            image.src = '';
+            prefetched.delete(url);
+        }
+    }
+}
+
+function prefetchNeighbours() {
+    if (saveData) return;
+    
+    const urls = [];
+    for (const offset of [0, 1, -1]) {
+        const index = (currentLightboxIndex + offset + currentIds.length) % currentIds.length;
+        const photo = photoStore.get(currentIds[index]);
+        if (photo) urls.push(lightboxImageUrl(photo));
+    }
+    
+    // After a jump (a different card, or wrapping around) the old neighbours are far away
+    cancelPrefetches(new Set(urls));
+    urls.slice(1).forEach(prefetchImage);
+}
+
+function openLightbox(index) {
+    currentLightboxIndex = index;
+    showLightboxPhoto();
+    document.getElementById('lightbox').classList.add('active');
+}
+
+function closeLightbox() {
+    document.getElementById('lightbox').classList.remove('active');
+    cancelPrefetches();
+}
+
+function navigateLightbox(direction) {
+    currentLightboxIndex += direction;
+    
+    if (currentLightboxIndex < 0) {
+        currentLightboxIndex = currentIds.length - 1;
+    } else if (currentLightboxIndex >= currentIds.length) {
+        currentLightboxIndex = 0;
+    }
+    
+    showLightboxPhoto();
+}
+
+// Event listeners
+document.getElementById('lightbox-close').addEventListener('click', closeLightbox);
+document.getElementById('lightbox-prev').addEventListener('click', () => navigateLightbox(-1));
+document.getElementById('lightbox-next').addEventListener('click', () => navigateLightbox(1));
+
+// Download function - force download instead of opening in tab
+function downloadImage() {
+    const photo = photoStore.get(currentIds[currentLightboxIndex]);
+    const imageUrl = photo.download || photo.original || photo.url;
+    const filename = galleryOptions.downloadName(photo, currentLightboxIndex);
+    
+    // Same-origin files honour the download attribute, and attachment URLs
+    // (Content-Disposition, see upload_to_b2.py --attachment) save regardless,
+    // so the browser streams these straight to disk
+    if (photo.attachment || new URL(imageUrl, location.href).origin === location.origin) {
+        saveLink(imageUrl, filename);
+        return;
+    }
+    
+    // Other hosts ignore the download attribute: fetch the image and save it
+    // from memory (the only way to avoid it opening in a tab)
+    fetch(imageUrl)
+        .then(response => response.blob())
+        .then(blob => {
+            const url = window.URL.createObjectURL(blob);
+            saveLink(url, filename);
+            window.URL.revokeObjectURL(url);
+        })
+        .catch(error => {
+            console.error('Download failed:', error);
+            // Fallback: open in new tab
+            window.open(imageUrl, '_blank');
+        });
+}
+
+function saveLink(href, filename) {
+    const a = document.createElement('a');
+    a.href = href;
+    a.download = filename;
+    document.body.appendChild(a);
+    a.click();
+    document.body.removeChild(a);
+}
+
+// Keyboard navigation
+document.addEventListener('keydown', (e) => {
+    if (document.getElementById('lightbox').classList.contains('active')) {
+        if (e.key === 'Escape') closeLightbox();
+        if (e.key === 'ArrowLeft') navigateLightbox(-1);
+        if (e.key === 'ArrowRight') navigateLightbox(1);
+    }
+});
+
+// Close when clicking background
+document.getElementById('lightbox').addEventListener('click', (e) => {
+    if (e.target.id === 'lightbox') closeLightbox();
+});
+'''
+
+
+def _dedent_js(js):
+    """Shared JS snippets are written indented for inlining; the bundle isn't"""
+    return '\n'.join(line[8:] for line in js.strip('\n').split('\n'))
+
+
+def gallery_js():
+    """Full shared script: page size, photoStore, thumbnail markup, then pagination/lightbox"""
+    return (f"const PHOTOS_PER_PAGE = {PHOTOS_PER_PAGE};\n\n{_dedent_js(PHOTO_STORE_JS)}\n\n"
+            f"{_dedent_js(THUMBNAIL_JS)}\n\n{GALLERY_JS}")
+
+
+def render_photo_cards(photos, cross_origin=False):
+    """
+    Static HTML for the first page of the grid, so thumbnails start loading
+    before the photo data has arrived
+    The script adopts these cards as photos 0, 1, 2... and keeps them for as
+    long as those photos are showing.
+    """
+    cards = []
+    for index, photo in enumerate(photos[:PHOTOS_PER_PAGE]):
+        # Must match createCard()
+        cards.append(f'''
+                <div class="photo-card">
+                    <div class="photo-thumbnail">
+                        {render_thumbnail(photo, index, cross_origin)}
+                    </div>
+                </div>''')
+    return ''.join(cards)
+
+
+def render_page_info(total, infinite_scroll=False):
+    """Page 1 text and pagination visibility for the pre-rendered grid"""
+    total_pages = max(1, -(-total // PHOTOS_PER_PAGE))
+    display = 'flex' if total_pages > 1 and not infinite_scroll else 'none'
+    return f"Page 1 of {total_pages} ({total} photos)", display
+
+
+def write_gallery_assets(output_dir, minify=True):
+    """
+    Write gallery.<hash>.css and gallery.<hash>.js to output_dir
+    Returns (css_file, js_file). Older versions are kept, since pages built
+    earlier may still reference them.
+    """
+    css, js = GALLERY_CSS, gallery_js()
+    if minify:
+        css, js = minify_css(css), minify_js(js)
+    
+    css_file = write_hashed_file(output_dir, 'gallery', '.css', css, remove_stale=False)
+    js_file = write_hashed_file(output_dir, 'gallery', '.js', js, remove_stale=False)
+    return css_file, js_file
+
+
+def asset_head_html(css_file):
+    """<link> for the shared stylesheet"""
+    return f'    <link rel="stylesheet" href="{css_file}">\n'
+
+
+def asset_script_html(js_file):
+    """<script> for the shared script, placed before the page's own script"""
+    return f'    <script src="{js_file}"></script>\n'
+
+
+def service_worker_html(service_worker):
+    """<script> registering the site's service worker ('' without one)"""
+    if not service_worker:
+        return ''
+    return f'''    <script>
+        if ('serviceWorker' in navigator) {{
+            window.addEventListener('load', () => navigator.serviceWorker.register('{service_worker}'));
+        }}
+    </script>
+'''
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python gallery_assets.py <site_directory> [--pretty]")
+        print("\nWrites gallery.<hash>.css and gallery.<hash>.js (the generators do this automatically)")
+        sys.exit(1)
+    
+    css_file, js_file = write_gallery_assets(sys.argv[1], minify='--pretty' not in sys.argv)
+    print(f"✓ {Path(sys.argv[1]) / css_file}")
+    print(f"✓ {Path(sys.argv[1]) / js_file}")
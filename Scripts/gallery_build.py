@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Shared build helpers for the gallery generators
+"""
+
+import os
+import re
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+from precompress import remove_compressed
+
+HASH_LENGTH = 10
+
+
+def content_hash(data):
+    """Short, stable fingerprint of a file's content"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def write_hashed_file(output_dir, stem, suffix, content, remove_stale=True, keep=()):
+    """
+    Write content to <stem>.<hash><suffix> in output_dir and return the filename
+    Older fingerprinted versions of the same file are removed unless remove_stale
+    is False (names in keep are left alone). Because the name changes whenever
+    the content does, the file can be cached as immutable.
+    """
+    output_dir = Path(output_dir)
+    filename = f"{stem}.{content_hash(content)}{suffix}"
+    
+    if remove_stale:
+        stale = re.compile(re.escape(stem) + r'\.[0-9a-f]{%d}' % HASH_LENGTH + re.escape(suffix) + '$')
+        for old_file in output_dir.glob(f"{stem}.*{suffix}"):
+            if old_file.name != filename and old_file.name not in keep and stale.match(old_file.name):
+                old_file.unlink()
+                remove_compressed(old_file)
+    
+    path = output_dir / filename
+    if not path.exists():
+        # Temp file + rename: pages built in parallel may share this file
+        fd, temp_name = tempfile.mkstemp(dir=output_dir, prefix=f'.{stem}.', suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.chmod(temp_name, 0o644)  # mkstemp files are private; this one gets served
+        os.replace(temp_name, path)
+    return filename
+
+
+def compact_json(data):
+    """JSON without whitespace, for data embedded in or fetched by pages"""
+    return json.dumps(data, separators=(',', ':'))
+
+
+def page_data_files(output_file):
+    """
+    Data files the page currently at output_file refers to, before it's rebuilt
+    Browsers and the CDN keep serving the cached page for a while after a
+    deploy, so these are kept until the build after next.
+    """
+    output_path = Path(output_file)
+    if not output_path.exists():
+        return set()
+    data_file = re.compile(re.escape(output_path.stem) + r'\.(?:[\w-]+\.)?[0-9a-f]{%d}\.json' % HASH_LENGTH)
+    return set(data_file.findall(output_path.read_text(encoding='utf-8')))
+
+
+def write_data_file(output_file, data, part=None):
+    """
+    Write JSON data for a page to <page>[.<part>].<hash>.json and return the filename
+    Versions the current page still uses are kept (see page_data_files()).
+    """
+    output_path = Path(output_file)
+    stem = f"{output_path.stem}.{part}" if part else output_path.stem
+    return write_hashed_file(output_path.parent, stem, '.json', compact_json(data),
+                             keep=page_data_files(output_file))
+
+
+def remove_stale_parts(output_file, keep=()):
+    """
+    Delete <page>.<part>.<hash>.json files left over from an earlier build
+    (e.g. shards from a run with a different --shards count), except those
+    in keep and those the current page still uses
+    """
+    output_path = Path(output_file)
+    keep = set(keep) | page_data_files(output_file)
+    part_file = re.compile(re.escape(output_path.stem) + r'\.[\w-]+\.[0-9a-f]{%d}\.json$' % HASH_LENGTH)
+    for old_file in output_path.parent.glob(f"{output_path.stem}.*.json"):
+        if old_file.name not in keep and part_file.match(old_file.name):
+            old_file.unlink()
+            remove_compressed(old_file)
+
+
+def fetch_json_js(filename):
+    """JS expression that evaluates to a Promise of a JSON file's contents"""
+    return f"fetch('{filename}').then(response => response.json())"
+
+
+def preload_html(filename):
+    """<link> that starts downloading a data file while the page is still parsing"""
+    return f'    <link rel="preload" href="{filename}" as="fetch" crossorigin="anonymous">\n'
+
+
+def write_gallery_data(output_file, data, inline=False, preload=True):
+    """
+    Store a page's photo data and return (head_html, loader_js)
+    
+    By default the data goes to <page>.<hash>.json beside the page, which then
+    only carries a small loader; head_html preloads the file so the download
+    starts while the page is still parsing. With inline=True the data is
+    embedded in the page as before (handy for opening a page from disk).
+    
+    loader_js is an expression that evaluates to a Promise of the data.
+    """
+    if inline:
+        return '', f'Promise.resolve({compact_json(data)})'
+    
+    data_file = write_data_file(output_file, data)
+    size = (Path(output_file).parent / data_file).stat().st_size
+    print(f"✓ Wrote photo data: {data_file} ({size / 1024:.0f} KB)")
+    
+    head_html = preload_html(data_file) if preload else ''
+    return head_html, fetch_json_js(data_file)
+
+
+def _split_url(value):
+    """'https://host/dir/name.jpg' → ('https://host/dir/', 'name', '.jpg')"""
+    slash = value.rfind('/') + 1
+    directory, basename = value[:slash], value[slash:]
+    dot = basename.rfind('.')
+    if dot > 0:
+        return directory, basename[:dot], basename[dot:]
+    return directory, basename, ''
+
+
+def _sequence(values):
+    """
+    Describe values like '1','2','3' or '0007','0008' as {'seq': start, 'pad': width}
+    Returns None if the values aren't a consecutive run of integers
+    """
+    # isdecimal, not isdigit: int() rejects digits like '²' that isdigit accepts
+    if not values or not all(v.isdecimal() for v in values):
+        return None
+    start = int(values[0])
+    pad = len(values[0]) if values[0].startswith('0') else 0
+    for i, value in enumerate(values):
+        if value != str(start + i).zfill(pad):
+            return None
+    return {'seq': start, 'pad': pad}
+
+
+def encode_photos(photos, ids=None):
+    """
+    Column-encode a list of photo dicts for the page's photoStore
+    
+    Shared URL prefixes (host, bucket, event folder and any common filename
+    start) are stored once in 'prefixes', the part that differs per photo goes
+    into a column, and a common extension becomes a suffix. Columns are shared
+    between fields, a field identical to an earlier one is stored as
+    {'same': name}, and consecutive numbers collapse to {'seq': n, 'pad': w}.
+    ids gives each row's photo id when they aren't simply 0, 1, 2...
+    """
+    prefixes = []
+    prefix_lookup = {}
+    columns = []
+    column_lookup = {}
+    
+    def prefix_index(prefix):
+        if prefix not in prefix_lookup:
+            prefix_lookup[prefix] = len(prefixes)
+            prefixes.append(prefix)
+        return prefix_lookup[prefix]
+    
+    def column_index(values):
+        key = tuple(values)
+        if key not in column_lookup:
+            column_lookup[key] = len(columns)
+            columns.append(_sequence(values) or list(values))
+        return column_lookup[key]
+    
+    names = []
+    for photo in photos:
+        names.extend(name for name in photo if name not in names)
+    
+    fields = {}
+    seen = {}
+    for name in names:
+        values = [str(photo.get(name, '')) for photo in photos]
+        key = tuple(values)
+        if key in seen:
+            fields[name] = {'same': seen[key]}
+            continue
+        seen[key] = name
+        
+        if len(set(values)) <= 1:
+            fields[name] = {'const': values[0] if values else ''}
+            continue
+        
+        if not any('/' in value for value in values):
+            fields[name] = {'column': column_index(values)}
+            continue
+        
+        # URL-like: directory prefix + per-photo stem + common extension
+        parts = [_split_url(value) for value in values]
+        directories = [directory for directory, _, _ in parts]
+        suffixes = {suffix for _, _, suffix in parts}
+        if len(suffixes) == 1:
+            suffix = suffixes.pop()
+            stems = [stem for _, stem, _ in parts]
+        else:
+            suffix = ''
+            stems = [stem + ext for _, stem, ext in parts]
+        
+        field = {}
+        if len(set(directories)) == 1:
+            # Fold a common filename start (e.g. 'iceman_') into the prefix too
+            common = os.path.commonprefix(stems)
+            stems = [stem[len(common):] for stem in stems]
+            field['prefix'] = prefix_index(directories[0] + common)
+        else:
+            field['prefixColumn'] = column_index([str(prefix_index(d)) for d in directories])
+        field['column'] = column_index(stems)
+        if suffix:
+            field['suffix'] = suffix
+        fields[name] = field
+    
+    encoded = {'count': len(photos), 'prefixes': prefixes, 'columns': columns, 'fields': fields}
+    if ids is not None and list(ids) != list(range(len(photos))):
+        encoded['ids'] = list(ids)
+    return encoded
+
+
+# Page-side counterpart of encode_photos(): photos are looked up by id and
+# expanded from their columns the first time they're needed
+PHOTO_STORE_JS = '''
+        function columnValue(column, row) {
+            return Array.isArray(column) ? column[row] : String(column.seq + row).padStart(column.pad, '0');
+        }
+        
+        function expandPhoto(encoded, row) {
+            const photo = {};
+            for (const [name, field] of Object.entries(encoded.fields)) {
+                if ('same' in field) {
+                    photo[name] = photo[field.same];
+                } else if ('const' in field) {
+                    photo[name] = field.const;
+                } else {
+                    const prefix = 'prefixColumn' in field ?
+                        encoded.prefixes[columnValue(encoded.columns[field.prefixColumn], row)] :
+                        (encoded.prefixes[field.prefix] || '');
+                    photo[name] = prefix + columnValue(encoded.columns[field.column], row) + (field.suffix || '');
+                }
+            }
+            return photo;
+        }
+        
+        const photoStore = {
+            chunks: [],
+            locations: [],  // photo id → [chunk, row]
+            expanded: [],
+            
+            add(encoded) {
+                const chunk = this.chunks.push(encoded) - 1;
+                for (let row = 0; row < encoded.count; row++) {
+                    const id = encoded.ids ? encoded.ids[row] : row;
+                    if (!this.locations[id]) this.locations[id] = [chunk, row];
+                }
+            },
+            
+            has(id) {
+                return this.locations[id] !== undefined;
+            },
+            
+            get(id) {
+                if (!this.expanded[id] && this.has(id)) {
+                    const [chunk, row] = this.locations[id];
+                    this.expanded[id] = expandPhoto(this.chunks[chunk], row);
+                }
+                return this.expanded[id];
+            }
+        };
+'''
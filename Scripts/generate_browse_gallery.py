@@ -4,13 +4,29 @@ Generate browse-all gallery HTML (no race numbers)
 """
 
 import csv
-import json
-import sys
 import argparse
+from pathlib import Path
+from precompress import precompress_files, page_files, remove_compressed
+from gallery_build import write_gallery_data, encode_photos
+from minify import minify_html
+from image_markup import thumbnail_fields, image_hints_html
+from gallery_assets import (write_gallery_assets, asset_head_html, asset_script_html, service_worker_html,
+                            render_photo_cards, render_page_info)
 
-def generate_browse_gallery(csv_file, race_name, race_date, location, output_file, discipline=None):
+def generate_browse_gallery(csv_file, race_name, race_date, location, output_file, discipline=None,
+                            inline_data=False, precompress=False, pretty=False, infinite_scroll=False,
+                            service_worker=None, cors_thumbnails=False):
     """
     Generate HTML gallery showing all photos (no search)
+    Photo data is written to a separate fingerprinted .json file unless inline_data is set
+    With precompress, .gz/.br copies of the page and data file are written alongside
+    (for hosts that serve them; GitHub Pages doesn't, see precompress.py)
+    Output is minified unless pretty is set
+    With infinite_scroll, photos scroll in one long grid instead of pages of 100
+    (only the DOM is bounded; the whole data file is still loaded)
+    service_worker is the URL of a service worker to register (see build_site.py)
+    With cors_thumbnails, pages with a service worker request thumbnails with CORS
+    so it can cache them (the photo hosts must allow it, see image_markup.py)
     """
     
     # Load photos from CSV
@@ -26,31 +42,42 @@ def generate_browse_gallery(csv_file, race_name, race_date, location, output_fil
             
             if has_large_url:
                 # PUBLIC PHOTOS format (B2 or Flickr)
-                photos.append({
+                photo = {
                     'number': row['photo_number'],
                     'url': row.get('photo_url', ''),
                     'thumbnail': row.get('thumbnail_url', ''),
                     'original': row.get('large_url', ''),
                     'download': row.get('original_url', '')
-                })
+                }
             elif has_guest_pass:
                 # PRIVATE PHOTOS format (guest pass)
-                photos.append({
+                photo = {
                     'number': row['photo_number'],
                     'url': row['guest_pass_url'],
                     'thumbnail': row.get('thumbnail_url', ''),
                     'original': row.get('original_image_url', ''),
                     'download': row.get('original_image_url', '')
-                })
+                }
             elif has_filename:
                 # LOCAL PHOTOS format (testing)
-                photos.append({
+                photo = {
                     'number': row['photo_number'],
                     'url': row['filename'],
                     'thumbnail': row['filename'],
                     'original': row['filename'],
                     'download': row['filename']
-                })
+                }
+            else:
+                continue
+            
+            photo.update(thumbnail_fields(row))  # Optional sizes/renditions for srcset
+            
+            if (row.get('download_url') or '').strip():
+                # Served with Content-Disposition: attachment (upload_to_b2.py --attachment)
+                photo['download'] = row['download_url'].strip()
+                photo['attachment'] = '1'
+            
+            photos.append(photo)
     
     print(f"Loaded {len(photos)} photos from {csv_file}")
     
@@ -71,6 +98,22 @@ def generate_browse_gallery(csv_file, race_name, race_date, location, output_fil
         <span>{race_name}</span>
     </div>'''
     
+    # Photo data goes to its own cacheable file
+    data_head, data_loader = write_gallery_data(output_file, {'photos': encode_photos(photos)}, inline=inline_data)
+    
+    # Stylesheet and script shared with the other gallery pages
+    output_dir = Path(output_file).parent
+    css_file, js_file = write_gallery_assets(output_dir, minify=not pretty)
+    asset_head = asset_head_html(css_file)
+    # CORS thumbnails only help (and only need the bucket's CORS rule) with the worker
+    cross_origin = bool(service_worker and cors_thumbnails)
+    image_hints = image_hints_html(photos, cross_origin)  # Warm up the image hosts, preload the first row
+    asset_script = asset_script_html(js_file) + service_worker_html(service_worker)
+    
+    # Static first page so thumbnails load while the photo data is still downloading
+    first_page_cards = render_photo_cards(photos, cross_origin)
+    page_info, pagination_display = render_page_info(len(photos), infinite_scroll)
+    
     # Generate HTML
     html = f'''<!DOCTYPE html>
 <html lang="en">
@@ -78,505 +121,8 @@ def generate_browse_gallery(csv_file, race_name, race_date, location, output_fil
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{race_name} Photos | Adam Watson Photo</title>
-    <style>
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
-        
-        body {{
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-            background: #1a1a1a;
-            color: #e0e0e0;
-            line-height: 1.6;
-        }}
-        
-        nav {{
-            background: #0a0a0a;
-            padding: 20px 0;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.5);
-            position: sticky;
-            top: 0;
-            z-index: 1000;
-        }}
-        
-        .nav-container {{
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 0 20px;
-            display: flex;
-            justify-content: center;
-            align-items: center;
-        }}
-        
-        .nav-links {{
-            display: flex;
-            gap: 30px;
-            list-style: none;
-            align-items: center;
-        }}
-        
-        .nav-links a {{
-            color: #e0e0e0;
-            text-decoration: none;
-            font-weight: 500;
-            transition: color 0.3s;
-            font-size: 1.1em;
-        }}
-        
-        .nav-links a:hover {{
-            color: #ffffff;
-        }}
-        
-        .instagram-link {{
-            color: #888;
-            transition: opacity 0.3s;
-            display: inline-flex;
-            align-items: center;
-            outline: none;
-            border: none;
-        }}
-        
-        .instagram-link:focus {{
-            outline: none;
-        }}
-        
-        .instagram-icon {{
-            width: 24px;
-            height: 24px;
-            filter: brightness(0.6);
-            display: block;
-            outline: none;
-            border: none;
-        }}
-        
-        .breadcrumb {{
-            max-width: 1200px;
-            margin: 30px auto 0;
-            padding: 0 20px;
-        }}
-        
-        .breadcrumb a {{
-            color: #888;
-            text-decoration: none;
-        }}
-        
-        .breadcrumb a:hover {{
-            color: #fff;
-        }}
-        
-        .breadcrumb span {{
-            color: #555;
-            margin: 0 10px;
-        }}
-        
-        .gallery-section {{
-            max-width: 1200px;
-            margin: 50px auto 80px;
-            padding: 0 20px;
-        }}
-        
-        .gallery-header {{
-            text-align: center;
-            margin-bottom: 50px;
-        }}
-        
-        .gallery-header h1 {{
-            font-size: 3em;
-            font-weight: 300;
-            letter-spacing: 2px;
-            color: #ffffff;
-            margin-bottom: 10px;
-        }}
-        
-        .gallery-header p {{
-            font-size: 1.2em;
-            color: #999;
-            margin-bottom: 5px;
-        }}
-        
-        .photo-count {{
-            font-size: 1em;
-            color: #666;
-        }}
-        
-        .photo-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fill, minmax(300px, 1fr));
-            gap: 20px;
-        }}
-        
-        .photo-card {{
-            background: #0f0f0f;
-            border-radius: 8px;
-            overflow: hidden;
-            border: 1px solid #222;
-            transition: transform 0.3s;
-            display: block;
-            text-decoration: none;
-            color: inherit;
-            cursor: pointer;
-        }}
-        
-        .photo-card:hover {{
-            transform: translateY(-5px);
-            border-color: #444;
-        }}
-        
-        .photo-thumbnail {{
-            width: 100%;
-            height: 250px;
-            background: #2a2a2a;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            color: #666;
-            font-size: 3em;
-            position: relative;
-        }}
-        
-        .photo-thumbnail img {{
-            width: 100%;
-            height: 100%;
-            object-fit: cover;
-        }}
-        
-        footer {{
-            background: #0a0a0a;
-            padding: 40px 20px;
-            border-top: 1px solid #222;
-        }}
-        
-        .footer-nav {{
-            max-width: 1200px;
-            margin: 0 auto;
-            display: flex;
-            justify-content: center;
-            gap: 30px;
-            list-style: none;
-            margin-bottom: 20px;
-        }}
-        
-        .footer-nav a {{
-            color: #888;
-            text-decoration: none;
-        }}
-        
-        .copyright {{
-            text-align: center;
-            color: #666;
-            font-size: 0.9em;
-        }}
-        
-        /* Pagination */
-        .pagination {{
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            gap: 10px;
-            margin: 40px 0;
-            padding: 20px;
-        }}
-        
-        .pagination button {{
-            background: #2a2a2a;
-            color: #fff;
-            border: 1px solid #444;
-            padding: 10px 20px;
-            border-radius: 5px;
-            cursor: pointer;
-            font-size: 1em;
-            transition: all 0.3s;
-        }}
-        
-        .pagination button:hover:not(:disabled) {{
-            background: #3a3a3a;
-            border-color: #666;
-        }}
-        
-        .pagination button:disabled {{
-            opacity: 0.3;
-            cursor: not-allowed;
-        }}
-        
-        .pagination .page-info {{
-            color: #999;
-            font-size: 1em;
-            margin: 0 15px;
-        }}
-        
-        .page-input {{
-            background: #2a2a2a;
-            color: #fff;
-            border: 1px solid #444;
-            padding: 10px 12px;
-            border-radius: 5px;
-            font-size: 1em;
-            width: 70px;
-            text-align: center;
-        }}
-        
-        .page-input:focus {{
-            outline: none;
-            border-color: #666;
-        }}
-        
-        /* Hide number input arrows */
-        .page-input::-webkit-inner-spin-button,
-        .page-input::-webkit-outer-spin-button {{
-            -webkit-appearance: none;
-            margin: 0;
-        }}
-        
-        .page-input {{
-            -moz-appearance: textfield;
-        }}
-        
-        /* Lightbox */
-        .lightbox {{
-            display: none;
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(0, 0, 0, 0.95);
-            z-index: 9999;
-        }}
-        
-        .lightbox.active {{
-            display: flex;
-            align-items: center;
-            justify-content: center;
-        }}
-        
-        .lightbox-content {{
-            max-width: 95%;
-            max-height: 95%;
-            position: relative;
-        }}
-        
-        .lightbox-image {{
-            max-width: 100%;
-            max-height: 95vh;
-            object-fit: contain;
-            display: block;
-        }}
-        
-        .lightbox-close {{
-            position: fixed;
-            top: 20px;
-            right: 30px;
-            font-size: 50px;
-            color: #fff;
-            cursor: pointer;
-            background: rgba(0,0,0,0.7);
-            border: none;
-            width: 60px;
-            height: 60px;
-            border-radius: 50%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            transition: background 0.3s;
-            z-index: 10000;
-        }}
-        
-        .lightbox-close:hover {{
-            background: rgba(255,255,255,0.2);
-        }}
-        
-        .lightbox-nav {{
-            position: fixed;
-            top: 50%;
-            transform: translateY(-50%);
-            font-size: 50px;
-            color: #fff;
-            cursor: pointer;
-            background: rgba(0,0,0,0.7);
-            border: none;
-            width: 60px;
-            height: 60px;
-            border-radius: 50%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            transition: background 0.3s;
-            z-index: 10000;
-        }}
-        
-        .lightbox-nav:hover {{
-            background: rgba(255,255,255,0.2);
-        }}
-        
-        .lightbox-prev {{ left: 30px; }}
-        .lightbox-next {{ right: 30px; }}
-        
-        .lightbox-counter {{
-            position: fixed;
-            bottom: 30px;
-            left: 50%;
-            transform: translateX(-50%);
-            background: rgba(0,0,0,0.7);
-            color: #fff;
-            padding: 12px 24px;
-            border-radius: 25px;
-            font-size: 1.1em;
-            z-index: 10000;
-        }}
-        
-        .lightbox-download {{
-            position: fixed;
-            bottom: 30px;
-            right: 30px;
-            background: rgba(0,0,0,0.7);
-            color: #fff;
-            padding: 12px 24px;
-            border-radius: 25px;
-            border: 1px solid #666;
-            font-size: 1em;
-            font-family: inherit;
-            line-height: 1.5;
-            height: 48px;
-            display: inline-flex;
-            align-items: center;
-            box-sizing: border-box;
-            transition: all 0.3s;
-            z-index: 10000;
-            cursor: pointer;
-        }}
-        
-        .lightbox-download:hover {{
-            background: rgba(255,255,255,0.2);
-            border-color: #999;
-        }}
-        
-        .lightbox-flickr {{
-            position: fixed;
-            bottom: 30px;
-            left: 30px;
-            background: rgba(0,0,0,0.7);
-            color: #fff;
-            padding: 12px 24px;
-            border-radius: 25px;
-            border: 1px solid #666;
-            text-decoration: none;
-            font-size: 1em;
-            line-height: 1.5;
-            height: 48px;
-            display: inline-flex;
-            align-items: center;
-            box-sizing: border-box;
-            white-space: nowrap;
-            transition: all 0.3s;
-            z-index: 10000;
-        }}
-        
-        .lightbox-flickr:hover {{
-            background: rgba(255,255,255,0.2);
-            border-color: #999;
-        }}
-        
-        /* Lightbox Styles */
-        .lightbox {{
-            display: none;
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(0, 0, 0, 0.95);
-            z-index: 9999;
-            justify-content: center;
-            align-items: center;
-        }}
-        
-        .lightbox.active {{
-            display: flex;
-        }}
-        
-        .lightbox-content {{
-            position: relative;
-            max-width: 90%;
-            max-height: 90%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-        }}
-        
-        .lightbox-image {{
-            max-width: 100%;
-            max-height: 90vh;
-            object-fit: contain;
-        }}
-        
-        .lightbox-close {{
-            position: absolute;
-            top: 20px;
-            right: 30px;
-            font-size: 40px;
-            color: #fff;
-            cursor: pointer;
-            background: none;
-            border: none;
-            width: 50px;
-            height: 50px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            border-radius: 50%;
-            transition: background 0.3s;
-        }}
-        
-        .lightbox-close:hover {{
-            background: rgba(255, 255, 255, 0.1);
-        }}
-        
-        .lightbox-nav {{
-            position: absolute;
-            top: 50%;
-            transform: translateY(-50%);
-            font-size: 40px;
-            color: #fff;
-            cursor: pointer;
-            background: rgba(0, 0, 0, 0.5);
-            border: none;
-            width: 60px;
-            height: 60px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            border-radius: 50%;
-            transition: background 0.3s;
-        }}
-        
-        .lightbox-nav:hover {{
-            background: rgba(255, 255, 255, 0.2);
-        }}
-        
-        .lightbox-prev {{
-            left: 30px;
-        }}
-        
-        .lightbox-next {{
-            right: 30px;
-        }}
-        
-        .lightbox-counter {{
-            position: absolute;
-            bottom: 20px;
-            left: 50%;
-            transform: translateX(-50%);
-            color: #fff;
-            font-size: 1.1em;
-            background: rgba(0, 0, 0, 0.7);
-            padding: 10px 20px;
-            border-radius: 20px;
-        }}
-    </style>
-</head>
-<body>
+{image_hints}{asset_head}{data_head}</head>
+<body class="browse-gallery">
     <nav>
         <div class="nav-container">
             <ul class="nav-links">
@@ -598,16 +144,16 @@ def generate_browse_gallery(csv_file, race_name, race_date, location, output_fil
             <p class="photo-count">{len(photos)} photos</p>
         </div>
         
-        <div id="photoGallery" class="photo-grid">
-            <!-- Photos will be inserted here by JavaScript -->
+        <!-- First page rendered here; JavaScript takes over for paging -->
+        <div id="photoGallery" class="photo-grid" data-prerendered{' data-infinite-scroll' if infinite_scroll else ''}{' data-cors-thumbnails' if cross_origin else ''}>{first_page_cards}
         </div>
         
-        <div id="pagination" class="pagination" style="display: none;">
-            <button id="prevPage" onclick="changePage(-1)">← Previous</button>
-            <span class="page-info" id="pageInfo">Page 1 of 1</span>
+        <div id="pagination" class="pagination" style="display: {pagination_display};">
+            <button id="prevPage" onclick="changePage(-1)" disabled>← Previous</button>
+            <span class="page-info" id="pageInfo">{page_info}</span>
             <input type="number" id="pageInput" class="page-input" min="1" onkeypress="if(event.key === 'Enter') goToPage()">
             <button onclick="goToPage()">Go</button>
-            <button id="nextPage" onclick="changePage(1)">Next →</button>
+            <button id="nextPage" onclick="changePage(1)"{' disabled' if pagination_display == 'none' else ''}>Next →</button>
         </div>
     </section>
 
@@ -635,182 +181,45 @@ def generate_browse_gallery(csv_file, race_name, race_date, location, output_fil
         <p class="copyright">&copy; 2025 Adam Watson Photo. All rights reserved.</p>
     </footer>
 
-    <script>
-        const photos = '''
+{asset_script}    <script>
+        // Load photo data, then show every photo
+        '''
     
-    # Insert the JSON data
-    html += json.dumps(photos, indent=8)
+    html += data_loader
     
-    html += ''';
-        const gallery = document.getElementById('photoGallery');
-        const pagination = document.getElementById('pagination');
-        const pageInfo = document.getElementById('pageInfo');
-        const prevButton = document.getElementById('prevPage');
-        const nextButton = document.getElementById('nextPage');
-        
-        let currentPage = 1;
-        let photosPerPage = 100;
-        let currentLightboxIndex = 0;
-        
-        // Render photos with pagination
-        function renderPage() {
-            const totalPages = Math.ceil(photos.length / photosPerPage);
-            const startIndex = (currentPage - 1) * photosPerPage;
-            const endIndex = Math.min(startIndex + photosPerPage, photos.length);
-            const pagePhotos = photos.slice(startIndex, endIndex);
-            
-            // Update page info
-            pageInfo.textContent = `Page ${currentPage} of ${totalPages} (${photos.length} photos)`;
-            prevButton.disabled = currentPage === 1;
-            nextButton.disabled = currentPage === totalPages;
-            
-            // Show/hide pagination
-            pagination.style.display = totalPages > 1 ? 'flex' : 'none';
-            
-            // Render photos for current page
-            gallery.innerHTML = pagePhotos.map((photo, index) => {
-                const actualIndex = startIndex + index;  // Global index for lightbox
-                const thumbnail = photo.thumbnail || '';
-                return `
-                <div class="photo-card" onclick="openLightbox(${actualIndex})">
-                    <div class="photo-thumbnail">
-                        ${thumbnail ? `<img src="${thumbnail}" alt="Race photo">` : '📷'}
-                    </div>
-                </div>
-                `;
-            }).join('');
-            
-            // Scroll to top of gallery
-            document.querySelector('.gallery-section').scrollIntoView({ behavior: 'smooth', block: 'start' });
-        }
-        
-        function changePage(direction) {
-            currentPage += direction;
-            renderPage();
-        }
-        
-        function goToPage() {
-            const input = document.getElementById('pageInput');
-            const pageNum = parseInt(input.value);
-            const totalPages = Math.ceil(photos.length / photosPerPage);
-            
-            if (pageNum && pageNum >= 1 && pageNum <= totalPages) {
-                currentPage = pageNum; // currentPage is 1-based, so use pageNum directly
-                renderPage();
-                input.value = ''; // Clear input after navigating
-            } else {
-                alert(`Please enter a page number between 1 and ${totalPages}`);
-            }
-        }
-        
-        // Initialize gallery
-        renderPage();
-        
-        // Verify photos loaded
-        console.log('Total photos loaded:', photos.length);
-        if (photos.length > 0) {
-            console.log('First photo:', photos[0]);
-        }
-        
-        function openLightbox(index) {
-            console.log('Opening lightbox for photo', index);
-            currentLightboxIndex = index;
-            const photo = photos[index];
-            console.log('Photo data:', photo);
-            const lightbox = document.getElementById('lightbox');
-            const lightboxImage = document.getElementById('lightbox-image');
-            const counter = document.getElementById('lightbox-counter');
-            const download = document.getElementById('lightbox-download');
-            const flickrLink = document.getElementById('lightbox-flickr');
-            
-            // Use original image URL if available
-            const imageUrl = photo.original || photo.url;
-            console.log('Image URL:', imageUrl);
-            lightboxImage.src = imageUrl;
-            counter.textContent = `${index + 1} / ${photos.length}`;
-            download.href = photo.download || imageUrl;
-            flickrLink.href = photo.url;
-            
-            lightbox.classList.add('active');
-        }
-        
-        function closeLightbox() {
-            document.getElementById('lightbox').classList.remove('active');
-        }
-        
-        function navigateLightbox(direction) {
-            currentLightboxIndex += direction;
-            
-            if (currentLightboxIndex < 0) {
-                currentLightboxIndex = photos.length - 1;
-            } else if (currentLightboxIndex >= photos.length) {
-                currentLightboxIndex = 0;
-            }
-            
-            const photo = photos[currentLightboxIndex];
-            const lightboxImage = document.getElementById('lightbox-image');
-            const counter = document.getElementById('lightbox-counter');
-            const download = document.getElementById('lightbox-download');
-            const flickrLink = document.getElementById('lightbox-flickr');
-            
-            const imageUrl = photo.original || photo.url;
-            lightboxImage.src = imageUrl;
-            counter.textContent = `${currentLightboxIndex + 1} / ${photos.length}`;
-            download.href = photo.download || imageUrl;
-            flickrLink.href = photo.url;
-        }
-        
-        // Event listeners
-        document.getElementById('lightbox-close').addEventListener('click', closeLightbox);
-        document.getElementById('lightbox-prev').addEventListener('click', () => navigateLightbox(-1));
-        document.getElementById('lightbox-next').addEventListener('click', () => navigateLightbox(1));
-        
-        // Download function - force download instead of opening in tab
-        function downloadImage() {
-            const photo = photos[currentLightboxIndex];
-            const imageUrl = photo.download || photo.original || photo.url;
-            
-            // Fetch the image and trigger download
-            fetch(imageUrl)
-                .then(response => response.blob())
-                .then(blob => {
-                    const url = window.URL.createObjectURL(blob);
-                    const a = document.createElement('a');
-                    a.href = url;
-                    a.download = `photo-${currentLightboxIndex + 1}.jpg`;
-                    document.body.appendChild(a);
-                    a.click();
-                    window.URL.revokeObjectURL(url);
-                    document.body.removeChild(a);
-                })
-                .catch(error => {
-                    console.error('Download failed:', error);
-                    // Fallback: open in new tab
-                    window.open(imageUrl, '_blank');
-                });
-        }
-        
-        // Keyboard navigation
-        document.addEventListener('keydown', (e) => {
-            if (document.getElementById('lightbox').classList.contains('active')) {
-                if (e.key === 'Escape') closeLightbox();
-                if (e.key === 'ArrowLeft') navigateLightbox(-1);
-                if (e.key === 'ArrowRight') navigateLightbox(1);
-            }
-        });
-        
-        document.getElementById('lightbox').addEventListener('click', (e) => {
-            if (e.target.id === 'lightbox') closeLightbox();
-        });
+    html += '''
+            .then(data => {
+                photoStore.add(data.photos);
+                displayPhotos(Array.from({ length: data.photos.count }, (_, id) => id));
+                
+                // Verify photos loaded
+                console.log('Total photos loaded:', data.photos.count);
+                if (data.photos.count > 0) {
+                    console.log('First photo:', photoStore.get(0));
+                }
+            })
+            .catch(error => {
+                console.error('Failed to load photos:', error);
+                gallery.textContent = 'Photos could not be loaded. Please refresh the page.';
+            });
     </script>
 </body>
 </html>'''
     
+    if not pretty:
+        html = minify_html(html)
+    
     # Write HTML file
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write(html)
     
     print(f"\n✓ Generated: {output_file}")
+    
+    if precompress:
+        precompress_files(page_files(output_file) + [output_dir / css_file, output_dir / js_file])
+    else:
+        # Copies from an earlier --precompress build would be out of date
+        remove_compressed(output_file)
     print(f"\nGallery contains {len(photos)} photos")
     print(f"\nUpload to your website!")
 
@@ -823,6 +232,23 @@ if __name__ == '__main__':
     parser.add_argument('--location', required=True, help='Race location')
     parser.add_argument('--discipline', help='Cycling discipline (e.g., "Mountain Bike", "Road")')
     parser.add_argument('--output', required=True, help='Output HTML filename')
+    parser.add_argument('--inline-data', action='store_true',
+                        help='Embed photo data in the page instead of a separate .json file (for opening from disk)')
+    parser.add_argument('--precompress', action='store_true',
+                        help='Also write .gz/.br copies of the page and its data files, for hosts that '
+                             'serve precompressed files (nginx gzip_static, Caddy, Netlify). GitHub Pages '
+                             'ignores them and compresses on the fly, so leave this off there')
+    parser.add_argument('--pretty', action='store_true',
+                        help="Don't minify the page and shared CSS/JS (easier to debug)")
+    parser.add_argument('--infinite-scroll', action='store_true',
+                        help='Show photos in one long scrolling grid instead of pages of 100. '
+                             'Only the DOM is bounded (rows near the viewport); the full photo data '
+                             'file is still downloaded after the first page, as in paged mode')
+    parser.add_argument('--service-worker',
+                        help='URL of a service worker for the page to register (build_site.py writes sw.js)')
+    parser.add_argument('--cors-thumbnails', action='store_true',
+                        help='Request thumbnails with CORS so the service worker caches them '
+                             '(the photo bucket needs a CORS rule, see service_worker.py)')
     
     args = parser.parse_args()
     
@@ -832,5 +258,11 @@ if __name__ == '__main__':
         args.date,
         args.location,
         args.output,
-        args.discipline
+        args.discipline,
+        args.inline_data,
+        args.precompress,
+        args.pretty,
+        args.infinite_scroll,
+        args.service_worker,
+        args.cors_thumbnails
     )
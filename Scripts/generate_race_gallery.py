@@ -3,20 +3,203 @@
 Generate searchable race gallery HTML from tagged CSV
 """
 
+import os
 import csv
-import sys
-import json
 import argparse
-from datetime import datetime
+from pathlib import Path
+from precompress import precompress_files, page_files, remove_compressed
+from gallery_build import (write_gallery_data, write_data_file, remove_stale_parts,
+                           compact_json, preload_html, encode_photos)
+from minify import minify_html, minify_js
+from image_markup import thumbnail_fields, image_hints_html
+from bib_bundles import build_bib_bundles
+from gallery_assets import (write_gallery_assets, asset_head_html, asset_script_html, service_worker_html,
+                            render_photo_cards, render_page_info, PHOTOS_PER_PAGE)
 
-def generate_race_gallery(csv_file, race_name, race_date, location, output_file, discipline=None):
+
+# Race number search, run in a Web Worker so typing doesn't wait on it (or on
+# the page itself where workers aren't available). The page sends race
+# number → photo id data as files load and gets back the photo ids of each
+# search (and how many of them are exact race number matches), plus the
+# shards it still has to load for it.
+SEARCH_WORKER_JS = '''
+        const raceIndex = {};
+        let bibList = [];  // Sorted race numbers
+        let shardCount = 0;
+        const loadedShards = new Set();
+        let complete = false;  // Full data loaded
+        
+        function idsForRaceNumbers(raceNumbers) {
+            const ids = new Set();
+            for (const raceNumber of raceNumbers) {
+                for (const id of raceIndex[raceNumber] || []) ids.add(id);
+            }
+            return [...ids].sort((a, b) => a - b);
+        }
+        
+        // Which shard file holds a race number (FNV-1a, same as the generator)
+        function shardFor(raceNumber) {
+            let hash = 0x811c9dc5;
+            for (let i = 0; i < raceNumber.length; i++) {
+                hash = Math.imul(hash ^ raceNumber.charCodeAt(i), 0x01000193) >>> 0;
+            }
+            return hash % shardCount;
+        }
+        
+        // Binary search: index of the first race number >= value
+        function lowerBound(value) {
+            let low = 0;
+            let high = bibList.length;
+            while (low < high) {
+                const mid = (low + high) >> 1;
+                if (bibList[mid] < value) low = mid + 1;
+                else high = mid;
+            }
+            return low;
+        }
+        
+        const MAX_RANGE = 5000;
+        
+        // "12" matches 12 and every race number starting with 12, "123, 456" matches
+        // both, "100-150" a range. Returns { exact, prefixed } race numbers; in plain
+        // string order each prefix is one run of bibList, so a term costs O(log n + matches)
+        function searchRaceNumbers(query) {
+            const exact = [];
+            const prefixed = [];
+            const terms = query.replace(/\\s*-\\s*/g, '-').split(/[\\s,;]+/).filter(Boolean);
+            
+            for (const term of terms) {
+                const range = /^(\\d+)-(\\d+)$/.exec(term);
+                if (range) {
+                    const first = parseInt(range[1]);
+                    const last = parseInt(range[2]);
+                    for (let n = first; n <= last && n - first < MAX_RANGE; n++) {
+                        const raceNumber = String(n);
+                        if (bibList[lowerBound(raceNumber)] === raceNumber) exact.push(raceNumber);
+                    }
+                    continue;
+                }
+                
+                for (let i = lowerBound(term); i < bibList.length && bibList[i].startsWith(term); i++) {
+                    (bibList[i] === term ? exact : prefixed).push(bibList[i]);
+                }
+            }
+            return { exact, prefixed };
+        }
+        
+        // { raceIndex, bibs, shardCount, shard, complete } adds data; { search, id } runs a search
+        self.onmessage = event => {
+            const message = event.data;
+            if (message.search === undefined) {
+                Object.assign(raceIndex, message.raceIndex || {});
+                if (message.bibs) bibList = message.bibs;
+                if (message.shardCount) shardCount = message.shardCount;
+                if (message.shard !== undefined) loadedShards.add(message.shard);
+                if (message.complete) complete = true;
+                return;
+            }
+            
+            // Exact race numbers first, then longer ones starting with what was typed
+            const { exact, prefixed } = searchRaceNumbers(message.search);
+            const exactIds = idsForRaceNumbers(exact);
+            const seen = new Set(exactIds);
+            const ids = exactIds.concat(idsForRaceNumbers(prefixed).filter(id => !seen.has(id)));
+            
+            const shards = complete || !shardCount ? [] :
+                [...new Set(exact.concat(prefixed).map(shardFor))].filter(shard => !loadedShards.has(shard));
+            self.postMessage({ id: message.id, ids, exactCount: exactIds.length, shards });
+        };
+'''
+
+
+def shard_for(race_number, shard_count):
+    """
+    FNV-1a hash of a race number, bucketed into shard_count files
+    Must match shardFor() in SEARCH_WORKER_JS
+    """
+    h = 0x811c9dc5
+    for ch in race_number:
+        h = ((h ^ ord(ch)) * 0x01000193) & 0xffffffff
+    return h % shard_count
+
+
+def write_race_shards(output_file, photos, race_index, shard_count, bundles=None):
+    """
+    Split race gallery data into per-bib shard files plus a first-page file
+    Each shard carries the zip bundle URLs of its race numbers (if any)
+    Returns (head_html, directory) where directory is the small index the page
+    embeds to find which file holds a race number
+    """
+    buckets = [{} for _ in range(shard_count)]
+    for race_num, photo_ids in race_index.items():
+        buckets[shard_for(race_num, shard_count)][race_num] = photo_ids
+    
+    shard_data = []
+    for bucket_index in buckets:
+        ids = sorted({photo_id for photo_ids in bucket_index.values() for photo_id in photo_ids})
+        shard_data.append({
+            'photos': encode_photos([photos[i] for i in ids], ids),
+            'raceIndex': bucket_index
+        })
+        if bundles:
+            shard_data[-1]['bundles'] = {race_num: bundles[race_num] for race_num in bucket_index if race_num in bundles}
+    
+    shard_files = [write_data_file(output_file, data, f'shard-{i:02d}') for i, data in enumerate(shard_data)]
+    
+    # The first page of "all photos" gets its own small file
+    first_page = {'photos': encode_photos(photos[:PHOTOS_PER_PAGE])}
+    first_page_file = write_data_file(output_file, first_page, 'page-1')
+    
+    remove_stale_parts(output_file, keep=set(shard_files) | {first_page_file})
+    
+    largest = max(len(compact_json(data)) for data in shard_data) if shard_data else 0
+    print(f"✓ Wrote {shard_count} shards (largest {largest / 1024:.0f} KB) + first page file {first_page_file}")
+    
+    directory = {
+        'total': len(photos),
+        'firstPage': first_page_file,
+        'shards': shard_files,
+        'bibs': sorted(race_index)  # Plain string order, see searchRaceNumbers()
+    }
+    return preload_html(first_page_file), directory
+
+def generate_race_gallery(csv_file, race_name, race_date, location, output_file, discipline=None,
+                          inline_data=False, shards=0, precompress=False, pretty=False,
+                          infinite_scroll=False, service_worker=None, bundle_dir=None, photos_dir=None,
+                          cors_thumbnails=False):
     """
     Generate HTML gallery with race number search functionality
     Supports multi-person photos (up to 10 race numbers per photo)
+    Photo data is written to a separate fingerprinted .json file unless inline_data is set
+    
+    With shards > 0, race numbers are also split into that many hash-bucketed
+    files so a search only downloads the shard holding that race number, and
+    the first page of all photos loads from its own file. The full data file
+    is then only fetched when a visitor pages past page 1.
+    
+    With precompress, .gz/.br copies of the page and data files are written
+    alongside them for hosts that serve precompressed files (not GitHub Pages,
+    see precompress.py). The page and shared CSS/JS are minified unless
+    pretty is set.
+    
+    With infinite_scroll, the grid is one long scrolling list (only the rows
+    near the viewport are kept in the page) instead of pages of 100. Only the
+    DOM is bounded: the full data file is still loaded, since search needs it.
+    service_worker is the URL of a service worker for the page to register
+    (build_site.py writes one). With cors_thumbnails, thumbnails are then
+    requested with CORS so the worker can cache them (the photo hosts must
+    allow it, see image_markup.py).
+    
+    With bundle_dir, a zip of each race number's photos is built there (see
+    bib_bundles.py; photos come from photos_dir or their download URLs) and a
+    search for that number offers it as one download.
     """
     
     # Load CSV data
+    # One record per photo; multi-person shots are listed once and
+    # referenced from each of their race numbers in race_index
     photos = []
+    race_index = {}
     with open(csv_file, 'r', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         for row in reader:
@@ -34,17 +217,14 @@ def generate_race_gallery(csv_file, race_name, race_date, location, output_file,
                     if col_name in row and row[col_name].strip():
                         race_numbers.append(row[col_name].strip())
                 
-                # Create one entry per race number (multi-person support)
-                for race_num in race_numbers:
-                    photos.append({
-                        'number': row['photo_number'],
-                        'url': row.get('photo_url', ''),
-                        'thumbnail': row.get('thumbnail_url', ''),
-                        'original': row.get('large_url', ''),  # Use large_url for lightbox
-                        'download': row.get('original_url', ''),  # Use original_url for download
-                        'race_number': race_num,
-                        'all_race_numbers': ','.join(race_numbers)
-                    })
+                photo = {
+                    'number': row['photo_number'],
+                    'url': row.get('photo_url', ''),
+                    'thumbnail': row.get('thumbnail_url', ''),
+                    'original': row.get('large_url', ''),  # Use large_url for lightbox
+                    'download': row.get('original_url', ''),  # Use original_url for download
+                    'all_race_numbers': ','.join(race_numbers)
+                }
                 
             elif 'filename' in row:
                 # LOCAL IMAGES format (generated from local files BEFORE Flickr upload)
@@ -57,51 +237,67 @@ def generate_race_gallery(csv_file, race_name, race_date, location, output_file,
                     if col_name in row and row[col_name].strip():
                         race_numbers.append(row[col_name].strip())
                 
-                # Create one entry per race number (multi-person support)
-                for race_num in race_numbers:
-                    photos.append({
-                        'number': row['photo_number'],
-                        'filename': row['filename'],
-                        'url': '',  # Will be filled after Flickr upload
-                        'thumbnail': '',  # Will be filled after Flickr upload
-                        'original': '',
-                        'download': '',
-                        'race_number': race_num,
-                        'all_race_numbers': ','.join(race_numbers)
-                    })
+                photo = {
+                    'number': row['photo_number'],
+                    'filename': row['filename'],
+                    'url': '',  # Will be filled after Flickr upload
+                    'thumbnail': '',  # Will be filled after Flickr upload
+                    'original': '',
+                    'download': '',
+                    'all_race_numbers': ','.join(race_numbers)
+                }
                 
             elif 'race_number' in row and row['race_number'].strip():
                 # PRIVATE PHOTOS format (guest pass) - single race number only
-                photos.append({
+                race_numbers = [row['race_number'].strip()]
+                photo = {
                     'number': row['photo_number'],
                     'url': row['guest_pass_url'],
                     'thumbnail': row.get('thumbnail_url', ''),
                     'original': row.get('original_image_url', ''),
                     'download': row.get('original_image_url', ''),
-                    'race_number': row['race_number'].strip(),
-                    'all_race_numbers': row['race_number'].strip()
-                })
+                    'all_race_numbers': race_numbers[0]
+                }
+            else:
+                continue
+            
+            if not race_numbers:
+                continue  # Untagged photos aren't shown in the race gallery
+            
+            photo.update(thumbnail_fields(row))  # Optional sizes/renditions for srcset
+            
+            if (row.get('download_url') or '').strip():
+                # Served with Content-Disposition: attachment (upload_to_b2.py --attachment)
+                photo['download'] = row['download_url'].strip()
+                photo['attachment'] = '1'
+            
+            # Index the photo under each of its race numbers (multi-person support)
+            photo_id = len(photos)
+            photos.append(photo)
+            for race_num in race_numbers:
+                photo_ids = race_index.setdefault(race_num, [])
+                if not photo_ids or photo_ids[-1] != photo_id:
+                    photo_ids.append(photo_id)
     
-    print(f"Loaded {len(photos)} photo entries from CSV")
+    print(f"Loaded {len(photos)} photos from CSV")
     
-    # Count unique photos
-    unique_photos = len(set(p['number'] for p in photos))
-    print(f"  ({unique_photos} unique photos, some may appear multiple times for multi-person shots)")
+    # Count index references
+    references = sum(len(ids) for ids in race_index.values())
+    print(f"  ({references} race number tags, multi-person shots are stored once)")
     
     # Debug: Show first photo structure
     if photos:
         print(f"Sample photo data: {photos[0]}")
     
+    print(f"Found {len(race_index)} unique race numbers")
     
-    # Group by race number
-    by_race_number = {}
-    for photo in photos:
-        rn = photo['race_number']
-        if rn not in by_race_number:
-            by_race_number[rn] = []
-        by_race_number[rn].append(photo)
-    
-    print(f"Found {len(by_race_number)} unique race numbers")
+    # "Download all" zips, by URL relative to the page
+    bundles = {}
+    if bundle_dir:
+        page_dir = Path(output_file).resolve().parent
+        bundle_files = build_bib_bundles(csv_file, bundle_dir, Path(output_file).stem, photos_dir)
+        bundles = {race_num: Path(os.path.relpath(Path(bundle_dir).resolve() / filename, page_dir)).as_posix()
+                   for race_num, filename in bundle_files.items() if race_num in race_index}
     
     # Breadcrumb based on discipline
     if discipline:
@@ -119,6 +315,39 @@ def generate_race_gallery(csv_file, race_name, race_date, location, output_file,
         <span>{race_name}</span>
     </div>'''
     
+    # Photo data: one record per photo, race number → photo ids, and the
+    # sorted race numbers the search box looks prefixes up in
+    gallery_data = {
+        'photos': encode_photos(photos),
+        'raceIndex': race_index,
+        'bibs': sorted(race_index)
+    }
+    if bundles:
+        gallery_data['bundles'] = bundles
+    data_head, data_loader = write_gallery_data(output_file, gallery_data, inline=inline_data, preload=not shards)
+    
+    shard_directory = None
+    if shards and not inline_data:
+        data_head, shard_directory = write_race_shards(output_file, photos, race_index, shards, bundles)
+    elif not inline_data:
+        remove_stale_parts(output_file)
+    
+    # Stylesheet and script shared with the other gallery pages
+    output_dir = Path(output_file).parent
+    css_file, js_file = write_gallery_assets(output_dir, minify=not pretty)
+    asset_head = asset_head_html(css_file)
+    # CORS thumbnails only help (and only need the bucket's CORS rule) with the worker
+    cross_origin = bool(service_worker and cors_thumbnails)
+    image_hints = image_hints_html(photos, cross_origin)  # Warm up the image hosts, preload the first row
+    asset_script = asset_script_html(js_file) + service_worker_html(service_worker)
+    
+    # Search worker source, embedded so the page needs no extra request
+    search_worker = SEARCH_WORKER_JS if pretty else minify_js(SEARCH_WORKER_JS) + '\n'
+    
+    # Static first page so thumbnails load while the photo data is still downloading
+    first_page_cards = render_photo_cards(photos, cross_origin)
+    page_info, pagination_display = render_page_info(len(photos), infinite_scroll)
+    
     # Generate HTML
     html = f'''<!DOCTYPE html>
 <html lang="en">
@@ -126,411 +355,7 @@ def generate_race_gallery(csv_file, race_name, race_date, location, output_file,
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{race_name} Photos | Adam Watson Photo</title>
-    <style>
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
-        
-        body {{
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-            background: #1a1a1a;
-            color: #e0e0e0;
-            line-height: 1.6;
-        }}
-        
-        nav {{
-            background: #0a0a0a;
-            padding: 20px 0;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.5);
-            position: sticky;
-            top: 0;
-            z-index: 1000;
-        }}
-        
-        .nav-container {{
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 0 20px;
-            display: flex;
-            justify-content: center;
-            align-items: center;
-        }}
-        
-        .nav-links {{
-            display: flex;
-            gap: 30px;
-            list-style: none;
-            align-items: center;
-        }}
-        
-        .nav-links a {{
-            color: #e0e0e0;
-            text-decoration: none;
-            font-weight: 500;
-            transition: color 0.3s;
-            font-size: 1.1em;
-        }}
-        
-        .nav-links a:hover {{
-            color: #ffffff;
-        }}
-        
-        .instagram-link {{
-            color: #888;
-            transition: opacity 0.3s;
-            display: inline-flex;
-            align-items: center;
-            outline: none;
-            border: none;
-        }}
-        
-        .instagram-link:focus {{
-            outline: none;
-        }}
-        
-        .instagram-icon {{
-            width: 24px;
-            height: 24px;
-            filter: brightness(0.6);
-            display: block;
-            outline: none;
-            border: none;
-        }}
-        
-        .breadcrumb {{
-            max-width: 1200px;
-            margin: 30px auto 0;
-            padding: 0 20px;
-        }}
-        
-        .breadcrumb a {{
-            color: #888;
-            text-decoration: none;
-        }}
-        
-        .breadcrumb a:hover {{
-            color: #fff;
-        }}
-        
-        .breadcrumb span {{
-            color: #555;
-            margin: 0 10px;
-        }}
-        
-        .gallery-section {{
-            max-width: 1200px;
-            margin: 50px auto 80px;
-            padding: 0 20px;
-        }}
-        
-        .gallery-header {{
-            text-align: center;
-            margin-bottom: 50px;
-        }}
-        
-        .gallery-header h1 {{
-            font-size: 3em;
-            font-weight: 300;
-            letter-spacing: 2px;
-            color: #ffffff;
-            margin-bottom: 10px;
-        }}
-        
-        .gallery-header p {{
-            font-size: 1.2em;
-            color: #999;
-        }}
-        
-        .search-box {{
-            max-width: 500px;
-            margin: 0 auto 50px;
-            text-align: center;
-        }}
-        
-        .search-box input {{
-            width: 100%;
-            padding: 15px 20px;
-            font-size: 1.2em;
-            background: #0f0f0f;
-            border: 2px solid #333;
-            border-radius: 8px;
-            color: #fff;
-            text-align: center;
-        }}
-        
-        .search-box input:focus {{
-            outline: none;
-            border-color: #555;
-        }}
-        
-        .search-box label {{
-            display: block;
-            margin-bottom: 10px;
-            font-size: 1.1em;
-            color: #aaa;
-        }}
-        
-        .photo-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fill, minmax(300px, 1fr));
-            gap: 20px;
-        }}
-        
-        .photo-card {{
-            background: #0f0f0f;
-            border-radius: 8px;
-            overflow: hidden;
-            border: 1px solid #222;
-            transition: transform 0.3s;
-            display: block;
-            text-decoration: none;
-            color: inherit;
-        }}
-        
-        .photo-card:hover {{
-            transform: translateY(-5px);
-            border-color: #444;
-        }}
-        
-        .photo-thumbnail {{
-            width: 100%;
-            height: 250px;
-            background: #2a2a2a;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            color: #666;
-            font-size: 3em;
-            position: relative;
-            overflow: hidden;
-        }}
-        
-        .photo-thumbnail img {{
-            width: 100%;
-            height: 100%;
-            object-fit: cover;
-        }}
-        
-        .no-results {{
-            text-align: center;
-            padding: 60px 20px;
-            color: #666;
-            font-size: 1.2em;
-        }}
-        
-        .pagination {{
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            gap: 10px;
-            margin: 40px 0;
-            padding: 20px;
-        }}
-        
-        .pagination button {{
-            background: #2a2a2a;
-            color: #fff;
-            border: 1px solid #444;
-            padding: 10px 20px;
-            border-radius: 5px;
-            cursor: pointer;
-            font-size: 1em;
-            transition: all 0.3s;
-        }}
-        
-        .pagination button:hover:not(:disabled) {{
-            background: #3a3a3a;
-            border-color: #666;
-        }}
-        
-        .pagination button:disabled {{
-            opacity: 0.3;
-            cursor: not-allowed;
-        }}
-        
-        .pagination .page-info {{
-            color: #999;
-            font-size: 1em;
-            margin: 0 15px;
-        }}
-        
-        .page-input {{
-            background: #2a2a2a;
-            color: #fff;
-            border: 1px solid #444;
-            padding: 10px 12px;
-            border-radius: 5px;
-            font-size: 1em;
-            width: 70px;
-            text-align: center;
-        }}
-        
-        .page-input:focus {{
-            outline: none;
-            border-color: #666;
-        }}
-        
-        /* Hide number input arrows */
-        .page-input::-webkit-inner-spin-button,
-        .page-input::-webkit-outer-spin-button {{
-            -webkit-appearance: none;
-            margin: 0;
-        }}
-        
-        .page-input {{
-            -moz-appearance: textfield;
-        }}
-        
-        footer {{
-            background: #0a0a0a;
-            padding: 40px 20px;
-            border-top: 1px solid #222;
-        }}
-        
-        .footer-nav {{
-            max-width: 1200px;
-            margin: 0 auto;
-            display: flex;
-            justify-content: center;
-            gap: 30px;
-            list-style: none;
-            margin-bottom: 20px;
-        }}
-        
-        .footer-nav a {{
-            color: #888;
-            text-decoration: none;
-        }}
-        
-        .copyright {{
-            text-align: center;
-            color: #666;
-            font-size: 0.9em;
-        }}
-        
-        /* Lightbox */
-        .lightbox {{
-            display: none;
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(0, 0, 0, 0.95);
-            z-index: 9999;
-        }}
-        
-        .lightbox.active {{
-            display: flex;
-            align-items: center;
-            justify-content: center;
-        }}
-        
-        .lightbox-content {{
-            max-width: 95%;
-            max-height: 95%;
-            position: relative;
-        }}
-        
-        .lightbox-image {{
-            max-width: 100%;
-            max-height: 95vh;
-            object-fit: contain;
-            display: block;
-        }}
-        
-        .lightbox-close {{
-            position: fixed;
-            top: 20px;
-            right: 30px;
-            font-size: 50px;
-            color: #fff;
-            cursor: pointer;
-            background: rgba(0,0,0,0.7);
-            border: none;
-            width: 60px;
-            height: 60px;
-            border-radius: 50%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            transition: background 0.3s;
-            z-index: 10000;
-        }}
-        
-        .lightbox-close:hover {{
-            background: rgba(255,255,255,0.2);
-        }}
-        
-        .lightbox-nav {{
-            position: fixed;
-            top: 50%;
-            transform: translateY(-50%);
-            font-size: 50px;
-            color: #fff;
-            cursor: pointer;
-            background: rgba(0,0,0,0.7);
-            border: none;
-            width: 60px;
-            height: 60px;
-            border-radius: 50%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            transition: background 0.3s;
-            z-index: 10000;
-        }}
-        
-        .lightbox-nav:hover {{
-            background: rgba(255,255,255,0.2);
-        }}
-        
-        .lightbox-prev {{ left: 30px; }}
-        .lightbox-next {{ right: 30px; }}
-        
-        .lightbox-counter {{
-            position: fixed;
-            bottom: 30px;
-            left: 50%;
-            transform: translateX(-50%);
-            background: rgba(0,0,0,0.7);
-            color: #fff;
-            padding: 12px 24px;
-            border-radius: 25px;
-            font-size: 1.1em;
-            z-index: 10000;
-        }}
-        
-        .lightbox-download {{
-            position: fixed;
-            bottom: 30px;
-            right: 30px;
-            background: rgba(0,0,0,0.7);
-            color: #fff;
-            padding: 12px 24px;
-            border-radius: 25px;
-            border: 1px solid #666;
-            font-size: 1em;
-            font-family: inherit;
-            line-height: 1.5;
-            height: 48px;
-            display: inline-flex;
-            align-items: center;
-            box-sizing: border-box;
-            transition: all 0.3s;
-            z-index: 10000;
-            cursor: pointer;
-        }}
-        
-        .lightbox-download:hover {{
-            background: rgba(255,255,255,0.2);
-            border-color: #999;
-        }}
-        
-    </style>
-</head>
+{image_hints}{asset_head}{data_head}</head>
 <body>
     <nav>
         <div class="nav-container">
@@ -554,19 +379,20 @@ def generate_race_gallery(csv_file, race_name, race_date, location, output_file,
         
         <div class="search-box">
             <label for="raceNumberSearch">Search by Race Number:</label>
-            <input type="text" id="raceNumberSearch" placeholder="Enter race number..." />
+            <input type="text" id="raceNumberSearch" placeholder="e.g. 123, or 123, 456, or 100-150" />
+            <a id="bundleLink" class="bundle-link" style="display: none;"></a>
         </div>
         
-        <div id="photoGallery" class="photo-grid">
-            <!-- Photos will be inserted here by JavaScript -->
+        <!-- First page rendered here; JavaScript takes over for paging and search -->
+        <div id="photoGallery" class="photo-grid" data-prerendered{' data-infinite-scroll' if infinite_scroll else ''}{' data-cors-thumbnails' if cross_origin else ''}>{first_page_cards}
         </div>
         
-        <div id="pagination" class="pagination" style="display: none;">
-            <button id="prevPage" onclick="changePage(-1)">← Previous</button>
-            <span class="page-info" id="pageInfo">Page 1 of 1</span>
+        <div id="pagination" class="pagination" style="display: {pagination_display};">
+            <button id="prevPage" onclick="changePage(-1)" disabled>← Previous</button>
+            <span class="page-info" id="pageInfo">{page_info}</span>
             <input type="number" id="pageInput" class="page-input" min="1" onkeypress="if(event.key === 'Enter') goToPage()">
             <button onclick="goToPage()">Go</button>
-            <button id="nextPage" onclick="changePage(1)">Next →</button>
+            <button id="nextPage" onclick="changePage(1)"{' disabled' if pagination_display == 'none' else ''}>Next →</button>
         </div>
         
         <div id="noResults" class="no-results" style="display: none;">
@@ -597,208 +423,176 @@ def generate_race_gallery(csv_file, race_name, race_date, location, output_file,
         <p class="copyright">&copy; 2025 Adam Watson Photo. All rights reserved.</p>
     </footer>
 
+{asset_script}    <script type="text/js-worker" id="searchWorker">{search_worker}    </script>
     <script>
-        // Photo data
-        const photosByRaceNumber = {json.dumps(by_race_number, indent=12)};
-        
-        // All photos (for showing all initially)
-        const allPhotos = {json.dumps(photos, indent=12)};
-        
-        const searchInput = document.getElementById('raceNumberSearch');
-        const gallery = document.getElementById('photoGallery');
-        const noResults = document.getElementById('noResults');
-        const pagination = document.getElementById('pagination');
-        const pageInfo = document.getElementById('pageInfo');
-        const prevButton = document.getElementById('prevPage');
-        const nextButton = document.getElementById('nextPage');
-        
-        let currentPage = 1;
-        let photosPerPage = 100;
-        let currentPhotos = [];
+        // Photo data loads here; race number lookups run in the search worker.
+        // Sharded pages start with only the first page of photos loaded.
+        const shardDirectory = {compact_json(shard_directory)};
+        const bundles = {{}};  // Race number → zip of all its photos
+        let allIds = [];
+        
+        // The worker's code is in the script block above; without worker support
+        // the same code runs on the page, behind the same messages
+        function createSearchWorker() {{
+            const source = document.getElementById('searchWorker').textContent;
+            try {{
+                return new Worker(URL.createObjectURL(new Blob([source], {{ type: 'text/javascript' }})));
+            }} catch (error) {{
+                const page = {{ onmessage: null }};
+                const scope = {{ onmessage: null, postMessage: data => setTimeout(() => page.onmessage({{ data }})) }};
+                new Function('self', source)(scope);
+                page.postMessage = data => setTimeout(() => scope.onmessage({{ data }}));
+                return page;
+            }}
+        }}
         
-        function displayPhotos(photos) {{
-            currentPhotos = photos;
-            currentPage = 1;  // Reset to first page
-            renderPage();
+        const searchWorker = createSearchWorker();
+        if (shardDirectory) {{
+            searchWorker.postMessage({{ bibs: shardDirectory.bibs, shardCount: shardDirectory.shards.length }});
         }}
         
-        function renderPage() {{
-            const photos = currentPhotos;
-            
-            if (photos.length === 0) {{
-                gallery.innerHTML = '';
-                noResults.style.display = 'block';
-                pagination.style.display = 'none';
-                return;
+        function setPhotoCount(count) {{
+            if (allIds.length !== count) {{
+                allIds = Array.from({{ length: count }}, (_, id) => id);
             }}
-            
-            noResults.style.display = 'none';
-            
-            // Calculate pagination
-            const totalPages = Math.ceil(photos.length / photosPerPage);
-            const startIndex = (currentPage - 1) * photosPerPage;
-            const endIndex = Math.min(startIndex + photosPerPage, photos.length);
-            const pagePhotos = photos.slice(startIndex, endIndex);
-            
-            // Update page info
-            pageInfo.textContent = `Page ${{currentPage}} of ${{totalPages}} (${{photos.length}} photos)`;
-            prevButton.disabled = currentPage === 1;
-            nextButton.disabled = currentPage === totalPages;
-            
-            // Show/hide pagination
-            pagination.style.display = totalPages > 1 ? 'flex' : 'none';
-            
-            // Render photos for current page
-            gallery.innerHTML = pagePhotos.map((photo, index) => {{
-                const actualIndex = startIndex + index;  // Global index for lightbox
-                return `
-                <div class="photo-card" onclick="openLightbox(${{actualIndex}})">
-                    <div class="photo-thumbnail">
-                        ${{photo.thumbnail ? `<img src="${{photo.thumbnail}}" alt="Race photo">` : '📷'}}
-                    </div>
-                </div>
-                `;
-            }}).join('');
-            
-            // Scroll to top of gallery
-            document.querySelector('.gallery-section').scrollIntoView({{ behavior: 'smooth', block: 'start' }});
         }}
         
-        function changePage(direction) {{
-            currentPage += direction;
-            renderPage();
+        // Add a data file's photos, and hand its race numbers to the worker
+        function mergePhotos(data, details = {{}}) {{
+            photoStore.add(data.photos);
+            Object.assign(bundles, data.bundles);
+            if (data.raceIndex) searchWorker.postMessage(Object.assign({{ raceIndex: data.raceIndex }}, details));
         }}
         
-        function goToPage() {{
-            const input = document.getElementById('pageInput');
-            const pageNum = parseInt(input.value);
-            const totalPages = Math.ceil(currentPhotos.length / photosPerPage);
-            
-            if (pageNum && pageNum >= 1 && pageNum <= totalPages) {{
-                currentPage = pageNum; // currentPage is 1-based, so use pageNum directly
-                renderPage();
-                input.value = ''; // Clear input after navigating
-            }} else {{
-                alert(`Please enter a page number between 1 and ${{totalPages}}`);
+        let fullDataPromise = null;
+        function loadFullData() {{
+            if (!fullDataPromise) {{
+                fullDataPromise = {data_loader}.then(data => {{
+                    mergePhotos(data, {{ bibs: data.bibs, complete: true }});
+                    setPhotoCount(data.photos.count);
+                }});
             }}
+            return fullDataPromise;
         }}
         
-        // Search functionality
-        searchInput.addEventListener('input', (e) => {{
-            const searchTerm = e.target.value.trim();
-            
-            if (!searchTerm) {{
-                // Show all photos
-                displayPhotos(allPhotos);
-                return;
+        const shardPromises = {{}};
+        function loadShard(shard) {{
+            if (!shardPromises[shard]) {{
+                shardPromises[shard] = fetch(shardDirectory.shards[shard])
+                    .then(response => response.json())
+                    .then(data => mergePhotos(data, {{ shard }}));
             }}
-            
-            // Find matching photos
-            const matches = photosByRaceNumber[searchTerm] || [];
-            displayPhotos(matches);
-        }});
-        
-        // Show all photos initially
-        displayPhotos(allPhotos);
-        
-        // Lightbox functionality
-        let currentLightboxIndex = 0;
-        // currentPhotos already declared above for pagination
+            return shardPromises[shard];
+        }}
         
-        function openLightbox(index) {{
-            currentLightboxIndex = index;
-            currentPhotos = searchInput.value.trim() ? 
-                (photosByRaceNumber[searchInput.value.trim()] || []) : 
-                allPhotos;
-            
-            const photo = currentPhotos[index];
-            const lightbox = document.getElementById('lightbox');
-            const lightboxImage = document.getElementById('lightbox-image');
-            const counter = document.getElementById('lightbox-counter');
-            
-            // Display large image (_h), download original (_o)
-            lightboxImage.src = photo.original || photo.url;
-            counter.textContent = `${{index + 1}} / ${{currentPhotos.length}}`;
-            
-            lightbox.classList.add('active');
+        // Load the shards a search needs (all data once they're most of them)
+        function loadShards(shards) {{
+            if (fullDataPromise || shards.length > shardDirectory.shards.length / 2) return loadFullData();
+            return Promise.all(shards.map(loadShard));
         }}
         
-        function closeLightbox() {{
-            document.getElementById('lightbox').classList.remove('active');
+        const searchInput = document.getElementById('raceNumberSearch');
+        const bundleLink = document.getElementById('bundleLink');
+        
+        // Offer the zip when the search is a single race number that has one;
+        // count is that race number's photos (not the prefix matches after them)
+        function showBundle(query, count) {{
+            const url = query && count > 0 && bundles[query];
+            bundleLink.style.display = url ? '' : 'none';
+            if (url) {{
+                bundleLink.href = url;
+                bundleLink.download = `race-photos-${{query}}.zip`;
+                bundleLink.textContent = `Download all ${{count}} photo${{count === 1 ? '' : 's'}} (.zip)`;
+            }}
         }}
         
-        function navigateLightbox(direction) {{
-            currentLightboxIndex += direction;
+        galleryOptions.loadMissing = loadFullData;
+        galleryOptions.downloadName = photo => {{
+            const raceNumbers = photo.all_race_numbers.split(',');
+            const searched = searchInput.value.trim();
+            return `race-photo-${{raceNumbers.includes(searched) ? searched : raceNumbers[0]}}.jpg`;
+        }};
+        
+        // Search functionality: the worker answers with photo ids, or with the
+        // shards to load first (then the search is sent again)
+        const SEARCH_DELAY = 150;  // ms after the last keystroke
+        let searchId = 0;  // Answers to earlier searches are ignored
+        let searchQuery = '';
+        let searchTimer = 0;
+        
+        function applySearch() {{
+            clearTimeout(searchTimer);
+            const query = searchInput.value.trim();
+            searchId++;
             
-            if (currentLightboxIndex < 0) {{
-                currentLightboxIndex = currentPhotos.length - 1;
-            }} else if (currentLightboxIndex >= currentPhotos.length) {{
-                currentLightboxIndex = 0;
+            if (!query) {{
+                // Show all photos
+                showBundle('', 0);
+                displayPhotos(allIds);
+                return;
             }}
             
-            const photo = currentPhotos[currentLightboxIndex];
-            const lightboxImage = document.getElementById('lightbox-image');
-            const counter = document.getElementById('lightbox-counter');
-            
-            lightboxImage.src = photo.original || photo.url;
-            counter.textContent = `${{currentLightboxIndex + 1}} / ${{currentPhotos.length}}`;
+            searchQuery = query;
+            searchWorker.postMessage({{ search: query, id: searchId }});
         }}
         
-        // Event listeners
-        document.getElementById('lightbox-close').addEventListener('click', closeLightbox);
-        document.getElementById('lightbox-prev').addEventListener('click', () => navigateLightbox(-1));
-        document.getElementById('lightbox-next').addEventListener('click', () => navigateLightbox(1));
-        
-        // Download function - force download instead of opening in tab
-        function downloadImage() {{
-            const photo = currentPhotos[currentLightboxIndex];
-            const imageUrl = photo.download || photo.original || photo.url;
+        searchWorker.onmessage = event => {{
+            const {{ id, ids, exactCount, shards }} = event.data;
+            if (id !== searchId) return;
             
-            // Fetch the image and trigger download
-            fetch(imageUrl)
-                .then(response => response.blob())
-                .then(blob => {{
-                    const url = window.URL.createObjectURL(blob);
-                    const a = document.createElement('a');
-                    a.href = url;
-                    a.download = `race-photo-${{photo.race_number}}.jpg`;
-                    document.body.appendChild(a);
-                    a.click();
-                    window.URL.revokeObjectURL(url);
-                    document.body.removeChild(a);
+            if (shards.length === 0) {{
+                showBundle(searchQuery, exactCount);
+                displayPhotos(ids);
+                return;
+            }}
+            loadShards(shards)
+                .then(() => {{
+                    if (id === searchId) searchWorker.postMessage({{ search: searchQuery, id }});
                 }})
-                .catch(error => {{
-                    console.error('Download failed:', error);
-                    // Fallback: open in new tab
-                    window.open(imageUrl, '_blank');
-                }});
-        }}
+                .catch(error => console.error('Failed to load photos:', error));
+        }};
         
-        // Keyboard navigation
-        document.addEventListener('keydown', (e) => {{
-            if (document.getElementById('lightbox').classList.contains('active')) {{
-                if (e.key === 'Escape') closeLightbox();
-                if (e.key === 'ArrowLeft') navigateLightbox(-1);
-                if (e.key === 'ArrowRight') navigateLightbox(1);
-            }}
+        searchInput.addEventListener('input', () => {{
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(applySearch, searchInput.value.trim() ? SEARCH_DELAY : 0);
         }});
         
-        // Close when clicking background
-        document.getElementById('lightbox').addEventListener('click', (e) => {{
-            if (e.target.id === 'lightbox') closeLightbox();
-        }});
+        // Load the first page (or all photo data), then show it
+        // (or whatever was typed meanwhile)
+        if (shardDirectory) setPhotoCount(shardDirectory.total);
+        
+        const initialLoad = shardDirectory ?
+            fetch(shardDirectory.firstPage).then(response => response.json()).then(mergePhotos) :
+            loadFullData();
+        
+        initialLoad
+            .then(applySearch)
+            .catch(error => {{
+                console.error('Failed to load photos:', error);
+                noResults.textContent = 'Photos could not be loaded. Please refresh the page.';
+                noResults.style.display = 'block';
+            }});
     </script>
 </body>
 </html>'''
     
+    if not pretty:
+        html = minify_html(html)
+    
     # Write HTML file
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write(html)
     
     print(f"\n✓ Generated: {output_file}")
+    
+    if precompress:
+        precompress_files(page_files(output_file) + [output_dir / css_file, output_dir / js_file])
+    else:
+        # Copies from an earlier --precompress build would be out of date
+        remove_compressed(output_file)
     print(f"\nGallery stats:")
     print(f"  - Total photos with race numbers: {len(photos)}")
-    print(f"  - Unique race numbers: {len(by_race_number)}")
+    print(f"  - Unique race numbers: {len(race_index)}")
     print(f"\nUpload to your website and test the search!")
 
 
@@ -810,6 +604,29 @@ if __name__ == '__main__':
     parser.add_argument('--location', required=True, help='Race location')
     parser.add_argument('--discipline', help='Cycling discipline (e.g., "Mountain Bike", "Road", "Cyclocross")')
     parser.add_argument('--output', required=True, help='Output HTML filename')
+    parser.add_argument('--inline-data', action='store_true',
+                        help='Embed photo data in the page instead of a separate .json file (for opening from disk)')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='Split race numbers into this many files so a search only downloads one (e.g. 32 for large events)')
+    parser.add_argument('--precompress', action='store_true',
+                        help='Also write .gz/.br copies of the page and its data files, for hosts that '
+                             'serve precompressed files (nginx gzip_static, Caddy, Netlify). GitHub Pages '
+                             'ignores them and compresses on the fly, so leave this off there')
+    parser.add_argument('--pretty', action='store_true',
+                        help="Don't minify the page and shared CSS/JS (easier to debug)")
+    parser.add_argument('--infinite-scroll', action='store_true',
+                        help='Show photos in one long scrolling grid instead of pages of 100. '
+                             'Only the DOM is bounded (rows near the viewport); the full photo data '
+                             'file is still downloaded after the first page, as in paged mode')
+    parser.add_argument('--service-worker',
+                        help='URL of a service worker for the page to register (build_site.py writes sw.js)')
+    parser.add_argument('--bundles',
+                        help='Folder to build a zip of each race number\'s photos in (offered when searching that number)')
+    parser.add_argument('--photos',
+                        help='Folder with the photos for --bundles (default: download them from the CSV URLs)')
+    parser.add_argument('--cors-thumbnails', action='store_true',
+                        help='Request thumbnails with CORS so the service worker caches them '
+                             '(the photo bucket needs a CORS rule, see service_worker.py)')
     
     args = parser.parse_args()
     
@@ -819,5 +636,14 @@ if __name__ == '__main__':
         args.date,
         args.location,
         args.output,
-        args.discipline
+        args.discipline,
+        args.inline_data,
+        args.shards,
+        args.precompress,
+        args.pretty,
+        args.infinite_scroll,
+        args.service_worker,
+        args.bundles,
+        args.photos,
+        args.cors_thumbnails
     )
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Responsive <img> markup for gallery thumbnails
+One renderer in Python (pre-rendered first page) and its JavaScript twin
+(pages rendered in the browser) so both produce the same tags.
+
+Optional catalog (CSV) columns it uses:
+- thumbnail_width, thumbnail_height: pixel size of thumbnail_url
+- thumbnail_<W>w_url: extra renditions W pixels wide (e.g. thumbnail_600w_url)
+
+Also the <head> hints that get the first thumbnails going sooner: connections
+to the image hosts and preloads for the first row.
+
+With cross_origin (pages that register the service worker and were built
+with --cors-thumbnails), thumbnails are CORS requests (crossorigin="anonymous")
+so the worker can cache them by size. Only turn it on once the photo hosts
+allow the site's origin (see service_worker.py for the B2 CORS rule):
+without that rule every thumbnail fails to load.
+"""
+
+import re
+import html
+from collections import Counter
+from urllib.parse import urlparse
+
+# Slot width of a grid card: one column on phones, two on tablets, then
+# three columns of at most ~373px in the 1200px layout (see .photo-grid)
+THUMBNAIL_SIZES = '(max-width: 659px) calc(100vw - 40px), (max-width: 979px) calc(50vw - 30px), 380px'
+
+# Cards on the first row get fetchpriority="high"; cards after the first
+# two rows load lazily
+HIGH_PRIORITY_THUMBNAILS = 3
+EAGER_THUMBNAILS = 6
+
+# Thumbnail hosts the page opens connections to up front (each preconnect
+# holds a socket open); every image host also gets a DNS lookup
+MAX_PRECONNECT = 2
+
+RENDITION_COLUMN = re.compile(r'^thumbnail_(\d+)w_url$')
+RENDITION_FIELD = re.compile(r'^thumbnail_(\d+)w$')
+
+
+def thumbnail_fields(row):
+    """
+    Photo fields for the optional size/rendition columns of a catalog row
+    Returns e.g. {'thumbnail_width': '300', 'thumbnail_height': '200', 'thumbnail_600w': url}
+    """
+    fields = {}
+    for key in ('thumbnail_width', 'thumbnail_height'):
+        value = (row.get(key) or '').strip()
+        if value:
+            fields[key] = value
+    for column, value in row.items():
+        match = RENDITION_COLUMN.match(column or '')
+        if match and value and value.strip():
+            fields[f'thumbnail_{match.group(1)}w'] = value.strip()
+    return fields
+
+
+def thumbnail_srcset(photo):
+    """'url 300w, url 600w' from a photo's thumbnail and extra renditions ('' if none)"""
+    candidates = []
+    if photo.get('thumbnail_width'):
+        candidates.append((int(photo['thumbnail_width']), photo['thumbnail']))
+    for name, value in photo.items():
+        match = RENDITION_FIELD.match(name)
+        if match and value:
+            candidates.append((int(match.group(1)), value))
+    if len(candidates) < 2:
+        return ''
+    return ', '.join(f"{url} {width}w" for width, url in sorted(candidates))
+
+
+def render_thumbnail(photo, position, cross_origin=False):
+    """
+    <img> for a grid card; position is the card's place on the page (0 = top left)
+    Must match renderThumbnail() in THUMBNAIL_JS
+    """
+    if not photo.get('thumbnail'):
+        return '📷'
+    
+    attributes = [f'src="{html.escape(photo["thumbnail"])}"']
+    srcset = thumbnail_srcset(photo)
+    if srcset:
+        attributes.append(f'srcset="{html.escape(srcset)}" sizes="{THUMBNAIL_SIZES}"')
+    if photo.get('thumbnail_width') and photo.get('thumbnail_height'):
+        attributes.append(f'width="{photo["thumbnail_width"]}" height="{photo["thumbnail_height"]}"')
+    attributes.append('alt="Race photo" decoding="async"')
+    if cross_origin:
+        attributes.append('crossorigin="anonymous"')
+    if position < HIGH_PRIORITY_THUMBNAILS:
+        attributes.append('fetchpriority="high"')
+    elif position >= EAGER_THUMBNAILS:
+        attributes.append('loading="lazy"')
+    return f"<img {' '.join(attributes)}>"
+
+
+def url_origin(url):
+    """'https://host/path' → 'https://host' (None for relative URLs)"""
+    parsed = urlparse(url or '')
+    if parsed.scheme in ('http', 'https') and parsed.netloc:
+        return f"{parsed.scheme}://{parsed.netloc}"
+    return None
+
+
+def image_origins(photos):
+    """
+    Hosts a gallery's images come from, most used first
+    Returns (thumbnail origins, lightbox/download origins not among them)
+    """
+    thumbnails = Counter()
+    others = Counter()
+    for photo in photos:
+        for name, value in photo.items():
+            origin = url_origin(value)
+            if not origin:
+                continue
+            if name == 'thumbnail' or RENDITION_FIELD.match(name):
+                thumbnails[origin] += 1
+            elif name in ('original', 'download'):
+                others[origin] += 1
+    thumbnail_origins = [origin for origin, _ in thumbnails.most_common()]
+    return thumbnail_origins, [origin for origin, _ in others.most_common() if origin not in thumbnails]
+
+
+def image_hints_html(photos, cross_origin=False):
+    """
+    <link>s for the top of a gallery page: preconnect to the main thumbnail
+    hosts, dns-prefetch for every image host, and preloads for the first row
+    of thumbnails (photos in page order) matching their <img> tags
+    cross_origin must match render_thumbnail()'s, or the preloads are wasted.
+    """
+    thumbnail_origins, other_origins = image_origins(photos)
+    cors = ' crossorigin="anonymous"' if cross_origin else ''
+    links = [f'<link rel="preconnect" href="{origin}"{cors}>' for origin in thumbnail_origins[:MAX_PRECONNECT]]
+    links.extend(f'<link rel="dns-prefetch" href="{origin}">' for origin in thumbnail_origins + other_origins)
+    
+    for photo in photos[:HIGH_PRIORITY_THUMBNAILS]:
+        if not photo.get('thumbnail'):
+            continue
+        attributes = [f'href="{html.escape(photo["thumbnail"])}"']
+        srcset = thumbnail_srcset(photo)
+        if srcset:
+            attributes.append(f'imagesrcset="{html.escape(srcset)}" imagesizes="{THUMBNAIL_SIZES}"')
+        links.append(f'<link rel="preload" as="image" {" ".join(attributes)}{cors} fetchpriority="high">')
+    
+    return ''.join(f'    {link}\n' for link in links)
+
+
+# Browser-side twin of thumbnail_srcset()/render_thumbnail()
+THUMBNAIL_JS = f'''
+        const THUMBNAIL_SIZES = '{THUMBNAIL_SIZES}';
+        
+        function thumbnailSrcset(photo) {{
+            const candidates = [];
+            if (photo.thumbnail_width) candidates.push([parseInt(photo.thumbnail_width), photo.thumbnail]);
+            for (const [name, value] of Object.entries(photo)) {{
+                const match = /^thumbnail_(\\d+)w$/.exec(name);
+                if (match && value) candidates.push([parseInt(match[1]), value]);
+            }}
+            if (candidates.length < 2) return '';
+            return candidates.sort((a, b) => a[0] - b[0]).map(([width, url]) => `${{url}} ${{width}}w`).join(', ');
+        }}
+        
+        function renderThumbnail(photo, position, crossOrigin) {{
+            if (!photo.thumbnail) return '📷';
+            
+            const attributes = [`src="${{photo.thumbnail}}"`];
+            const srcset = thumbnailSrcset(photo);
+            if (srcset) attributes.push(`srcset="${{srcset}}" sizes="${{THUMBNAIL_SIZES}}"`);
+            if (photo.thumbnail_width && photo.thumbnail_height) {{
+                attributes.push(`width="${{photo.thumbnail_width}}" height="${{photo.thumbnail_height}}"`);
+            }}
+            attributes.push('alt="Race photo" decoding="async"');
+            if (crossOrigin) attributes.push('crossorigin="anonymous"');
+            if (position < {HIGH_PRIORITY_THUMBNAILS}) {{
+                attributes.push('fetchpriority="high"');
+            }} else if (position >= {EAGER_THUMBNAILS}) {{
+                attributes.push('loading="lazy"');
+            }}
+            return `<img ${{attributes.join(' ')}}>`;
+        }}
+'''
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Rebuild race_tagging.csv from the race numbers embedded in image files
+Reads only the EXIF segments (and optional .xmp sidecars) with a thread pool,
+so a folder of 10,000 photos is indexed in seconds. Use this to recover
+when the tagging CSV is lost.
+"""
+
+import csv
+import sys
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from exif_segments import read_keywords
+from xmp_sidecars import read_xmp_sidecars
+
+MAX_RACE_NUMBERS = 10
+
+
+def index_exif_keywords(photos_dir, output_csv='race_tagging.csv', workers=16, use_sidecars=True):
+    """
+    Scan a folder and write a CSV in the format generate_race_gallery.py reads
+    
+    Parameters:
+    - photos_dir: Directory with tagged photos
+    - output_csv: Where to write the rebuilt CSV (default: race_tagging.csv)
+    - workers: Number of files read in parallel (default: 16)
+    - use_sidecars: Prefer race numbers from .xmp sidecars when present (default: True)
+    
+    Photos are numbered in filename order, matching generate_csv_from_images.py
+    and upload_to_b2.py, so merge_b2_thumbnails.py can add the URLs afterwards.
+    """
+    
+    photos_path = Path(photos_dir)
+    if not photos_path.exists():
+        print(f"✗ Error: Directory not found: {photos_dir}")
+        return
+    
+    # Find all image files (avoid duplicates)
+    image_files = set()
+    for ext in ['*.jpg', '*.JPG', '*.jpeg', '*.JPEG']:
+        image_files.update(photos_path.glob(ext))
+    
+    # Sort by filename
+    image_files = sorted(image_files, key=lambda x: x.name)
+    
+    if not image_files:
+        print(f"✗ No image files found in {photos_dir}")
+        return
+    
+    print(f"Found {len(image_files)} images in {photos_dir}")
+    start_time = time.perf_counter()
+    
+    sidecar_keywords = read_xmp_sidecars(photos_path, workers) if use_sidecars else {}
+    if sidecar_keywords:
+        print(f"Found {len(sidecar_keywords)} .xmp sidecars (these take priority over EXIF)")
+    
+    def load(image_file):
+        if image_file.name in sidecar_keywords:
+            return sidecar_keywords[image_file.name], None
+        try:
+            return read_keywords(image_file), None
+        except Exception as e:
+            return [], e
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(load, image_files))
+    
+    elapsed = time.perf_counter() - start_time
+    
+    # Build the bib → photo index and the CSV rows together
+    by_race_number = {}
+    rows = []
+    tagged = 0
+    failed = 0
+    
+    for idx, (image_file, (race_numbers, error)) in enumerate(zip(image_files, results), 1):
+        if error:
+            print(f"  ✗ {image_file.name}: Error reading EXIF: {error}")
+            failed += 1
+        
+        if len(race_numbers) > MAX_RACE_NUMBERS:
+            print(f"  ⚠ {image_file.name}: {len(race_numbers)} race numbers, keeping the first {MAX_RACE_NUMBERS}")
+            race_numbers = race_numbers[:MAX_RACE_NUMBERS]
+        
+        if race_numbers:
+            tagged += 1
+        for race_num in race_numbers:
+            by_race_number.setdefault(race_num, []).append(idx)
+        
+        row = {'photo_number': idx, 'filename': image_file.name}
+        for i in range(1, MAX_RACE_NUMBERS + 1):
+            row[f'race_number_{i}'] = race_numbers[i - 1] if i <= len(race_numbers) else ''
+        rows.append(row)
+    
+    # Write CSV
+    with open(output_csv, 'w', newline='', encoding='utf-8') as f:
+        fieldnames = ['photo_number', 'filename'] + [f'race_number_{i}' for i in range(1, MAX_RACE_NUMBERS + 1)]
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    
+    print(f"\n✓ Created: {output_csv}")
+    print(f"  Photos: {len(image_files)} ({tagged} tagged, {len(image_files) - tagged} untagged)")
+    print(f"  Unique race numbers: {len(by_race_number)}")
+    if failed:
+        print(f"  Failed to read: {failed}")
+    print(f"  Indexed in {elapsed:.2f}s ({len(image_files) / elapsed if elapsed else 0:.0f} photos/s)")
+    print(f"\nNext steps:")
+    print(f"  1. python merge_b2_thumbnails.py {output_csv} b2_thumbnails.json b2_originals.json")
+    print(f"  2. python generate_race_gallery.py --csv {output_csv} ...")
+    
+    return by_race_number
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python index_exif_keywords.py <photos_directory> [output.csv] [--workers N] [--no-sidecars]")
+        print("\nExample:")
+        print("  python index_exif_keywords.py ./race_photos/")
+        print("  python index_exif_keywords.py ./race_photos/ recovered.csv --workers 32")
+        print("\nThis will:")
+        print("  - Read race numbers from each photo's EXIF UserComment/XPKeywords")
+        print("    (or its .xmp sidecar, if one exists)")
+        print("  - Write a race_tagging.csv that generate_race_gallery.py can use")
+        print("\nOnly the metadata segments are read, never the image data.")
+        sys.exit(1)
+    
+    photos_dir = sys.argv[1]
+    output_csv = sys.argv[2] if len(sys.argv) > 2 and not sys.argv[2].startswith('--') else 'race_tagging.csv'
+    
+    workers = 16
+    if '--workers' in sys.argv:
+        workers_idx = sys.argv.index('--workers')
+        if workers_idx + 1 < len(sys.argv):
+            workers = int(sys.argv[workers_idx + 1])
+    
+    use_sidecars = '--no-sidecars' not in sys.argv
+    
+    index_exif_keywords(photos_dir, output_csv, workers, use_sidecars)
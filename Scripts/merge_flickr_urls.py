@@ -8,6 +8,11 @@ import csv
 import json
 import sys
 
+URL_COLUMNS = ['photo_url', 'thumbnail_url', 'large_url', 'original_url']
+
+# Only merged when the JSON has it (upload_to_b2.py --attachment)
+OPTIONAL_COLUMNS = ['download_url']
+
 def merge_flickr_urls(csv_file, json_file, output_csv=None):
     """
     Add Flickr URLs to race_tagging.csv by matching photo numbers
@@ -26,12 +31,16 @@ def merge_flickr_urls(csv_file, json_file, output_csv=None):
     flickr_lookup = {}
     for photo in flickr_photos:
         photo_num = str(photo['photo_number'])
-        flickr_lookup[photo_num] = {
-            'photo_url': photo.get('photo_url', ''),
-            'thumbnail_url': photo.get('thumbnail_url', ''),
-            'large_url': photo.get('large_url', ''),
-            'original_url': photo.get('original_url', '')
-        }
+        if any(col in photo for col in URL_COLUMNS):
+            flickr_lookup[photo_num] = {col: photo.get(col, '') for col in URL_COLUMNS}
+        else:
+            flickr_lookup[photo_num] = {}
+        for col in OPTIONAL_COLUMNS:
+            if col in photo:
+                flickr_lookup[photo_num][col] = photo[col]
+    
+    merged_columns = list(URL_COLUMNS)
+    merged_columns += [col for col in OPTIONAL_COLUMNS if any(col in data for data in flickr_lookup.values())]
     
     # Read CSV
     rows = []
@@ -41,7 +50,7 @@ def merge_flickr_urls(csv_file, json_file, output_csv=None):
         
         # Add new columns if they don't exist
         new_fieldnames = list(fieldnames)
-        for col in ['photo_url', 'thumbnail_url', 'large_url', 'original_url']:
+        for col in merged_columns:
             if col not in new_fieldnames:
                 new_fieldnames.append(col)
         
@@ -50,11 +59,7 @@ def merge_flickr_urls(csv_file, json_file, output_csv=None):
             
             # Merge Flickr URLs if found
             if photo_num in flickr_lookup:
-                flickr_data = flickr_lookup[photo_num]
-                row['photo_url'] = flickr_data['photo_url']
-                row['thumbnail_url'] = flickr_data['thumbnail_url']
-                row['large_url'] = flickr_data['large_url']
-                row['original_url'] = flickr_data['original_url']
+                row.update(flickr_lookup[photo_num])
             
             rows.append(row)
     
@@ -82,6 +87,7 @@ if __name__ == '__main__':
         print("\nThis will:")
         print("  - Match photos by photo_number")
         print("  - Add Flickr URLs (photo_url, thumbnail_url, large_url, original_url)")
+        print("  - Add download_url when the JSON has it (upload_to_b2.py --attachment)")
         print("  - Keep your race number tags intact")
         sys.exit(1)
     
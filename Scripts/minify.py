@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Whitespace/comment minifier for the generated gallery pages
+Each language is split into tokens first, so strings, template literals,
+regular expressions and url(...) values are copied through untouched and
+only the space between tokens is removed.
+"""
+
+import re
+import sys
+from pathlib import Path
+
+# ---------------------------------------------------------------- JavaScript
+
+_JS_TOKEN = re.compile(r'''
+    (?P<space>[ \t\f\v\u00a0\ufeff]+)
+  | (?P<newline>[\r\n\u2028\u2029]+)
+  | (?P<comment>//[^\r\n\u2028\u2029]*|/\*[\s\S]*?\*/)
+  | (?P<string>'(?:[^'\\\r\n]|\\[\s\S])*'|"(?:[^"\\\r\n]|\\[\s\S])*")
+  | (?P<number>0[xXbBoO][0-9a-fA-F_]+n?|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?n?)
+  | (?P<name>[A-Za-z_$\u0080-\uffff\\][\w$\u0080-\uffff\\]*)
+  | (?P<punct>>>>=|\.\.\.|===|!==|\*\*=|<<=|>>=|>>>|&&=|\|\|=|\?\?=|=>|==|!=|<=|>=|&&|\|\||\?\?|\?\.
+             |\+\+|--|\+=|-=|\*=|/=|%=|&=|\|=|\^=|\*\*|<<|>>|[{}()\[\];,<>+\-*/%&|^!~?:=.@\#])
+''', re.VERBOSE)
+
+# After these words a '/' starts a regular expression, not a division
+_JS_REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete',
+                      'void', 'throw', 'case', 'do', 'else', 'yield', 'await'}
+
+_WORD_CHAR = re.compile(r'[\w$\u0080-\uffff\\]')
+
+
+def _js_regex_end(src, pos):
+    """Index just past the regular expression literal starting at src[pos] == '/'"""
+    i = pos + 1
+    in_class = False
+    while i < len(src):
+        ch = src[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if ch in '\r\n':
+            break
+        if in_class:
+            in_class = ch != ']'
+        elif ch == '[':
+            in_class = True
+        elif ch == '/':
+            i += 1
+            while i < len(src) and _WORD_CHAR.match(src[i]):
+                i += 1  # Flags
+            return i
+        i += 1
+    raise ValueError(f"Unterminated regular expression at offset {pos}")
+
+
+def _js_template_end(src, pos):
+    """
+    Minify the template literal starting at src[pos] == '`'
+    Returns (text, end). The literal text is kept as is; ${...} expressions
+    are minified like any other code.
+    """
+    out = ['`']
+    i = pos + 1
+    start = i
+    while i < len(src):
+        ch = src[i]
+        if ch == '\\':
+            i += 2
+        elif ch == '`':
+            out.append(src[start:i + 1])
+            return ''.join(out), i + 1
+        elif src.startswith('${', i):
+            out.append(src[start:i + 2])
+            expression, i = _minify_js_tokens(src, i + 2, in_template=True)
+            out.append(expression + '}')
+            i += 1
+            start = i
+        else:
+            i += 1
+    raise ValueError(f"Unterminated template literal at offset {pos}")
+
+
+def _js_separator(prev, token, newline):
+    """What has to stay between two tokens: '', ' ' or a newline (for ASI)"""
+    last, first = prev[-1], token[0]
+    if newline and (_WORD_CHAR.match(last) or last in '\'"`)]}' or prev in ('++', '--')) \
+            and (_WORD_CHAR.match(first) or first in '\'"`([{+-/!~' or token in ('++', '--')):
+        return '\n'
+    if _WORD_CHAR.match(last) and _WORD_CHAR.match(first):
+        return ' '
+    if last in '+-' and first == last:
+        return ' '  # a + +b, a - -b
+    if last.isdigit() and first == '.':
+        return ' '  # 1 .toString()
+    return ''
+
+
+def _minify_js_tokens(src, pos=0, in_template=False):
+    """
+    Minify code from pos until the end (or, inside a template expression,
+    until its closing brace). Returns (code, end).
+    """
+    out = []
+    prev = None        # Last token written
+    prev_kind = None
+    newline = False    # Whitespace since prev contained a line break
+    depth = 0
+    
+    while pos < len(src):
+        ch = src[pos]
+        
+        if ch == '`':
+            token, pos = _js_template_end(src, pos)
+            kind = 'template'
+        elif ch == '/' and not src.startswith(('//', '/*'), pos) and (
+                prev is None or
+                (prev_kind == 'punct' and prev not in (')', ']', '}')) or
+                (prev_kind == 'name' and prev in _JS_REGEX_KEYWORDS)):
+            end = _js_regex_end(src, pos)
+            token, pos, kind = src[pos:end], end, 'regex'
+        else:
+            match = _JS_TOKEN.match(src, pos)
+            if not match:
+                raise ValueError(f"Unexpected character {ch!r} at offset {pos}")
+            kind, token, pos = match.lastgroup, match.group(), match.end()
+            
+            if kind == 'space':
+                continue
+            if kind in ('newline', 'comment'):
+                newline = newline or kind == 'newline' or bool(re.search(r'[\r\n\u2028\u2029]', token))
+                continue
+            if in_template and token == '{':
+                depth += 1
+            elif in_template and token == '}':
+                if depth == 0:
+                    return ''.join(out), pos - 1
+                depth -= 1
+        
+        if prev is not None:
+            out.append(_js_separator(prev, token, newline))
+        out.append(token)
+        prev, prev_kind, newline = token, kind, False
+    
+    if in_template:
+        raise ValueError("Unterminated template expression")
+    return ''.join(out), pos
+
+
+def minify_js(src):
+    """Remove comments and insignificant whitespace from JavaScript"""
+    return _minify_js_tokens(src)[0]
+
+
+# ---------------------------------------------------------------------- CSS
+
+_CSS_TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<comment>/\*[\s\S]*?\*/)
+  | (?P<string>'(?:[^'\\]|\\[\s\S])*'|"(?:[^"\\]|\\[\s\S])*")
+  | (?P<url>url\(\s*[^'")\s][^)]*\))
+  | (?P<word>[^\s'"/{};:,>()]+)
+  | (?P<punct>[{};:,>()/])
+''', re.VERBOSE | re.IGNORECASE)
+
+# Whitespace next to these never matters (':' only after it: "a :hover" is a selector)
+_CSS_TIGHT_BEFORE = set('{};,>)')
+_CSS_TIGHT_AFTER = set('{};,>:(')
+
+
+def minify_css(src):
+    """Remove comments and insignificant whitespace from CSS"""
+    out = []
+    space = False
+    pos = 0
+    while pos < len(src):
+        match = _CSS_TOKEN.match(src, pos)
+        if not match:
+            raise ValueError(f"Unexpected character {src[pos]!r} at offset {pos}")
+        kind, token, pos = match.lastgroup, match.group(), match.end()
+        
+        if kind in ('space', 'comment'):
+            space = True
+            continue
+        
+        if token == '}' and out and out[-1] == ';':
+            out.pop()  # Last declaration needs no semicolon
+        if space and out and out[-1][-1] not in _CSS_TIGHT_AFTER and token not in _CSS_TIGHT_BEFORE:
+            out.append(' ')
+        out.append(token)
+        space = False
+    
+    return ''.join(out)
+
+
+# --------------------------------------------------------------------- HTML
+
+_HTML_TOKEN = re.compile(r'''
+    (?P<comment><!--[\s\S]*?-->)
+  | (?P<doctype><![^>]*>)
+  | (?P<tag></?[a-zA-Z][\w-]*(?:\s+[^\s=/>]+(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+))?)*\s*/?>)
+  | (?P<text>[^<]+|<)
+''', re.VERBOSE)
+
+_HTML_TAG = re.compile(r'<(/?)([a-zA-Z][\w-]*)([\s\S]*?)(/?)>$')
+_HTML_ATTRIBUTE = re.compile(r'''([^\s=/>]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s>]+))?''')
+
+# Contents copied verbatim (script/style are minified separately)
+_HTML_RAW = {'script', 'style', 'pre', 'textarea'}
+
+# Whitespace between these and a neighbouring tag is never rendered
+_HTML_BLOCK = {'html', 'head', 'body', 'meta', 'link', 'title', 'script', 'style', 'base',
+               'nav', 'section', 'header', 'footer', 'main', 'article', 'aside', 'div',
+               'ul', 'ol', 'li', 'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'br', 'hr',
+               'table', 'thead', 'tbody', 'tr', 'td', 'th', 'form', 'figure', 'picture', 'source'}
+
+_JS_TYPES = {'', 'text/javascript', 'application/javascript', 'module'}
+
+
+def _html_tag_name(token):
+    match = _HTML_TAG.match(token)
+    return match.group(2).lower() if match else None
+
+
+def _minify_html_tag(token):
+    """Collapse the whitespace between a tag's attributes; values are kept as written"""
+    closing, name, attributes, self_closing = _HTML_TAG.match(token).groups()
+    parts = [name]
+    for attribute, value in _HTML_ATTRIBUTE.findall(attributes):
+        parts.append(f"{attribute}={value}" if value else attribute)
+    return f"<{closing}{' '.join(parts)}{self_closing}>"
+
+
+def _html_tokens(src):
+    """Yield (kind, text); raw-text element contents come through as kind 'raw'"""
+    pos = 0
+    while pos < len(src):
+        match = _HTML_TOKEN.match(src, pos)
+        kind, token, pos = match.lastgroup, match.group(), match.end()
+        yield kind, token
+        
+        if kind == 'tag' and not token.startswith('</'):
+            name = _html_tag_name(token)
+            if name in _HTML_RAW:
+                end = re.compile(r'</%s\s*>' % name, re.IGNORECASE).search(src, pos)
+                end = end.start() if end else len(src)
+                yield 'raw', src[pos:end]
+                pos = end
+
+
+def minify_html(src):
+    """
+    Minify a page: comments and indentation go, inline <script> and <style>
+    are minified as JS/CSS, <pre>/<textarea> and attribute values are untouched
+    """
+    tokens = [(kind, token) for kind, token in _html_tokens(src) if kind != 'comment']
+    
+    out = []
+    open_tag = None
+    for i, (kind, token) in enumerate(tokens):
+        if kind == 'tag':
+            out.append(_minify_html_tag(token))
+            open_tag = token
+        elif kind == 'raw':
+            name = _html_tag_name(open_tag)
+            if name == 'script':
+                script_type = re.search(r'''\btype\s*=\s*["']?([^"'\s>]*)''', open_tag, re.IGNORECASE)
+                script_type = script_type.group(1).lower() if script_type else ''
+                out.append(minify_js(token) if script_type in _JS_TYPES else token.strip())
+            elif name == 'style':
+                out.append(minify_css(token))
+            else:
+                out.append(token)
+        elif kind == 'text':
+            prev_name = _html_tag_name(tokens[i - 1][1]) if i > 0 and tokens[i - 1][0] != 'text' else None
+            next_name = _html_tag_name(tokens[i + 1][1]) if i + 1 < len(tokens) and tokens[i + 1][0] != 'text' else None
+            text = re.sub(r'\s+', ' ', token)
+            if prev_name in _HTML_BLOCK or (i > 0 and tokens[i - 1][0] == 'doctype'):
+                text = text.lstrip(' ')
+            if next_name in _HTML_BLOCK:
+                text = text.rstrip(' ')
+            out.append(text)
+        else:
+            out.append(token)
+    
+    return ''.join(out)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python minify.py <file.html|file.css|file.js> [output]")
+        print("\nThe gallery generators minify their output automatically (use --pretty to turn it off)")
+        sys.exit(1)
+    
+    source = Path(sys.argv[1])
+    minifiers = {'.html': minify_html, '.htm': minify_html, '.css': minify_css, '.js': minify_js}
+    if source.suffix.lower() not in minifiers:
+        print(f"✗ Error: Don't know how to minify {source.suffix} files")
+        sys.exit(1)
+    
+    text = source.read_text(encoding='utf-8')
+    result = minifiers[source.suffix.lower()](text)
+    
+    output = Path(sys.argv[2]) if len(sys.argv) > 2 else source
+    output.write_text(result, encoding='utf-8')
+    print(f"✓ {output}: {len(text.encode('utf-8')) / 1024:.1f} KB → {len(result.encode('utf-8')) / 1024:.1f} KB")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Write precompressed .gz and .br siblings for generated gallery files
+Hosts and local servers that support precompressed assets (nginx gzip_static /
+brotli_static, Caddy precompressed, Netlify, etc.) then serve them with no
+compression work per request.
+
+GitHub Pages, where this site is hosted, never serves these files; it
+compresses responses itself. The generators therefore only write them with
+--precompress, for builds deployed to one of the hosts above.
+"""
+
+import os
+import sys
+import gzip
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+COMPRESSIBLE_SUFFIXES = ('.html', '.json', '.css', '.js', '.svg', '.txt', '.xml')
+
+
+def _write_atomic(path, data):
+    """Temp file + rename so a server never picks up a half-written file"""
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(temp_name, 0o644)  # mkstemp files are private; these get served
+        os.replace(temp_name, path)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+
+
+def _is_current(source, compressed):
+    """True if the compressed sibling exists and is newer than its source"""
+    return compressed.exists() and compressed.stat().st_mtime >= source.stat().st_mtime
+
+
+def compress_file(path, force=False):
+    """
+    Write <file>.gz (level 9) and, if brotli is installed, <file>.br (quality 11)
+    Siblings that are already newer than the file are left alone.
+    Returns (size, gz_size, br_size); br_size is None without brotli.
+    """
+    path = Path(path)
+    gz_path = path.with_name(path.name + '.gz')
+    br_path = path.with_name(path.name + '.br')
+    
+    data = None
+    if force or not _is_current(path, gz_path):
+        data = path.read_bytes()
+        # mtime=0 keeps the output identical between builds of the same content
+        _write_atomic(gz_path, gzip.compress(data, compresslevel=9, mtime=0))
+    
+    if brotli is not None and (force or not _is_current(path, br_path)):
+        if data is None:
+            data = path.read_bytes()
+        _write_atomic(br_path, brotli.compress(data, quality=11))
+    
+    br_size = br_path.stat().st_size if brotli is not None else None
+    return path.stat().st_size, gz_path.stat().st_size, br_size
+
+
+def remove_compressed(path):
+    """Delete the .gz/.br siblings of a file that is being removed"""
+    path = Path(path)
+    for suffix in COMPRESSED_SUFFIXES:
+        sibling = path.with_name(path.name + suffix)
+        if sibling.exists():
+            sibling.unlink()
+
+
+def precompress_files(files, workers=None, force=False):
+    """
+    Compress files in parallel and print a size report
+    Returns {path: (size, gz_size, br_size)}
+    """
+    files = [Path(f) for f in files]
+    if not files:
+        return {}
+    
+    if brotli is None:
+        print("⚠ brotli not installed, writing .gz only (pip install brotli)")
+    
+    workers = workers or min(len(files), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        sizes = dict(zip(files, pool.map(lambda f: compress_file(f, force), files)))
+    
+    print(f"\n✓ Precompressed {len(files)} files:")
+    total = total_gz = total_br = 0
+    for path, (size, gz_size, br_size) in sizes.items():
+        total += size
+        total_gz += gz_size
+        total_br += br_size or 0
+        line = f"  {path.name}: {size / 1024:.1f} KB → gzip {gz_size / 1024:.1f} KB"
+        if br_size is not None:
+            line += f", brotli {br_size / 1024:.1f} KB"
+        print(line)
+    
+    if len(files) > 1:
+        line = f"  Total: {total / 1024:.1f} KB → gzip {total_gz / 1024:.1f} KB"
+        if brotli is not None:
+            line += f", brotli {total_br / 1024:.1f} KB"
+        print(line)
+    
+    return sizes
+
+
+def page_files(output_file):
+    """A generated page plus the <page>.*.json data files written beside it"""
+    output_path = Path(output_file)
+    files = [output_path]
+    files.extend(sorted(output_path.parent.glob(f"{output_path.stem}.*.json")))
+    return files
+
+
+def precompress_directory(directory, workers=None, force=False):
+    """Compress every text asset in a directory (not recursive)"""
+    directory = Path(directory)
+    files = sorted(f for f in directory.iterdir()
+                   if f.is_file() and f.suffix.lower() in COMPRESSIBLE_SUFFIXES)
+    
+    # Drop siblings whose source file no longer exists
+    for compressed in directory.iterdir():
+        if compressed.suffix in COMPRESSED_SUFFIXES and compressed.suffixes[-2:-1]:
+            source = compressed.with_suffix('')
+            if source.suffix.lower() in COMPRESSIBLE_SUFFIXES and not source.exists():
+                compressed.unlink()
+    
+    return precompress_files(files, workers, force)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python precompress.py <site_directory> [--workers N] [--force]")
+        print("\nExample:")
+        print("  python precompress.py ./site/")
+        print("\nThis will:")
+        print("  - Write a .gz (and .br, if brotli is installed) next to every")
+        print("    .html/.json/.css/.js file, at maximum compression")
+        print("  - Skip files whose compressed copies are already up to date")
+        print("  - Remove .gz/.br files left behind by deleted pages")
+        print("\nThe gallery generators already do this for their own output;")
+        print("use this for hand-edited pages or a whole site folder.")
+        sys.exit(1)
+    
+    workers = None
+    if '--workers' in sys.argv:
+        workers_idx = sys.argv.index('--workers')
+        if workers_idx + 1 < len(sys.argv):
+            workers = int(sys.argv[workers_idx + 1])
+    
+    precompress_directory(sys.argv[1], workers, force='--force' in sys.argv)
@@ -4,13 +4,19 @@ Rename photos sequentially based on EXIF date/time taken
 Handles multiple cameras with different naming schemes
 """
 
+import os
 import sys
+import json
 from pathlib import Path
 from PIL import Image
 from PIL.ExifTags import TAGS
 from datetime import datetime
 import shutil
 
+JOURNAL_NAME = '.rename_journal.jsonl'
+TEMP_PREFIX = '_rename_tmp_'
+FICLONE = 0x40049409  # Linux ioctl for copy-on-write clones (btrfs, XFS)
+
 def get_exif_datetime(image_path):
     """
     Extract date/time taken from EXIF data
@@ -43,7 +49,194 @@ def get_exif_datetime(image_path):
         return datetime.fromtimestamp(stat.st_mtime)
 
 
-def rename_by_date(source_dir, prefix='photo', output_dir=None, dry_run=False, start_number=1):
+def plan_renames(photos_with_dates, prefix, output_path, start_number=1):
+    """
+    Build the complete list of (source, destination) paths, in date order
+    """
+    plan = []
+    for idx, (image_file, _) in enumerate(photos_with_dates, start_number):
+        ext = image_file.suffix.lower()
+        plan.append((image_file, output_path / f"{prefix}_{idx:04d}{ext}"))
+    return plan
+
+
+def find_collisions(plan, in_place=True):
+    """
+    Return destinations that already exist and would be overwritten
+    In place, a destination is only free if the file there is itself being moved
+    """
+    moving = {src for src, dst in plan if src != dst} if in_place else set()
+    collisions = []
+    for src, dst in plan:
+        if src == dst or dst in moving or not dst.exists():
+            continue
+        if in_place and dst.samefile(src):
+            continue  # Case-only rename on a case-insensitive filesystem
+        collisions.append(dst)
+    return collisions
+
+
+def order_moves(plan, directory):
+    """
+    Turn a rename plan into a sequence of single moves that never overwrite
+    a file that has not moved yet
+    
+    Chains (a → b, b → c) are applied tail first. Cycles (a → b, b → a)
+    are broken by parking one file under a temporary name.
+    """
+    pending = {src: dst for src, dst in plan if src != dst}
+    wanted_by = {dst: src for src, dst in pending.items()}
+    steps = []
+    
+    def drain(src):
+        # Move src, then whichever file was waiting for the name it just freed
+        while src is not None:
+            dst = pending.pop(src)
+            wanted_by.pop(dst, None)
+            steps.append((src, dst))
+            src = wanted_by.get(src)
+    
+    for src in list(pending):
+        if src in pending and pending[src] not in pending:
+            drain(src)
+    
+    # Everything left is part of a cycle
+    temp_count = 0
+    while pending:
+        src, dst = next(iter(pending.items()))
+        temp_count += 1
+        temp = directory / f"{TEMP_PREFIX}{temp_count:04d}{src.suffix.lower()}"
+        while temp.exists():
+            temp_count += 1
+            temp = directory / f"{TEMP_PREFIX}{temp_count:04d}{src.suffix.lower()}"
+        
+        steps.append((src, temp))
+        del pending[src]
+        pending[temp] = dst
+        wanted_by[dst] = temp
+        drain(wanted_by[src])
+    
+    return steps
+
+
+def _append_journal(journal, record):
+    """Write one journal record and force it to disk before the step runs"""
+    journal.write(json.dumps(record) + '\n')
+    journal.flush()
+    os.fsync(journal.fileno())
+
+
+def journal_is_incomplete(journal_path):
+    """True if a journal exists from a run that never reached 'done'"""
+    if not journal_path.exists():
+        return False
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        lines = [line for line in f if line.strip()]
+    return not lines or json.loads(lines[-1]).get('op') != 'done'
+
+
+def apply_moves(steps, journal_path):
+    """
+    Apply in-place moves, journaling each one before it happens
+    """
+    with open(journal_path, 'w', encoding='utf-8') as journal:
+        for src, dst in steps:
+            _append_journal(journal, {'op': 'rename', 'src': str(src), 'dst': str(dst)})
+            src.rename(dst)
+        _append_journal(journal, {'op': 'done'})
+
+
+def reflink_file(src, dst):
+    """
+    Create dst as a copy-on-write clone of src
+    Returns False if the filesystem (or OS) does not support it
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    
+    with open(src, 'rb') as s, open(dst, 'xb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            cloned = False
+        else:
+            cloned = True
+    
+    if not cloned:
+        dst.unlink()
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def link_or_copy(src, dst, link_mode='copy'):
+    """
+    Create dst from src using the cheapest method allowed by link_mode
+    Falls back to a full copy when linking is not possible (e.g. different filesystems)
+    Returns the method actually used
+    """
+    if link_mode == 'hardlink':
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except OSError:
+            pass
+    elif link_mode == 'reflink':
+        if reflink_file(src, dst):
+            return 'reflink'
+    
+    shutil.copy2(src, dst)
+    return 'copy'
+
+
+def apply_links(steps, journal_path, link_mode='copy'):
+    """
+    Create every output file, journaling each one so a failed run can be removed
+    Returns a count of files per method used
+    """
+    methods = {}
+    with open(journal_path, 'w', encoding='utf-8') as journal:
+        for src, dst in steps:
+            _append_journal(journal, {'op': 'create', 'src': str(src), 'dst': str(dst)})
+            method = link_or_copy(src, dst, link_mode)
+            methods[method] = methods.get(method, 0) + 1
+        _append_journal(journal, {'op': 'done'})
+    return methods
+
+
+def rollback_journal(journal_path):
+    """
+    Undo every step recorded in a journal, newest first
+    Steps that never actually ran are skipped. Returns the number of steps undone.
+    """
+    journal_path = Path(journal_path)
+    if not journal_path.exists():
+        return 0
+    
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    
+    undone = 0
+    for record in reversed(records):
+        if record['op'] == 'done':
+            continue
+        src, dst = Path(record['src']), Path(record['dst'])
+        if record['op'] == 'rename':
+            if dst.exists() and not src.exists():
+                dst.rename(src)
+                undone += 1
+        elif record['op'] == 'create':
+            if dst.exists():
+                dst.unlink()
+                undone += 1
+    
+    journal_path.unlink()
+    return undone
+
+
+def rename_by_date(source_dir, prefix='photo', output_dir=None, dry_run=False, start_number=1, link_mode='copy'):
     """
     Rename all photos in source_dir by date/time taken
     
@@ -53,6 +246,10 @@ def rename_by_date(source_dir, prefix='photo', output_dir=None, dry_run=False, s
     - output_dir: Optional output directory (default: rename in place)
     - dry_run: If True, show what would happen without renaming
     - start_number: Starting number for sequence (default: 1)
+    - link_mode: How --output files are created: 'copy', 'hardlink' or 'reflink' (default: 'copy')
+    
+    The whole rename is planned before anything moves, and every step is
+    journaled so an interrupted run can be undone with rollback_journal().
     """
     
     source_path = Path(source_dir)
@@ -90,53 +287,67 @@ def rename_by_date(source_dir, prefix='photo', output_dir=None, dry_run=False, s
     # Prepare output directory
     if output_dir:
         output_path = Path(output_dir)
-        output_path.mkdir(exist_ok=True)
+        if not dry_run:
+            output_path.mkdir(exist_ok=True)
     else:
         output_path = source_path
     
-    # Rename files
-    renamed = 0
-    failed = 0
+    # Plan every rename up front so collisions are caught before any file moves
+    plan = plan_renames(photos_with_dates, prefix, output_path, start_number)
     
-    for idx, (image_file, date_taken) in enumerate(photos_with_dates, start_number):
-        # Get file extension
-        ext = image_file.suffix.lower()
-        
-        # New filename
-        new_name = f"{prefix}_{idx:04d}{ext}"
-        new_path = output_path / new_name
-        
+    for idx, ((image_file, date_taken), (_, new_path)) in enumerate(zip(photos_with_dates, plan), start_number):
         print(f"{idx:4d}. {image_file.name}")
-        print(f"      → {new_name}")
+        print(f"      → {new_path.name}")
         print(f"      {date_taken.strftime('%Y-%m-%d %H:%M:%S')}\n")
-        
-        if not dry_run:
-            try:
-                if output_dir:
-                    # Copy to new location
-                    shutil.copy2(image_file, new_path)
-                else:
-                    # Rename in place
-                    # Use temp name first to avoid conflicts
-                    temp_path = output_path / f"_temp_{idx:04d}{ext}"
-                    image_file.rename(temp_path)
-                    temp_path.rename(new_path)
-                
-                renamed += 1
-            except Exception as e:
-                print(f"      ✗ Error: {e}\n")
-                failed += 1
+    
+    collisions = find_collisions(plan, in_place=not output_dir)
+    if collisions:
+        print(f"✗ Error: {len(collisions)} target name(s) already exist and are not part of this run:")
+        for path in collisions[:10]:
+            print(f"  {path}")
+        print("\nNothing was renamed. Move those files aside or pick another --prefix/--start.")
+        return
+    
+    if output_dir:
+        steps = [(src, dst) for src, dst in plan]
+    else:
+        steps = order_moves(plan, source_path)
+    
+    journal_path = output_path / JOURNAL_NAME
     
     print(f"{'='*60}")
     if dry_run:
         print(f"DRY RUN - No files were actually renamed")
         print(f"Would rename: {len(photos_with_dates)} files")
+        if not output_dir:
+            temp_moves = sum(1 for _, dst in steps if dst.name.startswith(TEMP_PREFIX))
+            print(f"  Moves needed: {len(steps)} ({temp_moves} temporary, to break rename cycles)")
     else:
+        if journal_is_incomplete(journal_path):
+            print(f"✗ Error: {journal_path} is left over from an interrupted run")
+            print(f"  Undo it first: python rename_by_date.py {output_path} --rollback")
+            return
+        
+        try:
+            if output_dir:
+                methods = apply_links(steps, journal_path, link_mode)
+            else:
+                apply_moves(steps, journal_path)
+                methods = {}
+        except Exception as e:
+            print(f"✗ Error: {e}")
+            print("  Rolling back...")
+            undone = rollback_journal(journal_path)
+            print(f"  Restored {undone} file(s); folder is back to its original state")
+            return
+        
         print(f"✓ Complete!")
-        print(f"  Renamed: {renamed}")
-        print(f"  Failed: {failed}")
+        print(f"  Renamed: {len(plan)}")
+        for method, count in sorted(methods.items()):
+            print(f"  {method.capitalize()}: {count}")
         if output_dir:
             print(f"  Location: {output_path}")
+        print(f"  Journal: {journal_path} (undo with --rollback)")
     
     print(f"\nNext steps:")
     print(f"  1. python generate_csv_from_images.py {output_path if output_dir else source_path}")
@@ -146,19 +357,32 @@ def rename_by_date(source_dir, prefix='photo', output_dir=None, dry_run=False, s
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
-        print("Usage: python rename_by_date.py <source_directory> [--prefix name] [--output directory] [--start number] [--dry-run]")
+        print("Usage: python rename_by_date.py <source_directory> [--prefix name] [--output directory] [--start number] [--link copy|hardlink|reflink] [--dry-run]")
+        print("       python rename_by_date.py <directory> --rollback")
         print("\nExamples:")
         print("  python rename_by_date.py ./all_cameras/")
         print("  python rename_by_date.py ./all_cameras/ --prefix crankcross")
         print("  python rename_by_date.py ./start_line/ --prefix crankcross --start 1")
         print("  python rename_by_date.py ./finish_line/ --prefix crankcross --start 1000")
         print("  python rename_by_date.py ./all_cameras/ --prefix iceman --output ./sorted/")
+        print("  python rename_by_date.py ./all_cameras/ --prefix iceman --output ./sorted/ --link reflink")
         print("  python rename_by_date.py ./all_cameras/ --dry-run")
+        print("  python rename_by_date.py ./all_cameras/ --rollback")
         print("\nDefaults:")
         print("  Prefix: photo")
         print("  Output: Rename in place (same directory)")
         print("  Start: 1")
+        print("  Link: copy (full byte copy into --output)")
         print("  Dry run: False (actually rename files)")
+        print("\nOutput link modes (only used with --output):")
+        print("  copy      Full copy of every file")
+        print("  reflink   Copy-on-write clone, instant on btrfs/XFS (falls back to copy)")
+        print("  hardlink  Same file under a second name, instant on the same filesystem")
+        print("            (falls back to copy). Edits to either name change both!")
+        print("\nSafety:")
+        print("  The whole rename is planned first and aborts if a target name is taken.")
+        print("  Every step is journaled to .rename_journal.jsonl; a failed run is rolled")
+        print("  back automatically, and --rollback undoes the last run in that folder.")
         print("\nDry run mode:")
         print("  Use --dry-run to see what would happen without actually renaming")
         print("\nMultiple locations workflow:")
@@ -175,6 +399,16 @@ if __name__ == '__main__':
     output_dir = None
     dry_run = False
     start_number = 1
+    link_mode = 'copy'
+    
+    if '--rollback' in sys.argv:
+        journal_path = Path(source_dir) / JOURNAL_NAME
+        if not journal_path.exists():
+            print(f"✗ No journal found: {journal_path}")
+            sys.exit(1)
+        undone = rollback_journal(journal_path)
+        print(f"✓ Rolled back {undone} file(s) in {source_dir}")
+        sys.exit(0)
     
     # Parse optional arguments
     if '--prefix' in sys.argv:
@@ -192,6 +426,14 @@ if __name__ == '__main__':
         if start_idx + 1 < len(sys.argv):
             start_number = int(sys.argv[start_idx + 1])
     
+    if '--link' in sys.argv:
+        link_idx = sys.argv.index('--link')
+        if link_idx + 1 < len(sys.argv):
+            link_mode = sys.argv[link_idx + 1]
+        if link_mode not in ('copy', 'hardlink', 'reflink'):
+            print(f"✗ Error: --link must be copy, hardlink or reflink (got {link_mode})")
+            sys.exit(1)
+    
     if '--dry-run' in sys.argv:
         dry_run = True
     
@@ -202,7 +444,9 @@ if __name__ == '__main__':
     print(f"Prefix: {prefix}")
     print(f"Start number: {start_number}")
     print(f"Output: {output_dir if output_dir else 'Rename in place'}")
+    if output_dir:
+        print(f"Link: {link_mode}")
     print(f"Mode: {'DRY RUN (no changes)' if dry_run else 'RENAME FILES'}")
     print(f"{'='*60}\n")
     
-    rename_by_date(source_dir, prefix, output_dir, dry_run, start_number)
+    rename_by_date(source_dir, prefix, output_dir, dry_run, start_number, link_mode)
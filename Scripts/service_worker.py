@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Service worker for a built site, so repeat visits to an event page (often on
+poor mobile signal) come from the browser's cache
+
+- The shared gallery CSS/JS are precached when the worker installs
+- Each gallery page and its data files are precached the first time the page
+  is opened, then served from the cache until a build changes them
+- Other data files (race number shards, the full data of sharded pages) are
+  cached the first time they're used
+- Thumbnails are cached on first view, keeping the most recently used
+  MAX_THUMBNAIL_BYTES (see below for thumbnails from other hosts)
+
+Only readable responses are cached: opaque ones (plain cross-origin <img>
+requests) can't be sized and browsers charge each one megabytes of storage
+quota, so by default thumbnails from the photo hosts are left to the HTTP
+cache. Pages built with --cors-thumbnails request them with
+crossorigin="anonymous" (see image_markup.py) and get them cached here; the
+photo bucket then needs a CORS rule allowing GET from the site, e.g. for B2:
+  [{"corsRuleName": "gallery", "allowedOrigins": ["https://adamwatson.photo"],
+    "allowedOperations": ["b2_download_file_by_name"], "maxAgeSeconds": 86400}]
+
+Data files and the shared CSS/JS have content hashes in their names; pages
+are cached under their own content hash, so a rebuilt page replaces the old
+copy when the new worker activates. Serve sw.js itself without long-lived
+caching headers so browsers pick up new builds.
+"""
+
+import os
+import re
+import csv
+import sys
+import json
+import tempfile
+from pathlib import Path
+from gallery_build import content_hash
+from precompress import page_files
+from image_markup import RENDITION_COLUMN
+from minify import minify_js
+
+SERVICE_WORKER_FILE = 'sw.js'
+
+# Thumbnail cache size, summed from Content-Length (a few pages of thumbnails)
+MAX_THUMBNAIL_BYTES = 30 * 1024 * 1024
+
+# Counted for a thumbnail without a Content-Length header
+THUMBNAIL_ESTIMATE_BYTES = 60 * 1024
+
+ASSET_REFERENCE = re.compile(r'''(?:href|src)=["']?(gallery\.[0-9a-f]+\.(?:css|js))''')
+
+SERVICE_WORKER_JS = '''// Generated by service_worker.py
+const SHELL = %(shell)s;
+const PAGES = %(pages)s;  // Page -> [content hash, files precached on its first visit]
+const FILES = %(files)s;  // Cached the first time they're used
+const THUMBNAIL_PREFIXES = %(prefixes)s;
+const MAX_THUMBNAIL_BYTES = %(max_thumbnail_bytes)d;
+const THUMBNAIL_ESTIMATE_BYTES = %(thumbnail_estimate_bytes)d;
+
+const FILE_CACHE = 'gallery-files';
+const THUMBNAIL_CACHE = 'gallery-thumbnails';
+const BASE = new URL('./', self.location).href;
+
+// Pages are stored under their content hash so a rebuilt page isn't served stale
+function pageKey(page) {
+    return `${BASE}${page}?revision=${PAGES[page][0]}`;
+}
+
+const CURRENT = new Set(SHELL.concat(FILES).map(file => BASE + file));
+for (const [page, [, files]] of Object.entries(PAGES)) {
+    CURRENT.add(pageKey(page));
+    files.forEach(file => CURRENT.add(BASE + file));
+}
+
+function precache(files) {
+    return caches.open(FILE_CACHE).then(cache => Promise.all(files.map(file =>
+        cache.match(BASE + file).then(cached => cached || cache.add(BASE + file))
+    )));
+}
+
+self.addEventListener('install', event => {
+    event.waitUntil(precache(SHELL).then(() => self.skipWaiting()));
+});
+
+// Drop files from earlier builds
+self.addEventListener('activate', event => {
+    event.waitUntil(caches.open(FILE_CACHE)
+        .then(cache => cache.keys().then(requests => Promise.all(requests
+            .filter(request => !CURRENT.has(request.url))
+            .map(request => cache.delete(request)))))
+        .then(() => self.clients.claim()));
+});
+
+function cacheFirst(cacheName, request, key) {
+    return caches.open(cacheName).then(cache => cache.match(key).then(cached => cached ||
+        fetch(request).then(response => {
+            if (response.ok && !response.redirected) cache.put(key, response.clone());
+            return response;
+        })
+    ));
+}
+
+function responseBytes(response) {
+    return parseInt(response.headers.get('Content-Length')) || THUMBNAIL_ESTIMATE_BYTES;
+}
+
+// Cached thumbnails: URL → bytes, least recently used first. Read from the
+// cache once per worker start; a hit is stored again, which moves it to the
+// end of the cache's key order too.
+let thumbnailIndex = null;
+function loadThumbnailIndex(cache) {
+    if (!thumbnailIndex) {
+        thumbnailIndex = cache.keys().then(requests => Promise.all(requests.map(request =>
+            cache.match(request).then(response => [request.url, response ? responseBytes(response) : 0])
+        ))).then(entries => new Map(entries));
+    }
+    return thumbnailIndex;
+}
+
+function touchThumbnail(index, url, bytes) {
+    index.delete(url);
+    index.set(url, bytes);
+}
+
+// Drop the least recently used thumbnails until the total fits the budget
+function trimThumbnails(cache, index) {
+    let total = 0;
+    for (const bytes of index.values()) total += bytes;
+    const removed = [];
+    for (const [url, bytes] of index) {
+        if (total <= MAX_THUMBNAIL_BYTES) break;
+        total -= bytes;
+        index.delete(url);
+        removed.push(cache.delete(url));
+    }
+    return Promise.all(removed);
+}
+
+function cacheThumbnail(event) {
+    const request = event.request;
+    return caches.open(THUMBNAIL_CACHE).then(cache => Promise.all([cache.match(request), loadThumbnailIndex(cache)])
+        .then(([cached, index]) => {
+            if (cached) {
+                touchThumbnail(index, request.url, responseBytes(cached));
+                event.waitUntil(cache.put(request, cached.clone()));
+                return cached;
+            }
+            return fetch(request).then(response => {
+                // Only readable (CORS) responses: opaque ones can't be sized and
+                // take megabytes of quota each
+                if (response.ok) {
+                    touchThumbnail(index, request.url, responseBytes(response));
+                    event.waitUntil(cache.put(request, response.clone()).then(() => trimThumbnails(cache, index)));
+                }
+                return response;
+            });
+        }));
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    
+    if (request.url.startsWith(BASE)) {
+        const path = request.url.slice(BASE.length).split(/[?#]/)[0];
+        const page = [path, `${path}.html`, `${path}index.html`].find(name => name in PAGES);
+        if (page) {
+            const response = cacheFirst(FILE_CACHE, request, pageKey(page));
+            event.respondWith(response);
+            event.waitUntil(response.then(() => precache(PAGES[page][1])));
+        } else if (CURRENT.has(BASE + path)) {
+            event.respondWith(cacheFirst(FILE_CACHE, request, BASE + path));
+        }
+    } else if (request.destination === 'image' && THUMBNAIL_PREFIXES.some(prefix => request.url.startsWith(prefix))) {
+        event.respondWith(cacheThumbnail(event));
+    }
+});
+'''
+
+
+def thumbnail_prefixes(csv_file):
+    """Folder URLs the thumbnails in a catalog are served from"""
+    prefixes = set()
+    with open(csv_file, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            for column, value in row.items():
+                if column == 'thumbnail_url' or RENDITION_COLUMN.match(column or ''):
+                    value = (value or '').strip()
+                    if value.startswith(('https://', 'http://')):
+                        prefixes.add(value[:value.rindex('/') + 1])
+    return prefixes
+
+
+def page_cache_entry(site_dir, output):
+    """
+    Cache lists for one built page
+    Returns (content hash, data files precached with the page, data files
+    cached on use, shared CSS/JS), paths relative to site_dir
+    """
+    page = site_dir / output
+    html = page.read_text(encoding='utf-8')
+    data_files = [path.relative_to(site_dir).as_posix() for path in page_files(page)[1:]]
+    
+    # Sharded pages open with their first-page file; shards and the full data
+    # only load when a visitor searches or pages on
+    shard_files = [name for name in data_files if '.shard-' in name]
+    if shard_files:
+        precached = [name for name in data_files if '.page-1.' in name]
+    else:
+        precached = data_files
+    on_use = [name for name in data_files if name not in precached]
+    
+    assets = [(page.parent / name).relative_to(site_dir).as_posix() for name in ASSET_REFERENCE.findall(html)]
+    return content_hash(html), precached, on_use, assets
+
+
+def write_service_worker(site_dir, events, minify=True):
+    """
+    Write sw.js for the built event pages
+    events are site manifest entries (see build_site.py); pages that don't
+    exist yet are left out. An unchanged sw.js is left alone. Returns its path.
+    """
+    site_dir = Path(site_dir)
+    shell, pages, files, prefixes = set(), {}, set(), set()
+    
+    for event in events:
+        if not (site_dir / event['output']).exists():
+            continue
+        revision, precached, on_use, assets = page_cache_entry(site_dir, event['output'])
+        pages[event['output']] = [revision, precached]
+        files.update(on_use)
+        shell.update(assets)
+        csv_path = site_dir / event['csv']
+        if csv_path.exists():
+            prefixes.update(thumbnail_prefixes(csv_path))
+    
+    js = SERVICE_WORKER_JS % {
+        'shell': json.dumps(sorted(shell)),
+        'pages': json.dumps(pages, sort_keys=True),
+        'files': json.dumps(sorted(files)),
+        'prefixes': json.dumps(sorted(prefixes)),
+        'max_thumbnail_bytes': MAX_THUMBNAIL_BYTES,
+        'thumbnail_estimate_bytes': THUMBNAIL_ESTIMATE_BYTES,
+    }
+    if minify:
+        js = minify_js(js)
+    
+    path = site_dir / SERVICE_WORKER_FILE
+    if path.exists() and path.read_text(encoding='utf-8') == js:
+        print(f"✓ {SERVICE_WORKER_FILE} up to date")
+        return path
+    
+    fd, temp_name = tempfile.mkstemp(dir=site_dir, prefix=f'.{SERVICE_WORKER_FILE}.', suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(js)
+    os.chmod(temp_name, 0o644)
+    os.replace(temp_name, path)
+    
+    print(f"✓ Wrote {SERVICE_WORKER_FILE}: {len(pages)} pages, {len(shell)} shared files, "
+          f"{len(prefixes)} thumbnail locations")
+    return path
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python service_worker.py <site_manifest.json> [--pretty]")
+        print("\nWrites sw.js next to the manifest (build_site.py does this automatically)")
+        sys.exit(1)
+    
+    manifest_path = Path(sys.argv[1]).resolve()
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest_events = json.load(f)['events']
+    write_service_worker(manifest_path.parent, manifest_events, minify='--pretty' not in sys.argv)
@@ -0,0 +1,6 @@
+"""The scripts import each other by module name, so put Scripts/ on the path"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,71 @@
+"""Page weight audit: budgets, inline JSON and first-view requests (audit_pages.py)"""
+
+import json
+
+from audit_pages import DEFAULT_BUDGETS, audit_page, audit_pages, budgets_for, inline_json, load_budgets
+
+
+def test_budgets_for_applies_every_matching_pattern_in_order():
+    pages = {'*.html': {'requests': 30}, 'iceman-*.html': {'requests': 40, 'html_kb': 300}}
+    assert budgets_for('iceman-20251108.html', {'requests': 20, 'html_kb': 150}, pages) == \
+        {'requests': 40, 'html_kb': 300}
+    assert budgets_for('index.html', {'requests': 20, 'html_kb': 150}, pages) == \
+        {'requests': 30, 'html_kb': 150}
+
+
+def test_load_budgets_overrides_win_over_the_file(tmp_path):
+    budget_file = tmp_path / 'budgets.json'
+    budget_file.write_text(json.dumps({'default': {'html_kb': 200, 'requests': 25},
+                                       'pages': {'big-*.html': {'html_kb': 400}}}))
+    defaults, pages = load_budgets(budget_file, {'requests': 10})
+    assert defaults == dict(DEFAULT_BUDGETS, html_kb=200, requests=10)
+    assert pages == {'big-*.html': {'html_kb': 400}}
+
+
+def test_inline_json_finds_assigned_and_passed_values():
+    script = ('const photoData = {"count": 2, "ids": [1, 2]};\n'
+              'photoStore.add([{"a": 1}]);\n'
+              'if (x < 3 && y) { run(); }\n'
+              'const empty = {};')
+    assert [value for _, value in inline_json(script)] == [{'count': 2, 'ids': [1, 2]}, [{'a': 1}]]
+    assert inline_json(script)[0][0] == '{"count": 2, "ids": [1, 2]}'
+
+
+def write_page(tmp_path, name='race.html'):
+    (tmp_path / 'gallery.abc.css').write_text('x' * 2048)
+    (tmp_path / 'race.page-1.abc.json').write_text('y' * 1024)
+    (tmp_path / 'thumb1.jpg').write_bytes(b'z' * 4096)
+    directory = {'firstPage': 'race.page-1.abc.json', 'shards': ['race.shard-00.abc.json']}
+    (tmp_path / name).write_text(f'''<html><head>
+<link rel="stylesheet" href="gallery.abc.css"><link rel="preconnect" href="https://f.example.com">
+<script src="gallery.abc.js"></script>
+<script>const directory = {json.dumps(directory)};</script>
+</head><body>
+<img src="logo.png">
+<div id="photoGallery"><div class="photo-card"><img src="thumb1.jpg"></div>
+<div class="photo-card"><img src="https://f.example.com/t/thumb2.jpg" loading="lazy"></div></div>
+</body></html>''')
+    return tmp_path / name
+
+
+def test_audit_page_counts_first_view_requests_only(tmp_path):
+    result = audit_page(write_page(tmp_path), {'thumb2.jpg': 1024})
+    # CSS, JS, logo, first thumbnail and the first-page data; not the shard or lazy image
+    assert result['requests'] == 5
+    assert result['assets_kb'] == 3
+    assert result['thumbnails'] == 2
+    assert result['thumbnails_kb'] == 5
+    assert result['thumbnails_missing'] == 0
+
+
+def test_audit_page_skips_pages_without_a_grid(tmp_path):
+    page = tmp_path / 'about.html'
+    page.write_text('<html><body><img src="me.jpg"></body></html>')
+    assert audit_page(page, {}) is None
+
+
+def test_audit_pages_fails_over_budget(tmp_path, capsys):
+    write_page(tmp_path)
+    assert audit_pages([tmp_path])
+    assert not audit_pages([tmp_path], overrides={'requests': 4})
+    assert 'over budget: requests 5 > 4' in capsys.readouterr().out
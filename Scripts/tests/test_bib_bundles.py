@@ -0,0 +1,67 @@
+"""Per-race-number zip bundles (bib_bundles.py)"""
+
+import os
+import urllib.error
+import zipfile
+
+import bib_bundles
+from bib_bundles import build_bib_bundles, unique_names
+
+
+def write_event(tmp_path, rows):
+    photos = tmp_path / 'photos'
+    photos.mkdir()
+    lines = ['filename,race_number_1,race_number_2,download_url']
+    for filename, numbers, url in rows:
+        if not url:
+            (photos / filename).write_bytes(filename.encode() * 100)
+        lines.append(f"{filename},{','.join((numbers + ['', ''])[:2])},{url}")
+    catalog = tmp_path / 'tags.csv'
+    catalog.write_text('\n'.join(lines) + '\n')
+    return catalog, photos
+
+
+def test_bundles_hold_each_numbers_photos_stored(tmp_path):
+    catalog, photos = write_event(tmp_path, [('a.jpg', ['1'], ''), ('b.jpg', ['1', '2'], '')])
+    bundles = build_bib_bundles(catalog, tmp_path / 'out', 'race', photos)
+    
+    assert sorted(bundles) == ['1', '2']
+    with zipfile.ZipFile(tmp_path / 'out' / bundles['1']) as bundle:
+        assert bundle.namelist() == ['a.jpg', 'b.jpg']
+        assert {info.compress_type for info in bundle.infolist()} == {zipfile.ZIP_STORED}
+        assert bundle.read('b.jpg') == b'b.jpg' * 100
+
+
+def test_unchanged_bundles_are_skipped_and_replaced_ones_removed(tmp_path, capsys):
+    catalog, photos = write_event(tmp_path, [('a.jpg', ['1'], ''), ('b.jpg', ['2'], '')])
+    first = build_bib_bundles(catalog, tmp_path / 'out', 'race', photos)
+    assert build_bib_bundles(catalog, tmp_path / 'out', 'race', photos) == first
+    assert '0 built, 2 unchanged, 0 removed' in capsys.readouterr().out
+    
+    (photos / 'b.jpg').write_bytes(b'edited')
+    os.utime(photos / 'b.jpg', ns=(0, 10 ** 18))
+    second = build_bib_bundles(catalog, tmp_path / 'out', 'race', photos)
+    assert second['1'] == first['1'] and second['2'] != first['2']
+    assert '1 built, 1 unchanged, 1 removed' in capsys.readouterr().out
+    assert sorted(f.name for f in (tmp_path / 'out').iterdir()) == sorted(second.values())
+
+
+def test_failed_download_skips_only_that_bundle(tmp_path, monkeypatch, capsys):
+    catalog, photos = write_event(tmp_path, [('a.jpg', ['1'], ''),
+                                             ('b.jpg', ['2'], 'https://photos.example.com/b.jpg')])
+    
+    def unreachable(url, timeout=None):
+        assert timeout == bib_bundles.DOWNLOAD_TIMEOUT
+        raise urllib.error.URLError('timed out')
+    
+    monkeypatch.setattr(bib_bundles.urllib.request, 'urlopen', unreachable)
+    bundles = build_bib_bundles(catalog, tmp_path / 'out', 'race', photos)
+    
+    assert list(bundles) == ['1']
+    assert 'could not download b.jpg: timed out' in capsys.readouterr().out
+    assert [f.name for f in (tmp_path / 'out').iterdir()] == [bundles['1']]
+
+
+def test_unique_names():
+    entries = [('a.jpg', 1), ('A.jpg', 2), ('a.jpg', 3)]
+    assert unique_names(entries) == [('a.jpg', 1), ('A-2.jpg', 2), ('a-3.jpg', 3)]
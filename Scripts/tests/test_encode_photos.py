@@ -0,0 +1,100 @@
+"""Column encoding of page photo data round-trips (gallery_build.encode_photos)"""
+
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from gallery_build import PHOTO_STORE_JS, _sequence, encode_photos
+
+
+def column_value(column, row):
+    if isinstance(column, list):
+        return column[row]
+    return str(column['seq'] + row).zfill(column['pad'])
+
+
+def decode_photos(encoded):
+    """Python twin of expandPhoto() in PHOTO_STORE_JS"""
+    photos = []
+    for row in range(encoded['count']):
+        photo = {}
+        for name, field in encoded['fields'].items():
+            if 'same' in field:
+                photo[name] = photo[field['same']]
+            elif 'const' in field:
+                photo[name] = field['const']
+            else:
+                if 'prefixColumn' in field:
+                    prefix = encoded['prefixes'][int(column_value(encoded['columns'][field['prefixColumn']], row))]
+                else:
+                    prefix = encoded['prefixes'][field['prefix']] if 'prefix' in field else ''
+                photo[name] = prefix + column_value(encoded['columns'][field['column']], row) + field.get('suffix', '')
+        photos.append(photo)
+    return photos
+
+
+def sample_photos():
+    photos = []
+    for i in range(1, 41):
+        photos.append({
+            'filename': f'iceman_{i:04d}.jpg',
+            'thumbnail': f'https://f.example.com/file/bucket/iceman/thumbs/iceman_{i:04d}.jpg',
+            'large': f'https://live.staticflickr.com/{65535 - i % 3}/5{i * 7919}_{i:x}abc_b.jpg',
+            'download': f'https://f.example.com/file/bucket/iceman/thumbs/iceman_{i:04d}.jpg',
+            'race_numbers': f'{i * 3},{i * 3 + 1}' if i % 2 else str(i),
+            'event': 'Iceman Cometh',
+            'photo_number': str(i),
+        })
+    photos[5]['large'] = 'https://live.staticflickr.com/65535/odd.png'
+    return photos
+
+
+def test_round_trip():
+    photos = sample_photos()
+    assert decode_photos(encode_photos(photos)) == photos
+
+
+def test_shared_parts_are_stored_once():
+    encoded = encode_photos(sample_photos())
+    fields = encoded['fields']
+    assert fields['download'] == {'same': 'thumbnail'}
+    assert fields['event'] == {'const': 'Iceman Cometh'}
+    assert fields['thumbnail']['suffix'] == '.jpg'
+    # The common '00' of iceman_0001..iceman_0040 folds into the prefix too
+    assert encoded['prefixes'][fields['thumbnail']['prefix']] == 'https://f.example.com/file/bucket/iceman/thumbs/iceman_00'
+    assert encoded['columns'][fields['thumbnail']['column']] == {'seq': 1, 'pad': 2}
+    assert 'prefixColumn' in fields['large']
+    assert len(encoded['prefixes']) == len(set(encoded['prefixes']))
+
+
+def test_missing_values_become_empty_strings_and_ids_are_kept():
+    photos = [{'a': 'x/1.jpg'}, {'a': 'x/2.jpg', 'b': 'only here'}]
+    encoded = encode_photos(photos, ids=[10, 4])
+    assert encoded['ids'] == [10, 4]
+    assert decode_photos(encoded) == [{'a': 'x/1.jpg', 'b': ''}, {'a': 'x/2.jpg', 'b': 'only here'}]
+    assert 'ids' not in encode_photos(photos, ids=[0, 1])
+
+
+@pytest.mark.parametrize('values, expected', [
+    (['1', '2', '3'], {'seq': 1, 'pad': 0}),
+    (['0098', '0099', '0100'], {'seq': 98, 'pad': 4}),
+    (['1', '3'], None),
+    (['01', '2'], None),
+    (['1', '²'], None),
+    (['-1', '0'], None),
+    ([], None),
+])
+def test_sequence(values, expected):
+    assert _sequence(values) == expected
+
+
+@pytest.mark.skipif(not shutil.which('node'), reason='needs node')
+def test_page_expands_the_same_photos():
+    photos = sample_photos()
+    encoded = encode_photos(photos, ids=range(100, 140))
+    script = (PHOTO_STORE_JS + f"photoStore.add({json.dumps(encoded)});\n"
+              "console.log(JSON.stringify(Array.from({length: 40}, (_, i) => photoStore.get(100 + i))));")
+    result = subprocess.run(['node', '-e', script], capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout) == photos
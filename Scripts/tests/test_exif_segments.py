@@ -0,0 +1,97 @@
+"""In-place keyword patching and decoding on synthetic JPEGs (exif_segments.py)"""
+
+import struct
+
+import pytest
+
+from exif_segments import (EXIF_IFD_POINTER, USER_COMMENT, XP_KEYWORDS, can_patch_in_place,
+                           decode_keywords, encode_keywords, pad_payload, patch_keywords_in_place,
+                           read_keywords)
+
+PIXELS = b'\xff\xda\x00\x02' + b'\x12\x34' * 50 + b'\xff\xd9'
+
+
+def make_jpeg(keywords='', user_comment_size=128, xp_keywords_size=256, endian='<'):
+    """
+    A JPEG with just an EXIF block holding UserComment and XPKeywords
+    (padded to the given sizes) followed by fake image data
+    """
+    payloads = encode_keywords(keywords)
+    user_comment = pad_payload(payloads[USER_COMMENT], user_comment_size)
+    xp_keywords = pad_payload(payloads[XP_KEYWORDS], xp_keywords_size)
+    
+    # Layout: header, IFD0 (2 entries), Exif IFD (1 entry), then the values
+    ifd0 = 8
+    exif_ifd = ifd0 + 2 + 2 * 12 + 4
+    xp_offset = exif_ifd + 2 + 12 + 4
+    comment_offset = xp_offset + len(xp_keywords)
+    
+    tiff = (b'II' if endian == '<' else b'MM') + struct.pack(endian + 'HI', 42, ifd0)
+    tiff += struct.pack(endian + 'H', 2)
+    tiff += struct.pack(endian + 'HHII', XP_KEYWORDS, 1, len(xp_keywords), xp_offset)
+    tiff += struct.pack(endian + 'HHII', EXIF_IFD_POINTER, 4, 1, exif_ifd)
+    tiff += struct.pack(endian + 'I', 0)
+    tiff += struct.pack(endian + 'H', 1)
+    tiff += struct.pack(endian + 'HHII', USER_COMMENT, 7, len(user_comment), comment_offset)
+    tiff += struct.pack(endian + 'I', 0)
+    tiff += xp_keywords + user_comment
+    
+    app1 = b'Exif\x00\x00' + tiff
+    return b'\xff\xd8' + b'\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1 + PIXELS
+
+
+@pytest.mark.parametrize('endian', ['<', '>'])
+def test_patch_rewrites_only_the_keyword_bytes(tmp_path, endian):
+    photo = tmp_path / 'photo.jpg'
+    original = make_jpeg('101', endian=endian)
+    photo.write_bytes(original)
+    
+    assert can_patch_in_place(photo, '101, 202')
+    assert patch_keywords_in_place(photo, '101, 202') == 128 + 256
+    
+    patched = photo.read_bytes()
+    assert len(patched) == len(original)
+    assert patched.endswith(PIXELS)
+    assert read_keywords(photo) == ['101', '202']
+
+
+def test_patch_refuses_values_that_do_not_fit(tmp_path):
+    photo = tmp_path / 'photo.jpg'
+    photo.write_bytes(make_jpeg('1', user_comment_size=8, xp_keywords_size=16))
+    original = photo.read_bytes()
+    
+    assert not can_patch_in_place(photo, '1, 2, 3, 4, 5')
+    assert patch_keywords_in_place(photo, '1, 2, 3, 4, 5') is None
+    assert photo.read_bytes() == original
+
+
+def test_shorter_value_clears_the_old_one(tmp_path):
+    photo = tmp_path / 'photo.jpg'
+    photo.write_bytes(make_jpeg('1234, 5678'))
+    patch_keywords_in_place(photo, '9')
+    assert read_keywords(photo) == ['9']
+
+
+def test_no_exif_means_no_patch_and_no_keywords(tmp_path):
+    photo = tmp_path / 'photo.jpg'
+    photo.write_bytes(b'\xff\xd8' + PIXELS)
+    assert patch_keywords_in_place(photo, '1') is None
+    assert read_keywords(photo) == []
+
+
+def test_not_a_jpeg(tmp_path):
+    photo = tmp_path / 'photo.png'
+    photo.write_bytes(b'\x89PNG\r\n\x1a\n')
+    assert not can_patch_in_place(photo, '1')
+    assert read_keywords(photo) == []
+
+
+@pytest.mark.parametrize('tag, value, expected', [
+    (XP_KEYWORDS, '12;34'.encode('utf-16le') + b'\x00' * 10, ['12', '34']),
+    (USER_COMMENT, b'5, 6,,7\x00\x00\x00', ['5', '6', '7']),
+    (USER_COMMENT, b'ASCII\x00\x00\x0042', ['42']),
+    (USER_COMMENT, b'UNICODE\x00' + '8,9'.encode('utf-16'), ['8', '9']),
+    (USER_COMMENT, b'\x00' * 16, []),
+])
+def test_decode_keywords(tag, value, expected):
+    assert decode_keywords(tag, value) == expected
@@ -0,0 +1,60 @@
+"""JS/CSS/HTML minifiers keep the code's meaning (minify.py)"""
+
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from gallery_assets import gallery_js
+from generate_race_gallery import SEARCH_WORKER_JS
+from minify import minify_css, minify_html, minify_js
+
+needs_node = pytest.mark.skipif(not shutil.which('node'), reason='needs node')
+
+
+@pytest.mark.parametrize('src, expected', [
+    ('const a = 1 / 2 / 3; // c\nconst r = /[/]\\//g;', 'const a=1/2/3;const r=/[/]\\//g;'),
+    ('x = a /* c */ / b', 'x=a/b'),
+    ('if (x) /re/.test(y)', 'if(x)/re/.test(y)'),
+    ('s = "// /* x */"', 's="// /* x */"'),
+    ('const t = `a ${ b + `c ${d}` } // kept`;', 'const t=`a ${b+`c ${d}`} // kept`;'),
+    ('a + +b; a - -b; a+ ++b', 'a+ +b;a- -b;a+ ++b'),
+    # Newlines that automatic semicolon insertion depends on survive
+    ('return\nx', 'return\nx'),
+    ('let x = a\n++b', 'let x=a\n++b'),
+    ('const f = (a, b) => { return a }\nf()', 'const f=(a,b)=>{return a}\nf()'),
+])
+def test_minify_js(src, expected):
+    assert minify_js(src) == expected
+
+
+@needs_node
+@pytest.mark.parametrize('src', [
+    'let a = 10, g = 2, b = 4; const r = [a / 2 / g, "a//b".replace(/\\//g, "-"), `${a}/${b}`]; r',
+    'function f(x) {\n  return\n  x\n}\nlet i = 1\nlet j = i\n++i\n[f(1), i, j]',
+    'const o = { "key": `x ${ [1, 2].map(n => `<${n}>`).join("") } y` }; o.key',
+])
+def test_minified_js_evaluates_the_same(src):
+    script = f"console.log(JSON.stringify([eval({json.dumps(src)}), eval({json.dumps(minify_js(src))})]))"
+    result = subprocess.run(['node', '-e', script], capture_output=True, text=True, check=True)
+    original, minified = json.loads(result.stdout)
+    assert original == minified
+
+
+@needs_node
+@pytest.mark.parametrize('source', [gallery_js, lambda: SEARCH_WORKER_JS], ids=['gallery', 'search-worker'])
+def test_minified_scripts_still_parse(source):
+    script = f"new (require('vm').Script)({json.dumps(minify_js(source()))})"
+    subprocess.run(['node', '-e', script], capture_output=True, text=True, check=True)
+
+
+def test_minify_css():
+    src = 'a :hover { color : red ; margin: 0 auto }  /* c */ .b>.c , .d{x:url( a.png )}'
+    assert minify_css(src) == 'a :hover{color :red;margin:0 auto}.b>.c,.d{x:url( a.png )}'
+
+
+def test_minify_html_keeps_pre_and_minifies_scripts():
+    src = ('<div  class="a">\n  <pre>  x\n y </pre>\n <!-- c --> <script>\n // hi\n var a = 1;\n</script>'
+           '  <p> a  b </p></div>')
+    assert minify_html(src) == '<div class="a"><pre>  x\n y </pre> <script>var a=1;</script><p>a b</p></div>'
@@ -0,0 +1,109 @@
+"""Rename planning, move ordering and journal rollback (rename_by_date.py)"""
+
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('PIL')
+
+from rename_by_date import (TEMP_PREFIX, apply_moves, find_collisions, journal_is_incomplete,
+                            order_moves, plan_renames, rollback_journal)
+
+
+def make_files(directory, names):
+    """Create files whose content is their own name, so moves can be traced"""
+    for name in names:
+        (directory / name).write_text(name)
+
+
+def contents(directory):
+    return {f.name: f.read_text() for f in directory.iterdir() if not f.name.startswith('.')}
+
+
+def test_plan_renames_numbers_in_date_order_and_lowercases_extension(tmp_path):
+    photos = [(tmp_path / 'B.JPG', 1), (tmp_path / 'a.jpeg', 2)]
+    plan = plan_renames(photos, 'iceman', tmp_path, start_number=7)
+    assert plan == [(tmp_path / 'B.JPG', tmp_path / 'iceman_0007.jpg'),
+                    (tmp_path / 'a.jpeg', tmp_path / 'iceman_0008.jpeg')]
+
+
+def test_find_collisions_ignores_files_that_are_moving_away(tmp_path):
+    make_files(tmp_path, ['a.jpg', 'b.jpg', 'other.jpg'])
+    plan = [(tmp_path / 'a.jpg', tmp_path / 'b.jpg'), (tmp_path / 'b.jpg', tmp_path / 'other.jpg')]
+    assert find_collisions(plan) == [tmp_path / 'other.jpg']
+    assert find_collisions(plan, in_place=False) == [tmp_path / 'b.jpg', tmp_path / 'other.jpg']
+
+
+def test_order_moves_applies_chains_tail_first(tmp_path):
+    make_files(tmp_path, ['a', 'b'])
+    plan = [(tmp_path / 'a', tmp_path / 'b'), (tmp_path / 'b', tmp_path / 'c')]
+    steps = order_moves(plan, tmp_path)
+    assert steps == [(tmp_path / 'b', tmp_path / 'c'), (tmp_path / 'a', tmp_path / 'b')]
+
+
+def test_order_moves_breaks_cycles_with_a_temp_name(tmp_path):
+    make_files(tmp_path, ['a.jpg', 'b.jpg', 'c.jpg'])
+    plan = [(tmp_path / 'a.jpg', tmp_path / 'b.jpg'),
+            (tmp_path / 'b.jpg', tmp_path / 'c.jpg'),
+            (tmp_path / 'c.jpg', tmp_path / 'a.jpg')]
+    steps = order_moves(plan, tmp_path)
+    
+    assert len(steps) == 4
+    assert steps[0][1].name.startswith(TEMP_PREFIX)
+    apply_moves(steps, tmp_path / '.journal')
+    assert contents(tmp_path) == {'b.jpg': 'a.jpg', 'c.jpg': 'b.jpg', 'a.jpg': 'c.jpg'}
+
+
+def test_order_moves_temp_name_skips_existing_files(tmp_path):
+    make_files(tmp_path, ['a.jpg', 'b.jpg', f'{TEMP_PREFIX}0001.jpg'])
+    plan = [(tmp_path / 'a.jpg', tmp_path / 'b.jpg'), (tmp_path / 'b.jpg', tmp_path / 'a.jpg')]
+    steps = order_moves(plan, tmp_path)
+    assert steps[0][1].name == f'{TEMP_PREFIX}0002.jpg'
+
+
+def test_no_step_overwrites_a_file_that_has_not_moved(tmp_path):
+    names = [f'{i}.jpg' for i in range(6)]
+    make_files(tmp_path, names)
+    # Shift every name up by two, wrapping around: two interleaved cycles
+    plan = [(tmp_path / name, tmp_path / names[(i + 2) % len(names)]) for i, name in enumerate(names)]
+    
+    for src, dst in order_moves(plan, tmp_path):
+        assert not dst.exists()
+        src.rename(dst)
+    assert contents(tmp_path) == {names[(i + 2) % len(names)]: name for i, name in enumerate(names)}
+
+
+def test_rollback_restores_an_interrupted_run(tmp_path, monkeypatch):
+    make_files(tmp_path, ['a.jpg', 'b.jpg'])
+    plan = [(tmp_path / 'a.jpg', tmp_path / 'b.jpg'), (tmp_path / 'b.jpg', tmp_path / 'a.jpg')]
+    steps = order_moves(plan, tmp_path)
+    journal = tmp_path / '.journal'
+    
+    class Crash(Exception):
+        pass
+    
+    # Let the first two moves happen, then fail as a crash would
+    moves = iter(range(len(steps)))
+    real_rename = Path.rename
+    
+    def crashing_rename(self, target):
+        if next(moves) == 2:
+            raise Crash
+        return real_rename(self, target)
+    
+    monkeypatch.setattr(Path, 'rename', crashing_rename)
+    with pytest.raises(Crash):
+        apply_moves(steps, journal)
+    monkeypatch.undo()
+    
+    assert journal_is_incomplete(journal)
+    assert rollback_journal(journal) == 2
+    assert contents(tmp_path) == {'a.jpg': 'a.jpg', 'b.jpg': 'b.jpg'}
+    assert not journal.exists()
+
+
+def test_finished_journal_is_not_incomplete(tmp_path):
+    make_files(tmp_path, ['a.jpg'])
+    journal = tmp_path / '.journal'
+    apply_moves([(tmp_path / 'a.jpg', tmp_path / 'b.jpg')], journal)
+    assert not journal_is_incomplete(journal)
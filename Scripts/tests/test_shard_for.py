@@ -0,0 +1,33 @@
+"""Race-number sharding must agree between the build and the page (user-033)"""
+
+import json
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from generate_race_gallery import SEARCH_WORKER_JS, shard_for
+
+RACE_NUMBERS = ['1', '42', '007', '1234', 'A12', 'ünï', '']
+
+
+def test_fnv1a_reference_values():
+    # Published 32-bit FNV-1a test vectors
+    assert shard_for('', 2 ** 32) == 0x811c9dc5
+    assert shard_for('a', 2 ** 32) == 0xe40c292c
+    assert shard_for('foobar', 2 ** 32) == 0xbf9cf968
+
+
+def test_shards_are_in_range_and_spread():
+    shards = [shard_for(str(n), 32) for n in range(1, 2001)]
+    assert set(shards) == set(range(32))
+    assert max(shards.count(s) for s in range(32)) < 2 * 2000 / 32
+
+
+@pytest.mark.skipif(not shutil.which('node'), reason='needs node')
+def test_matches_shard_for_in_the_search_worker():
+    function = re.search(r'function shardFor\(.*?\n        }\n', SEARCH_WORKER_JS, re.S).group(0)
+    script = f"const shardCount = 32;\n{function}\nconsole.log(JSON.stringify({json.dumps(RACE_NUMBERS)}.map(shardFor)));"
+    result = subprocess.run(['node', '-e', script], capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout) == [shard_for(number, 32) for number in RACE_NUMBERS]
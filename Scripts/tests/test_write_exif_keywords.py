@@ -0,0 +1,102 @@
+"""Crash-safe keyword writes, resume state and Ctrl-C (write_exif_keywords.py)"""
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip('piexif')
+
+import write_exif_keywords
+from exif_segments import read_keywords
+from test_exif_segments import PIXELS, make_jpeg
+from write_exif_keywords import load_state, replace_atomically, write_keywords
+
+
+def leftovers(directory):
+    return [f.name for f in directory.iterdir() if f.name.startswith('.exif_')]
+
+
+def test_patch_goes_through_a_renamed_copy(tmp_path):
+    photo = tmp_path / 'photo.jpg'
+    photo.write_bytes(make_jpeg('1'))
+    photo.chmod(0o640)
+    inode = photo.stat().st_ino
+    
+    method, _ = write_keywords(photo, '1,2')
+    
+    assert method == 'patched'
+    assert photo.stat().st_ino != inode
+    assert photo.stat().st_mode & 0o777 == 0o640
+    assert read_keywords(photo) == ['1', '2']
+    assert photo.read_bytes().endswith(PIXELS)
+    assert leftovers(tmp_path) == []
+
+
+def test_in_place_patch_keeps_the_original_file(tmp_path):
+    photo = tmp_path / 'photo.jpg'
+    photo.write_bytes(make_jpeg('1'))
+    inode = photo.stat().st_ino
+    
+    assert write_keywords(photo, '3', in_place=True) == ('patched', 128 + 256)
+    assert photo.stat().st_ino == inode
+    assert read_keywords(photo) == ['3']
+
+
+def test_failed_write_leaves_the_original_and_no_temp_file(tmp_path):
+    photo = tmp_path / 'photo.jpg'
+    original = make_jpeg('1')
+    photo.write_bytes(original)
+    
+    def write_half(temp_name):
+        with open(temp_name, 'wb') as f:
+            f.write(original[:10])
+        raise OSError('disk full')
+    
+    with pytest.raises(OSError):
+        replace_atomically(photo, write_half)
+    assert photo.read_bytes() == original
+    assert leftovers(tmp_path) == []
+
+
+def write_catalog(tmp_path, count):
+    photos = tmp_path / 'photos'
+    photos.mkdir()
+    lines = ['photo_number,filename,race_number_1']
+    for i in range(1, count + 1):
+        (photos / f'{i}.jpg').write_bytes(make_jpeg())
+        lines.append(f'{i},{i}.jpg,{100 + i}')
+    catalog = tmp_path / 'tags.csv'
+    catalog.write_text('\n'.join(lines) + '\n')
+    return catalog, photos
+
+
+def test_second_run_skips_photos_already_written(tmp_path, monkeypatch):
+    catalog, photos = write_catalog(tmp_path, 3)
+    write_exif_keywords.write_exif_keywords(catalog, photos)
+    assert load_state(photos) == {'1.jpg': '101', '2.jpg': '102', '3.jpg': '103'}
+    
+    calls = []
+    monkeypatch.setattr(write_exif_keywords, 'write_keywords', lambda *args: calls.append(args))
+    write_exif_keywords.write_exif_keywords(catalog, photos)
+    assert calls == []
+
+
+def test_ctrl_c_cancels_queued_photos_and_keeps_progress(tmp_path, monkeypatch):
+    catalog, photos = write_catalog(tmp_path, 6)
+    calls = []
+    
+    def writer(image_file, keywords_str, in_place=False):
+        calls.append(image_file.name)
+        if image_file.name == '2.jpg':
+            raise KeyboardInterrupt
+        if image_file.name != '1.jpg':
+            time.sleep(0.2)  # Still running when the interrupt is handled
+        return 'patched', 0
+    
+    monkeypatch.setattr(write_exif_keywords, 'write_keywords', writer)
+    with pytest.raises(KeyboardInterrupt):
+        write_exif_keywords.write_exif_keywords(catalog, photos, workers=1)
+    
+    assert len(calls) <= 3
+    assert load_state(photos) == {'1.jpg': '101'}
@@ -2,6 +2,10 @@
 """
 Upload race photos to Backblaze B2
 Supports both public (watermarked) and private (full-res) buckets
+
+With --attachment the files are stored with Content-Disposition: attachment,
+so their URLs save straight to disk when opened (the gallery's Download
+button uses them as download_url)
 """
 
 import os
@@ -9,10 +13,11 @@ import sys
 from pathlib import Path
 from b2sdk.v2 import B2Api, InMemoryAccountInfo
 
-def upload_to_b2(photos_dir, bucket_name, key_id, app_key, public=True, subfolder=None):
+def upload_to_b2(photos_dir, bucket_name, key_id, app_key, public=True, subfolder=None, attachment=False):
     """
     Upload photos to B2 bucket
     subfolder: Optional folder prefix (e.g., 'watermarked', 'iceman-2024/watermarked')
+    attachment: Serve the files as downloads (Content-Disposition: attachment)
     """
     
     photos_path = Path(photos_dir)
@@ -57,9 +62,14 @@ def upload_to_b2(photos_dir, bucket_name, key_id, app_key, public=True, subfolde
             
             print(f"Uploading {file_name}...", end=" ")
             
+            file_infos = None
+            if attachment:
+                file_infos = {'b2-content-disposition': f'attachment; filename="{image_file.name}"'}
+            
             bucket.upload_local_file(
                 local_file=str(image_file),
-                file_name=file_name
+                file_name=file_name,
+                file_infos=file_infos
             )
             
             print("✓")
@@ -79,7 +89,8 @@ def upload_to_b2(photos_dir, bucket_name, key_id, app_key, public=True, subfolde
     
     if public:
         # Public bucket - use regular download URL (f00X.backblazeb2.com)
-        # Note: CORS doesn't work on this endpoint, but images are publicly viewable/downloadable
+        # Note: CORS doesn't work on this endpoint without a bucket CORS rule; add
+        # one before building galleries with --cors-thumbnails (see service_worker.py)
         
         # Get download URL from the first uploaded file
         download_url_base = None
@@ -116,6 +127,14 @@ def upload_to_b2(photos_dir, bucket_name, key_id, app_key, public=True, subfolde
             
             download_url = f"{download_url_base}/file/{bucket_name}/{full_path}"
             
+            if attachment:
+                # Download copies only - the viewing URLs stay as they are
+                photos_json.append({
+                    'photo_number': str(idx),
+                    'download_url': download_url
+                })
+                continue
+            
             photos_json.append({
                 'photo_number': str(idx),
                 'photo_url': download_url,
@@ -157,9 +176,11 @@ def upload_to_b2(photos_dir, bucket_name, key_id, app_key, public=True, subfolde
 
 if __name__ == '__main__':
     if len(sys.argv) < 5:
-        print("Usage: python upload_to_b2.py <photos_dir> <bucket_name> <key_id> <app_key> [--private] [--subfolder name]")
+        print("Usage: python upload_to_b2.py <photos_dir> <bucket_name> <key_id> <app_key> [--private] [--subfolder name] [--attachment]")
         print("\nExample (public bucket):")
         print('  python upload_to_b2.py ./photos/ race-photos-public YOUR_KEY_ID YOUR_APP_KEY')
+        print("\nExample (download copies that save straight to disk):")
+        print('  python upload_to_b2.py ./photos/ race-photos-public YOUR_KEY_ID YOUR_APP_KEY --subfolder downloads --attachment')
         print("\nExample (private bucket with subfolder):")
         print('  python upload_to_b2.py ./watermarked/ race-photos-private YOUR_KEY_ID YOUR_APP_KEY --private --subfolder watermarked')
         print('  python upload_to_b2.py ./unwatermarked/ race-photos-private YOUR_KEY_ID YOUR_APP_KEY --private --subfolder unwatermarked')
@@ -182,4 +203,6 @@ if __name__ == '__main__':
         if subfolder_idx + 1 < len(sys.argv):
             subfolder = sys.argv[subfolder_idx + 1]
     
-    upload_to_b2(photos_dir, bucket_name, key_id, app_key, public=is_public, subfolder=subfolder)
+    attachment = '--attachment' in sys.argv
+    
+    upload_to_b2(photos_dir, bucket_name, key_id, app_key, public=is_public, subfolder=subfolder, attachment=attachment)
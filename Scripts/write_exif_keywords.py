@@ -7,12 +7,127 @@ Requires: pip install piexif --break-system-packages
 import csv
 import sys
 import os
+import json
+import time
+import shutil
+import tempfile
 import piexif
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from exif_segments import (encode_keywords, pad_payload, patch_keywords_in_place, can_patch_in_place,
+                           USER_COMMENT, XP_KEYWORDS,
+                           RESERVED_USER_COMMENT, RESERVED_XP_KEYWORDS)
+from xmp_sidecars import write_xmp_sidecar
 
-def write_exif_keywords(csv_file, photos_dir):
+STATE_FILE = '.exif_keywords_state.json'
+XMP_STATE_FILE = '.xmp_keywords_state.json'
+
+
+def load_state(photos_path, state_file=STATE_FILE):
+    """Return {filename: keywords} written by the last successful run"""
+    state_path = photos_path / state_file
+    if not state_path.exists():
+        return {}
+    with open(state_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(photos_path, state, state_file=STATE_FILE):
+    """Atomically replace the state file"""
+    state_path = photos_path / state_file
+    fd, temp_name = tempfile.mkstemp(dir=photos_path, prefix='.exif_state_', suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_name, state_path)
+
+
+def replace_atomically(image_file, write_copy):
+    """
+    Build the new version of a photo in a temp file in the same folder, fsync
+    it and rename it over the original, so a crash never leaves a half-written
+    photo. write_copy(temp_name) writes the new file.
+    """
+    fd, temp_name = tempfile.mkstemp(dir=image_file.parent, prefix='.exif_', suffix=image_file.suffix)
+    os.close(fd)
+    try:
+        write_copy(temp_name)
+        with open(temp_name, 'rb+') as temp_file:
+            os.fsync(temp_file.fileno())
+        shutil.copymode(image_file, temp_name)
+        os.replace(temp_name, image_file)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+
+
+def write_keywords(image_file, keywords_str, in_place=False):
+    """
+    Write a keywords string to one image
+    Patches the existing EXIF fields when the new value fits, otherwise
+    rewrites the EXIF block with spare padding so the next edit can be patched.
+    Returns (method, bytes_written) where method is 'patched' or 'rewritten'.
+    
+    Both go through a temp copy that is fsynced and renamed over the original
+    (see replace_atomically()). With in_place, a patch instead writes only the
+    keyword bytes straight into the original: much less I/O, but a crash
+    mid-write can leave that photo's keywords half-written.
+    """
+    if in_place:
+        written = patch_keywords_in_place(image_file, keywords_str)
+        if written is not None:
+            with open(image_file, 'rb+') as f:
+                os.fsync(f.fileno())
+            return 'patched', written
+    elif can_patch_in_place(image_file, keywords_str):
+        def patch_copy(temp_name):
+            shutil.copyfile(image_file, temp_name)
+            patch_keywords_in_place(temp_name, keywords_str)
+        replace_atomically(image_file, patch_copy)
+        return 'patched', image_file.stat().st_size
+    
+    # Load existing EXIF
+    exif_dict = piexif.load(str(image_file))
+    
+    # Write to EXIF UserComment and XPKeywords (Windows) for compatibility
+    if 'Exif' not in exif_dict:
+        exif_dict['Exif'] = {}
+    if '0th' not in exif_dict:
+        exif_dict['0th'] = {}
+    
+    # Reserve room beyond the current value so later corrections fit in place
+    payloads = encode_keywords(keywords_str)
+    exif_dict['Exif'][piexif.ExifIFD.UserComment] = pad_payload(payloads[USER_COMMENT], RESERVED_USER_COMMENT)
+    exif_dict['0th'][piexif.ImageIFD.XPKeywords] = pad_payload(payloads[XP_KEYWORDS], RESERVED_XP_KEYWORDS)
+    
+    # Save EXIF into a temp copy, then atomically swap it in
+    exif_bytes = piexif.dump(exif_dict)
+    replace_atomically(image_file, lambda temp_name: piexif.insert(exif_bytes, str(image_file), temp_name))
+    
+    return 'rewritten', image_file.stat().st_size
+
+
+def write_sidecar(image_file, keywords_str):
+    """
+    Write a keywords string to the photo's .xmp sidecar, leaving the image untouched
+    Returns ('sidecar', bytes_written) to match write_keywords()
+    """
+    return 'sidecar', write_xmp_sidecar(image_file, keywords_str.split(','))
+
+
+def write_exif_keywords(csv_file, photos_dir, workers=1, force=False, xmp=False, in_place=False):
     """
     Read race numbers from CSV and write them to image EXIF keywords
+    
+    Parameters:
+    - workers: Number of photos written in parallel (default: 1)
+    - force: Rewrite every row, ignoring what the last run already wrote
+    - xmp: Write .xmp sidecars (dc:subject) instead of touching the images
+    - in_place: Patch keywords straight into the originals (see write_keywords())
+    
+    Rows whose race numbers match the state file from the last run are skipped.
     """
     
     photos_path = Path(photos_dir)
@@ -28,9 +143,21 @@ def write_exif_keywords(csv_file, photos_dir):
     print(f"Loaded {len(rows)} photos from {csv_file}")
     print(f"Photos directory: {photos_dir}\n")
     
+    state_file = XMP_STATE_FILE if xmp else STATE_FILE
+    if xmp:
+        writer = write_sidecar
+    else:
+        writer = lambda image_file, keywords_str: write_keywords(image_file, keywords_str, in_place)
+    state = {} if force else load_state(photos_path, state_file)
+    
     updated_count = 0
     skipped_count = 0
+    unchanged_count = 0
+    patched_count = 0
+    bytes_written = 0
     
+    # Work out which photos need writing before touching any files
+    jobs = []
     for row in rows:
         photo_num = row['photo_number']
         
@@ -70,41 +197,67 @@ def write_exif_keywords(csv_file, photos_dir):
             skipped_count += 1
             continue
         
-        try:
-            # Load existing EXIF
-            exif_dict = piexif.load(str(image_file))
-            
-            # Create keywords string (comma-separated race numbers)
-            keywords_str = ','.join(race_numbers)
-            
-            # Write to EXIF Keywords field (0x9c9e in IFD)
-            # Also write to XPKeywords (Windows) for compatibility
-            if 'Exif' not in exif_dict:
-                exif_dict['Exif'] = {}
-            
-            exif_dict['Exif'][piexif.ExifIFD.UserComment] = keywords_str.encode('utf-8')
-            
-            # Also add to IPTC Keywords if possible
-            if '0th' not in exif_dict:
-                exif_dict['0th'] = {}
-            
-            # Convert keywords to bytes (required by piexif)
-            exif_dict['0th'][piexif.ImageIFD.XPKeywords] = keywords_str.encode('utf-16le') + b'\x00\x00'
+        # Create keywords string (comma-separated race numbers)
+        keywords_str = ','.join(race_numbers)
+        
+        if state.get(filename) == keywords_str:
+            unchanged_count += 1
+            continue  # Already written by a previous run
+        
+        jobs.append((photo_num, filename, image_file, keywords_str))
+    
+    print(f"{len(jobs)} photos to write ({unchanged_count} unchanged since last run)\n")
+    
+    start_time = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        futures = {pool.submit(writer, image_file, keywords_str): (photo_num, filename, keywords_str)
+                   for photo_num, filename, image_file, keywords_str in jobs}
+        
+        for future in as_completed(futures):
+            photo_num, filename, keywords_str = futures[future]
+            try:
+                method, written = future.result()
+            except Exception as e:
+                print(f"  ✗ Photo {photo_num}: Error writing EXIF: {e}")
+                skipped_count += 1
+                continue
             
-            # Save EXIF back to image
-            exif_bytes = piexif.dump(exif_dict)
-            piexif.insert(exif_bytes, str(image_file))
+            bytes_written += written
+            if method == 'patched':
+                patched_count += 1
+            state[filename] = keywords_str
             
-            print(f"  ✓ Photo {photo_num}: Added keywords: {keywords_str}")
+            print(f"  ✓ Photo {photo_num}: Added keywords: {keywords_str} ({method})")
             updated_count += 1
-            
-        except Exception as e:
-            print(f"  ✗ Photo {photo_num}: Error writing EXIF: {e}")
-            skipped_count += 1
+    except KeyboardInterrupt:
+        # Drop the queued photos; the ones being written finish (atomically)
+        print("\n⚠ Interrupted, waiting for the photos being written...")
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    finally:
+        pool.shutdown(wait=True)
+        # Record progress even if interrupted, so the next run resumes
+        save_state(photos_path, state, state_file)
+    
+    elapsed = time.perf_counter() - start_time
     
     print(f"\n✓ Complete!")
     print(f"  Updated: {updated_count} photos")
+    print(f"  Unchanged: {unchanged_count} photos")
     print(f"  Skipped: {skipped_count} photos")
+    if xmp:
+        print(f"  Sidecars written: {updated_count} (originals untouched)")
+    else:
+        print(f"  Patched{' in place' if in_place else ''}: {patched_count}, rewritten: {updated_count - patched_count}")
+    if bytes_written < 1024 * 1024:
+        print(f"  Data written: {bytes_written / 1024:.1f} KB")
+    else:
+        print(f"  Data written: {bytes_written / 1024 / 1024:.1f} MB")
+    if elapsed > 0 and updated_count:
+        print(f"  Throughput: {updated_count / elapsed:.1f} photos/s, "
+              f"{bytes_written / 1024 / 1024 / elapsed:.1f} MB/s "
+              f"({elapsed:.1f}s, {max(1, workers)} workers)")
     print(f"\nNext steps:")
     print(f"  1. Upload these tagged photos to Flickr")
     print(f"  2. Run: python generate_race_gallery.py --csv {csv_file} ...")
@@ -112,17 +265,41 @@ def write_exif_keywords(csv_file, photos_dir):
 
 if __name__ == '__main__':
     if len(sys.argv) < 3:
-        print("Usage: python write_exif_keywords.py <race_tagging.csv> <photos_directory>")
+        print("Usage: python write_exif_keywords.py <race_tagging.csv> <photos_directory> [--workers N] [--all] [--xmp] [--in-place]")
         print("\nExample:")
         print("  python write_exif_keywords.py race_tagging.csv ./race_photos/")
+        print("  python write_exif_keywords.py race_tagging.csv ./race_photos/ --workers 8")
+        print("  python write_exif_keywords.py race_tagging.csv ./race_photos/ --xmp")
         print("\nThis will:")
         print("  - Read race numbers from the CSV")
         print("  - Find corresponding image files (image1.jpg, image2.jpg, etc.)")
         print("  - Write race numbers to EXIF keywords")
+        print("    (the keyword fields are patched when the new value fits, else the EXIF block is rewritten)")
+        print("  - Skip photos whose race numbers haven't changed since the last run")
+        print(f"    (tracked in {STATE_FILE} in the photos directory; --all writes every row)")
+        print("\nEvery write goes to a temp copy that is fsynced and renamed over the")
+        print("original, so an interrupted run never leaves a corrupt photo.")
+        print("\n--in-place: patch the keyword bytes straight into the originals when they")
+        print("  fit (a few KB per photo instead of a full copy). Faster, but NOT crash-safe:")
+        print("  an interruption mid-write can leave a photo with half-written keywords.")
+        print("\nSidecar mode (--xmp):")
+        print("  Writes photo_0001.xmp next to photo_0001.jpg with the race numbers as")
+        print("  dc:subject keywords. Originals are never modified, so a tag fix doesn't")
+        print("  require re-uploading them. Read back with: python xmp_sidecars.py <photos_dir>")
         print("\nRequires: pip install piexif --break-system-packages")
         sys.exit(1)
     
     csv_file = sys.argv[1]
     photos_dir = sys.argv[2]
+    workers = 1
+    
+    if '--workers' in sys.argv:
+        workers_idx = sys.argv.index('--workers')
+        if workers_idx + 1 < len(sys.argv):
+            workers = int(sys.argv[workers_idx + 1])
+    
+    force = '--all' in sys.argv
+    xmp = '--xmp' in sys.argv
+    in_place = '--in-place' in sys.argv
     
-    write_exif_keywords(csv_file, photos_dir)
+    write_exif_keywords(csv_file, photos_dir, workers, force, xmp, in_place)
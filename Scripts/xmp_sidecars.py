@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Write and read race numbers as XMP sidecar keywords (dc:subject)
+A tag correction only rewrites a ~1 KB .xmp file next to the photo,
+so originals never need to be re-uploaded
+"""
+
+import os
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+NAMESPACES = {
+    'x': 'adobe:ns:meta/',
+    'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
+    'dc': 'http://purl.org/dc/elements/1.1/',
+    'xmp': 'http://ns.adobe.com/xap/1.0/',
+    'xmpMM': 'http://ns.adobe.com/xap/1.0/mm/',
+    'photoshop': 'http://ns.adobe.com/photoshop/1.0/',
+    'lr': 'http://ns.adobe.com/lightroom/1.0/',
+    'crs': 'http://ns.adobe.com/camera-raw-settings/1.0/',
+    'exif': 'http://ns.adobe.com/exif/1.0/',
+    'tiff': 'http://ns.adobe.com/tiff/1.0/',
+    'aux': 'http://ns.adobe.com/exif/1.0/aux/',
+}
+
+for prefix, uri in NAMESPACES.items():
+    ET.register_namespace(prefix, uri)
+
+RDF = '{%s}' % NAMESPACES['rdf']
+DC = '{%s}' % NAMESPACES['dc']
+
+XPACKET_BEGIN = '<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>\n'
+XPACKET_END = '\n<?xpacket end="w"?>\n'
+
+
+def sidecar_path(image_file):
+    """Sidecar naming used by Lightroom/Bridge: photo_0001.jpg → photo_0001.xmp"""
+    return Path(image_file).with_suffix('.xmp')
+
+
+def _new_packet():
+    """Empty x:xmpmeta tree with a single rdf:Description"""
+    root = ET.Element('{%s}xmpmeta' % NAMESPACES['x'])
+    rdf = ET.SubElement(root, RDF + 'RDF')
+    ET.SubElement(rdf, RDF + 'Description', {RDF + 'about': ''})
+    return root
+
+
+def write_xmp_sidecar(image_file, race_numbers):
+    """
+    Write race numbers to the photo's .xmp sidecar as dc:subject keywords
+    An existing sidecar keeps all its other metadata; only dc:subject is replaced.
+    Returns the number of bytes written.
+    """
+    path = sidecar_path(image_file)
+    
+    root = None
+    if path.exists():
+        try:
+            root = ET.parse(path).getroot()
+        except ET.ParseError:
+            print(f"  ⚠ {path.name}: Unreadable sidecar, replacing it")
+    if root is None or root.find(RDF + 'RDF') is None:
+        root = _new_packet()
+    
+    rdf = root.find(RDF + 'RDF')
+    description = rdf.find(RDF + 'Description')
+    if description is None:
+        description = ET.SubElement(rdf, RDF + 'Description', {RDF + 'about': ''})
+    
+    # Replace any existing keyword list
+    for subject in description.findall(DC + 'subject'):
+        description.remove(subject)
+    
+    bag = ET.SubElement(ET.SubElement(description, DC + 'subject'), RDF + 'Bag')
+    for race_number in race_numbers:
+        ET.SubElement(bag, RDF + 'li').text = str(race_number)
+    
+    ET.indent(root, space=' ')
+    data = (XPACKET_BEGIN + ET.tostring(root, encoding='unicode') + XPACKET_END).encode('utf-8')
+    
+    # Temp file + rename so readers never see a half-written sidecar
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix='.xmp_', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_name, path)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+    
+    return len(data)
+
+
+def read_xmp_sidecar(path):
+    """
+    Return the dc:subject keywords from one sidecar (empty list if none)
+    """
+    root = ET.parse(path).getroot()
+    return [li.text.strip()
+            for subject in root.iter(DC + 'subject')
+            for li in subject.iter(RDF + 'li')
+            if li.text and li.text.strip()]
+
+
+def read_xmp_sidecars(photos_dir, workers=8):
+    """
+    Load the keywords of every sidecar in a folder
+    Returns {image filename: [race numbers]} for sidecars that sit next to a photo
+    """
+    photos_path = Path(photos_dir)
+    
+    images = {}
+    for ext in ['*.jpg', '*.JPG', '*.jpeg', '*.JPEG']:
+        for image_file in photos_path.glob(ext):
+            images[image_file.stem] = image_file.name
+    
+    sidecars = sorted(photos_path.glob('*.xmp'))
+    
+    def load(path):
+        try:
+            return path, read_xmp_sidecar(path)
+        except (ET.ParseError, OSError) as e:
+            print(f"  ✗ {path.name}: Error reading sidecar: {e}")
+            return path, None
+    
+    keywords = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for path, race_numbers in pool.map(load, sidecars):
+            if race_numbers is None:
+                continue
+            if path.stem not in images:
+                print(f"  ⚠ {path.name}: No matching photo")
+                continue
+            keywords[images[path.stem]] = race_numbers
+    
+    return keywords
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python xmp_sidecars.py <photos_directory>")
+        print("\nExample:")
+        print("  python xmp_sidecars.py ./race_photos/")
+        print("\nThis will:")
+        print("  - Read every .xmp sidecar next to the photos")
+        print("  - Print the race numbers (dc:subject keywords) found for each photo")
+        print("\nSidecars are written by: python write_exif_keywords.py race_tagging.csv ./race_photos/ --xmp")
+        sys.exit(1)
+    
+    keywords = read_xmp_sidecars(sys.argv[1])
+    for filename, race_numbers in sorted(keywords.items()):
+        print(f"  {filename}: {', '.join(race_numbers)}")
+    
+    print(f"\n✓ Read {len(keywords)} sidecars")
+    print(f"  Unique race numbers: {len({n for nums in keywords.values() for n in nums})}")